@@ -6,8 +6,9 @@ from flask_mail import Mail
 from config import Config
 import os
 from flask import render_template
+from app.utils.routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login = LoginManager()
 mail = Mail()
@@ -22,6 +23,80 @@ def create_app(config_class=Config):
     login.init_app(app)
     mail.init_app(app)
     
+    # Send safe reads to read replicas when configured
+    from app.utils import routing
+    routing.init_app(app, db)
+    
+    # WAL and pragmas for SQLite deployments
+    from app.utils import database
+    database.init_app(app)
+
+    # Schema serializers and the orjson JSON provider when installed
+    from app.utils import serialization
+    serialization.init_app(app)
+    
+    # Opt-in slow-query log with EXPLAIN plans
+    from app.utils import query_log
+    query_log.init_app(app)
+    
+    # Keep cache version counters in step with data changes
+    from app.utils import cache
+    cache.init_app(app)
+    
+    # Compiled permission sets and their cache watcher
+    from app.utils import permissions
+    permissions.init_app(app)
+    
+    # Cache watchers for the lookup snapshot, calendar feeds and dashboard
+    from app.utils import lookups, calendar_feed, dashboard_cache
+    lookups.init_app(app)
+    calendar_feed.init_app(app)
+    dashboard_cache.init_app(app)
+    
+    # Short-lived identity cache behind the user loader
+    from app.utils import identity
+    identity.init_app(app)
+    
+    # Thumbnails for uploaded images
+    from app.utils import images
+    images.init_app(app)
+    
+    # Content-addressed store for uploaded documents and videos
+    from app.utils import storage
+    storage.init_app(app)
+    
+    # Access-checked delivery of uploaded videos and documents
+    from app.utils import media
+    media.init_app(app)
+    
+    # Database-backed background jobs
+    from app.utils import jobs
+    jobs.init_app(app)
+    
+    # Rolling materialization of recurring class series
+    from app.utils import series
+    series.init_app(app)
+    
+    # Bulk student/tutor imports
+    from app.utils import imports
+    imports.init_app(app)
+    
+    # Batch tutor assignment proposals
+    from app.utils import assignment
+    assignment.init_app(app)
+    
+    # Department headcounts and their reconciliation command
+    from app.utils import counters
+    counters.init_app(app)
+
+    # Closes overdue classes; one worker at a time through a lease
+    from app.utils import lifecycle
+    lifecycle.init_app(app)
+    
+    # Moves old finished classes and their attendance to the archive tables
+    from app.utils import archive
+    archive.init_app(app)
+    
     # Configure login
     login.login_view = 'auth.login'
     login.login_message = 'Please log in to access this page.'
@@ -58,6 +133,12 @@ def create_app(config_class=Config):
     from app.routes.student import bp as student_bp
     app.register_blueprint(student_bp, url_prefix='/student')
 
+    from app.routes.calendar import bp as calendar_bp
+    app.register_blueprint(calendar_bp, url_prefix='/calendar')
+
+    from app.routes.media import bp as media_bp
+    app.register_blueprint(media_bp, url_prefix='/media')
+
     # Error handlers
     @app.errorhandler(404)
     def not_found_error(error):
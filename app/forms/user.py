@@ -321,4 +321,49 @@ class StudentRegistrationForm(FlaskForm):
         from app.models.student import Student
         student = Student.query.filter_by(email=email.data).first()
         if student:
-            raise ValidationError('Email already registered. Please choose a different one.')
\ No newline at end of file
+            raise ValidationError('Email already registered. Please choose a different one.')
+
+class TutorImportForm(TutorRegistrationForm):
+    """Validates one imported tutor row with the registration rules
+
+    Documents and videos are uploaded later from the tutor's profile, and
+    duplicate usernames/emails are checked per batch by the importer.
+    """
+    aadhaar_card = None
+    pan_card = None
+    resume = None
+    degree_certificate = None
+    demo_video = None
+    interview_video = None
+    submit = None
+
+    class Meta:
+        csrf = False
+
+    def __init__(self, *args, department_choices=(), **kwargs):
+        FlaskForm.__init__(self, *args, **kwargs)
+        self.department_id.choices = list(department_choices)
+
+    def validate_username(self, username):
+        pass
+
+    def validate_email(self, email):
+        pass
+
+
+class StudentImportForm(StudentRegistrationForm):
+    """Validates one imported student row with the registration rules"""
+    marksheet = None
+    student_aadhaar = None
+    school_id = None
+    submit = None
+
+    class Meta:
+        csrf = False
+
+    def __init__(self, *args, department_choices=(), **kwargs):
+        FlaskForm.__init__(self, *args, **kwargs)
+        self.department_id.choices = list(department_choices)
+
+    def validate_email(self, email):
+        pass
@@ -4,5 +4,10 @@ from app.models.tutor import Tutor
 from app.models.student import Student
 from app.models.class_model import Class
 from app.models.attendance import Attendance
+from app.models.cache_version import CacheVersion
+from app.models.job import Job
+from app.models.stored_file import StoredFile, FileReference
+from app.models.lease import Lease
+from app.models.archive import ArchivedClass, ArchivedAttendance
 
-__all__ = ['User', 'Department', 'Tutor', 'Student', 'Class', 'Attendance']
\ No newline at end of file
+__all__ = ['User', 'Department', 'Tutor', 'Student', 'Class', 'Attendance', 'CacheVersion', 'Job', 'StoredFile', 'FileReference', 'Lease', 'ArchivedClass', 'ArchivedAttendance']
\ No newline at end of file
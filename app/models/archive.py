@@ -0,0 +1,43 @@
+from datetime import datetime
+from app import db
+from app.models.class_model import Class
+from app.models.attendance import Attendance
+
+
+def _archive_columns(table):
+    """Copies of a hot table's columns, without foreign keys or defaults"""
+    return [
+        db.Column(column.name, column.type, primary_key=column.primary_key,
+                  nullable=column.nullable, autoincrement=False)
+        for column in table.columns
+    ]
+
+
+class ArchivedClass(db.Model):
+    """Completed or cancelled class moved out of ``classes`` (see app/utils/archive.py)"""
+    __table__ = db.Table(
+        'classes_archive', db.metadata,
+        *_archive_columns(Class.__table__),
+        db.Column('archived_at', db.DateTime, default=datetime.utcnow),
+        db.Index('ix_classes_archive_tutor_date', 'tutor_id', 'scheduled_date'),
+        db.Index('ix_classes_archive_student_date', 'primary_student_id', 'scheduled_date'),
+        db.Index('ix_classes_archive_date', 'scheduled_date'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedClass {self.id} {self.subject} {self.scheduled_date}>'
+
+
+class ArchivedAttendance(db.Model):
+    """Attendance of an archived class"""
+    __table__ = db.Table(
+        'attendance_archive', db.metadata,
+        *_archive_columns(Attendance.__table__),
+        db.Column('archived_at', db.DateTime, default=datetime.utcnow),
+        db.Index('ix_attendance_archive_class_id', 'class_id'),
+        db.Index('ix_attendance_archive_tutor_date', 'tutor_id', 'class_date'),
+        db.Index('ix_attendance_archive_student_date', 'student_id', 'class_date'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedAttendance Class:{self.class_id} Student:{self.student_id}>'
@@ -4,6 +4,12 @@ import json
 
 class Attendance(db.Model):
     __tablename__ = 'attendance'
+    __table_args__ = (
+        db.Index('ix_attendance_class_id', 'class_id'),
+        db.Index('ix_attendance_tutor_date', 'tutor_id', 'class_date'),
+        db.Index('ix_attendance_student_date', 'student_id', 'class_date'),
+        db.Index('ix_attendance_class_date', 'class_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -284,23 +290,9 @@ class Attendance(db.Model):
         return records
     
     def to_dict(self):
-        """Convert attendance to dictionary"""
-        return {
-            'id': self.id,
-            'class_id': self.class_id,
-            'class_date': self.class_date.isoformat() if self.class_date else None,
-            'tutor_name': self.tutor.user.full_name if self.tutor and self.tutor.user else '',
-            'student_name': self.student.full_name if self.student else '',
-            'tutor_present': self.tutor_present,
-            'student_present': self.student_present,
-            'tutor_late_minutes': self.tutor_late_minutes,
-            'student_late_minutes': self.student_late_minutes,
-            'attendance_status': self.get_attendance_status(),
-            'punctuality_score': self.get_punctuality_score(),
-            'penalty_amount': self.penalty_amount,
-            'student_engagement': self.student_engagement,
-            'marked_at': self.marked_at.isoformat() if self.marked_at else None
-        }
+        """Convert attendance to dictionary (use ATTENDANCE_SCHEMA.dump_many for lists)"""
+        from app.utils.serialization import ATTENDANCE_SCHEMA
+        return ATTENDANCE_SCHEMA.dump(self)
     
     def __repr__(self):
         return f'<Attendance Class:{self.class_id} Tutor:{self.tutor_id} Student:{self.student_id}>'
\ No newline at end of file
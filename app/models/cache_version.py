@@ -0,0 +1,13 @@
+from datetime import datetime
+from app import db
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+
+    # One row per cache key, bumped in the same transaction as the data change
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.key}={self.version}>'
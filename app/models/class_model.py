@@ -4,6 +4,18 @@ import json
 
 class Class(db.Model):
     __tablename__ = 'classes'
+    __table_args__ = (
+        # Tutor schedules: per-day, date-range and status filters
+        db.Index('ix_classes_tutor_date_status', 'tutor_id', 'scheduled_date', 'status'),
+        # Admin/timetable views ordered by date and time
+        db.Index('ix_classes_date_time', 'scheduled_date', 'scheduled_time'),
+        db.Index('ix_classes_student_date', 'primary_student_id', 'scheduled_date'),
+        db.Index('ix_classes_parent_class_id', 'parent_class_id'),
+        # Lifecycle sweeper: overdue scheduled/ongoing classes
+        db.Index('ix_classes_status_date', 'status', 'scheduled_date'),
+        # One materialized row per series slot
+        db.UniqueConstraint('parent_class_id', 'occurrence_date', name='uq_classes_parent_occurrence'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -64,6 +76,7 @@ class Class(db.Model):
     is_recurring = db.Column(db.Boolean, default=False)
     recurring_pattern = db.Column(db.Text)  # JSON with recurrence details
     parent_class_id = db.Column(db.Integer, db.ForeignKey('classes.id'))
+    occurrence_date = db.Column(db.Date)  # Series slot this row fills (see app/utils/series.py)
     
     # Relationships
     tutor = db.relationship('Tutor', backref='classes', lazy=True)
@@ -163,7 +176,8 @@ class Class(db.Model):
             'interval': 1,  # every 1 week
             'days_of_week': [1, 3, 5],  # Monday, Wednesday, Friday
             'end_date': '2024-12-31',
-            'total_classes': 20
+            'total_classes': 20,
+            'exdates': ['2024-10-02']  # occurrences removed from the series
         }
         """
         self.recurring_pattern = json.dumps(pattern_dict)
@@ -299,27 +313,9 @@ class Class(db.Model):
         ).order_by(Class.scheduled_date, Class.scheduled_time).all()
     
     def to_dict(self):
-        """Convert class to dictionary"""
-        return {
-            'id': self.id,
-            'subject': self.subject,
-            'class_type': self.class_type,
-            'grade': self.grade,
-            'board': self.board,
-            'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
-            'scheduled_time': self.scheduled_time.strftime('%H:%M') if self.scheduled_time else None,
-            'duration': self.duration,
-            'duration_display': self.get_duration_display(),
-            'tutor_name': self.tutor.user.full_name if self.tutor and self.tutor.user else '',
-            'student_names': [s.full_name for s in self.get_student_objects()],
-            'status': self.status,
-            'completion_status': self.completion_status,
-            'platform': self.platform,
-            'meeting_link': self.meeting_link,
-            'is_today': self.is_today(),
-            'is_upcoming': self.is_upcoming(),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        """Convert class to dictionary (use CLASS_SCHEMA.dump_many for lists)"""
+        from app.utils.serialization import CLASS_SCHEMA
+        return CLASS_SCHEMA.dump(self)
     
     def get_student_objects(self):
         """Get actual student objects for this class"""
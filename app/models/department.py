@@ -21,6 +21,11 @@ class Department(db.Model):
     # Settings
     settings = db.Column(db.Text)  # JSON string for department-specific settings
     
+    # Denormalized headcounts, maintained by app.utils.counters
+    user_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tutor_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    student_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def __init__(self, **kwargs):
         super(Department, self).__init__(**kwargs)
         if not self.permissions:
@@ -73,26 +78,16 @@ class Department(db.Model):
         self.settings = json.dumps(settings_dict)
     
     def get_user_count(self):
-        """Get number of users in department"""
-        from app.models.user import User
-        return User.query.filter_by(department_id=self.id, is_active=True).count()
+        """Get number of active users in department"""
+        return self.user_count or 0
     
     def get_tutor_count(self):
-        """Get number of tutors in department"""
-        from app.models.user import User
-        return User.query.filter_by(
-            department_id=self.id, 
-            role='tutor', 
-            is_active=True
-        ).count()
+        """Get number of active tutors in department"""
+        return self.tutor_count or 0
     
     def get_student_count(self):
-        """Get number of students in department"""
-        from app.models.student import Student
-        return Student.query.filter_by(
-            department_id=self.id, 
-            is_active=True
-        ).count()
+        """Get number of active students in department"""
+        return self.student_count or 0
     
     @staticmethod
     def create_default_departments():
@@ -0,0 +1,93 @@
+from datetime import datetime
+from app import db
+import json
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+        db.Index('ix_jobs_created_by', 'created_by'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)  # JSON keyword arguments for the handler
+
+    # queued, running, completed, failed, cancelled
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    cancel_requested = db.Column(db.Boolean, default=False)
+
+    # Progress
+    progress = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+
+    # Outcome
+    result = db.Column(db.Text)  # JSON returned by the handler
+    artifact = db.Column(db.String(255))  # File name inside the job's artifact folder
+    error = db.Column(db.Text)
+
+    # Tracking
+    worker = db.Column(db.String(100))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def get_params(self):
+        """Get handler parameters as dict"""
+        if self.params:
+            try:
+                return json.loads(self.params)
+            except:
+                return {}
+        return {}
+
+    def set_params(self, params_dict):
+        """Set handler parameters from dict"""
+        self.params = json.dumps(params_dict)
+
+    def get_result(self):
+        """Get handler result as dict"""
+        if self.result:
+            try:
+                return json.loads(self.result)
+            except:
+                return {}
+        return {}
+
+    def set_result(self, result_dict):
+        """Set handler result from dict"""
+        self.result = json.dumps(result_dict)
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def get_percent(self):
+        if not self.total:
+            return 100 if self.status == 'completed' else 0
+        return min(100, int((self.progress or 0) * 100 / self.total))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'cancel_requested': bool(self.cancel_requested),
+            'progress': self.progress or 0,
+            'total': self.total,
+            'percent': self.get_percent(),
+            'message': self.message,
+            'result': self.get_result(),
+            'has_artifact': bool(self.artifact),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
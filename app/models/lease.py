@@ -0,0 +1,14 @@
+from datetime import datetime
+from app import db
+
+class Lease(db.Model):
+    """Time-limited claim on a singleton task shared by every worker"""
+    __tablename__ = 'leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)  # host:pid:thread of the current owner
+    expires_at = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Lease {self.name} {self.holder} until {self.expires_at}>'
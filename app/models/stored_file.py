@@ -0,0 +1,41 @@
+from datetime import datetime
+from app import db
+
+class StoredFile(db.Model):
+    """One content-addressed blob; identical uploads share a row"""
+    __tablename__ = 'stored_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 hex
+    size = db.Column(db.BigInteger, nullable=False)
+    extension = db.Column(db.String(10))
+    original_filename = db.Column(db.String(255))  # Name of the first upload
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    references = db.relationship('FileReference', backref='stored_file', lazy='dynamic')
+
+    @property
+    def name(self):
+        """Value stored in documents JSON, video_link and similar columns"""
+        return f'{self.digest}.{self.extension}' if self.extension else self.digest
+
+    def __repr__(self):
+        return f'<StoredFile {self.digest[:12]} {self.size}>'
+
+
+class FileReference(db.Model):
+    """A record field that points at a stored file"""
+    __tablename__ = 'file_references'
+    __table_args__ = (
+        db.Index('ix_file_references_owner', 'owner_type', 'owner_id'),
+        db.Index('ix_file_references_file_id', 'file_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('stored_files.id'), nullable=False)
+    owner_type = db.Column(db.String(20), nullable=False)  # tutor, student, class
+    owner_id = db.Column(db.Integer, nullable=False)
+    field = db.Column(db.String(50), nullable=False)  # e.g. aadhaar, demo_video, video_link
+
+    def __repr__(self):
+        return f'<FileReference {self.owner_type}:{self.owner_id}.{self.field} -> {self.file_id}>'
@@ -4,6 +4,10 @@ import json
 
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_active_department', 'is_active', 'department_id'),
+        db.Index('ix_students_phone', 'phone'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -286,25 +290,9 @@ class Student(db.Model):
         return students
     
     def to_dict(self):
-        """Convert student to dictionary"""
-        return {
-            'id': self.id,
-            'full_name': self.full_name,
-            'email': self.email,
-            'phone': self.phone,
-            'grade': self.grade,
-            'board': self.board,
-            'school_name': self.school_name,
-            'department': self.department.name if self.department else '',
-            'subjects_enrolled': self.get_subjects_enrolled(),
-            'enrollment_status': self.enrollment_status,
-            'attendance_percentage': self.get_attendance_percentage(),
-            'fee_status': self.get_fee_status(),
-            'balance_amount': self.get_balance_amount(),
-            'relationship_manager': self.relationship_manager,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'age': self.get_age()
-        }
+        """Convert student to dictionary (use STUDENT_SCHEMA.dump_many for lists)"""
+        from app.utils.serialization import STUDENT_SCHEMA
+        return STUDENT_SCHEMA.dump(self)
     
     def __repr__(self):
         return f'<Student {self.full_name}>'
@@ -4,6 +4,9 @@ import json
 
 class Tutor(db.Model):
     __tablename__ = 'tutors'
+    __table_args__ = (
+        db.Index('ix_tutors_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
@@ -220,27 +223,9 @@ class Tutor(db.Model):
         return available_tutors
     
     def to_dict(self):
-        """Convert tutor to dictionary"""
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'user_name': self.user.full_name if self.user else '',
-            'qualification': self.qualification,
-            'experience': self.experience,
-            'subjects': self.get_subjects(),
-            'grades': self.get_grades(),
-            'boards': self.get_boards(),
-            'salary_type': self.salary_type,
-            'monthly_salary': self.monthly_salary,
-            'hourly_rate': self.hourly_rate,
-            'status': self.status,
-            'verification_status': self.verification_status,
-            'rating': self.rating,
-            'total_classes': self.total_classes,
-            'completed_classes': self.completed_classes,
-            'completion_rate': self.get_completion_rate(),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        """Convert tutor to dictionary (use TUTOR_SCHEMA.dump_many for lists)"""
+        from app.utils.serialization import TUTOR_SCHEMA
+        return TUTOR_SCHEMA.dump(self)
     
     def __repr__(self):
         return f'<Tutor {self.user.full_name if self.user else self.id}>'
\ No newline at end of file
@@ -19,7 +19,7 @@ class User(UserMixin, db.Model):
     
     # Personal Information
     full_name = db.Column(db.String(100), nullable=False)
-    phone = db.Column(db.String(20))
+    phone = db.Column(db.String(20), index=True)
     address = db.Column(db.Text)
     profile_picture = db.Column(db.String(100))
     
@@ -91,14 +91,8 @@ class User(UserMixin, db.Model):
         """Check if user has specific permission"""
         if self.role == 'superadmin':
             return True
-        if self.role == 'admin':
-            return permission in ['user_management', 'tutor_management', 'student_management', 
-                                'class_management', 'attendance', 'finance', 'reports']
-        if self.role == 'coordinator':
-            if self.department and self.department.permissions:
-                dept_permissions = json.loads(self.department.permissions)
-                return permission in dept_permissions
-        return False
+        from app.utils.permissions import get_user_permissions
+        return permission in get_user_permissions(self)
     
     def can_access_department(self, dept_id):
         """Check if user can access specific department"""
@@ -172,7 +166,8 @@ class User(UserMixin, db.Model):
 
 @login.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from app.utils.identity import load_identity
+    return load_identity(int(user_id))
 
 
 
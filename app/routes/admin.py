@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, send_file
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, date, timedelta
 import os
 import json
 from flask_wtf.csrf import generate_csrf
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.user import User
 from app.models.department import Department  
@@ -12,7 +13,24 @@ from app.models.tutor import Tutor
 from app.models.student import Student
 from app.models.class_model import Class
 from app.models.attendance import Attendance
+from app.models.job import Job
+from app.models.archive import ArchivedClass
 from app.forms.user import CreateUserForm, EditUserForm, TutorRegistrationForm, StudentRegistrationForm
+from app.utils.lookups import get_lookup_snapshot
+from app.utils.calendar_feed import generate_feed_token, revoke_feed_token
+from app.utils.images import process_upload
+from app.utils.storage import store_file, STORED_SUBFOLDERS
+from app.utils.exports import export_response, payroll_period, DATASETS, MIMETYPES
+from app.utils.imports import build_student, build_tutor, start_import, template_header, IMPORT_KINDS
+from app.utils.jobs import enqueue, request_cancel, artifact_file
+from app.utils.assignment import load_proposal, apply_proposal
+from app.utils.series import (
+    bulk_create_series, with_virtual_occurrences,
+    update_series, cancel_occurrence, end_series, SeriesConflict
+)
+from app.utils.query_log import read_log, top_offenders
+from app.utils.timetable import wants_compact, timetable_rows, compact_payload, COMPACT_MIMETYPE
+from app.utils.serialization import TIMETABLE_WEEK_SCHEMA, TIMETABLE_TODAY_SCHEMA, COMPATIBLE_TUTOR_SCHEMA
 from functools import wraps
 
 bp = Blueprint('admin', __name__)
@@ -29,6 +47,9 @@ def admin_required(f):
 
 def save_uploaded_file(file, subfolder):
     """Save uploaded file and return filename"""
+    if file and file.filename and subfolder in STORED_SUBFOLDERS:
+        # Documents and videos are deduplicated in the content-addressed store
+        return store_file(file).name
     if file and file.filename:
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
@@ -37,6 +58,7 @@ def save_uploaded_file(file, subfolder):
         file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder, filename)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         file.save(file_path)
+        process_upload(subfolder, filename)
         return filename
     return None
 
@@ -365,44 +387,7 @@ def register_tutor():
             if form.department_id.data == 0:
                 raise ValueError("Please select a valid department")
             
-            # Create user account
-            user = User(
-                username=form.username.data,
-                email=form.email.data,
-                full_name=form.full_name.data,
-                phone=form.phone.data,
-                role='tutor',
-                department_id=form.department_id.data,
-                address=form.address.data,
-                is_active=True,
-                is_verified=False,
-                joining_date=datetime.now().date()
-            )
-            user.set_password(form.password.data)
-            
-            db.session.add(user)
-            db.session.flush()  # Get user ID
-            
-            # Create tutor profile
-            tutor = Tutor(
-                user_id=user.id,
-                qualification=form.qualification.data,
-                experience=form.experience.data,
-                salary_type=form.salary_type.data,
-                monthly_salary=form.monthly_salary.data,
-                hourly_rate=form.hourly_rate.data,
-                status='pending',
-                verification_status='pending',
-                # Add missing fields:
-                date_of_birth=form.date_of_birth.data,
-                state=form.state.data,
-                pin_code=form.pin_code.data
-            )
-            
-            # Set subjects, grades, and boards
-            tutor.set_subjects([s.strip() for s in form.subjects.data.split(',')])
-            tutor.set_grades([g.strip() for g in form.grades.data.split(',')])
-            tutor.set_boards([b.strip() for b in form.boards.data.split(',')])
+            user, tutor = build_tutor(form)
             
             # Validate and handle document uploads
             documents = {}
@@ -427,16 +412,7 @@ def register_tutor():
                 else:
                     raise ValueError(f"{video_name.replace('_', ' ').title()} is required")
             
-            # Set bank details
-            bank_details = {
-                'account_holder_name': form.account_holder_name.data,
-                'bank_name': form.bank_name.data,
-                'branch_name': form.branch_name.data,
-                'account_number': form.account_number.data,
-                'ifsc_code': form.ifsc_code.data
-            }
-            tutor.set_bank_details(bank_details)
-            
+            db.session.add(user)
             db.session.add(tutor)
             db.session.commit()
             
@@ -548,70 +524,7 @@ def register_student():
     
     if form.validate_on_submit():
         try:
-            # Create student
-            student = Student(
-                full_name=form.full_name.data,
-                email=form.email.data,
-                phone=form.phone.data,
-                date_of_birth=form.date_of_birth.data,
-                address=form.address.data,
-                state=form.state.data,
-                pin_code=form.pin_code.data,
-                grade=form.grade.data,
-                board=form.board.data,
-                school_name=form.school_name.data,
-                academic_year=form.academic_year.data,
-                course_start_date=form.course_start_date.data,
-                department_id=form.department_id.data,
-                relationship_manager=form.relationship_manager.data,
-                created_at=datetime.utcnow()
-            )
-            
-            # Parent details
-            parent_details = {
-                'father': {
-                    'name': form.father_name.data,
-                    'phone': form.father_phone.data,
-                    'email': form.father_email.data,
-                    'profession': form.father_profession.data,
-                    'workplace': form.father_workplace.data
-                },
-                'mother': {
-                    'name': form.mother_name.data,
-                    'phone': form.mother_phone.data,
-                    'email': form.mother_email.data,
-                    'profession': form.mother_profession.data,
-                    'workplace': form.mother_workplace.data
-                }
-            }
-            student.set_parent_details(parent_details)
-            
-            # Academic profile
-            academic_profile = {
-                'siblings': form.siblings.data,
-                'hobbies': [h.strip() for h in (form.hobbies.data or '').split(',') if h.strip()],
-                'learning_styles': [l.strip() for l in (form.learning_styles.data or '').split(',') if l.strip()],
-                'learning_patterns': [p.strip() for p in (form.learning_patterns.data or '').split(',') if p.strip()],
-                'parent_feedback': form.parent_feedback.data
-            }
-            student.set_academic_profile(academic_profile)
-            
-            # Subjects
-            student.set_subjects_enrolled([s.strip() for s in form.subjects_enrolled.data.split(',')])
-            if form.favorite_subjects.data:
-                student.set_favorite_subjects([s.strip() for s in form.favorite_subjects.data.split(',')])
-            if form.difficult_subjects.data:
-                student.set_difficult_subjects([s.strip() for s in form.difficult_subjects.data.split(',')])
-            
-            # Fee structure
-            fee_structure = {
-                'total_fee': form.total_fee.data,
-                'amount_paid': form.amount_paid.data or 0,
-                'balance_amount': form.total_fee.data - (form.amount_paid.data or 0),
-                'payment_mode': form.payment_mode.data,
-                'payment_schedule': form.payment_schedule.data
-            }
-            student.set_fee_structure(fee_structure)
+            student = build_student(form)
             
             # Handle document uploads
             documents = {}
@@ -822,92 +735,261 @@ def classes():
     if class_type_filter:
         query = query.filter_by(class_type=class_type_filter)
     
-    classes = query.order_by(Class.scheduled_date.desc(), Class.scheduled_time.desc()).paginate(
+    classes = query.options(
+        joinedload(Class.tutor).joinedload(Tutor.user)
+    ).order_by(Class.scheduled_date.desc(), Class.scheduled_time.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
     
-    # Get tutors - only those with availability set AND with user relationship
-    available_tutors = []
-    all_tutors = []
+    # Only the students shown on this page are needed for the rows; tutor and
+    # student pickers are filled client-side from the cached lookup snapshot
+    page_student_ids = set()
+    for cls in classes.items:
+        page_student_ids.update(cls.get_students())
     
-    try:
-        # Get all tutors with user relationship
-        tutors_query = Tutor.query.join(User).filter(User.is_active==True).all()
-        
-        for tutor in tutors_query:
-            all_tutors.append(tutor)
-            availability = tutor.get_availability()
-            if availability and tutor.status == 'active':
-                available_tutors.append(tutor)
-    except Exception as e:
-        print(f"Error loading tutors: {e}")
-        tutors_query = Tutor.query.all()
-        for tutor in tutors_query:
-            if hasattr(tutor, 'user') and tutor.user:
-                all_tutors.append(tutor)
-                availability = tutor.get_availability()
-                if availability and tutor.status == 'active':
-                    available_tutors.append(tutor)
-    
-    # Get students - Student model has fields directly
-    students = []
-    try:
-        students = Student.query.filter(Student.is_active==True).all()
-    except Exception as e:
-        print(f"Error loading students: {e}")
-        students = []
-    
-    # Create students dictionary for quick lookup
-    students_dict = {s.id: s for s in students}
+    students_dict = {}
+    if page_student_ids:
+        students_dict = {s.id: s for s in Student.query.filter(Student.id.in_(page_student_ids)).all()}
     
-    # Check if there are tutors without availability
-    tutors_without_availability = [t for t in all_tutors if not t.get_availability()]
-    
-    # Convert to dictionaries for JavaScript
-    tutors_dict_data = []
-    for tutor in available_tutors:
-        try:
-            tutor_dict = {
-                'id': tutor.id,
-                'user_name': tutor.user.full_name if tutor.user else 'Unknown',
-                'email': tutor.user.email if tutor.user else '',
-                'subjects': tutor.get_subjects(),
-                'grades': tutor.get_grades(),
-                'boards': tutor.get_boards(),
-                'has_availability': bool(tutor.get_availability()),
-                'status': tutor.status,
-                'rating': tutor.rating or 0
-            }
-            tutors_dict_data.append(tutor_dict)
-        except Exception as e:
-            print(f"Error processing tutor {tutor.id}: {e}")
-    
-    students_dict_data = []
-    for student in students:
-        try:
-            student_dict = {
-                'id': student.id,
-                'full_name': student.full_name,
-                'grade': student.grade,
-                'board': student.board,
-                'subjects_enrolled': student.get_subjects_enrolled() if hasattr(student, 'get_subjects_enrolled') else []
-            }
-            students_dict_data.append(student_dict)
-        except Exception as e:
-            print(f"Error processing student {student.id}: {e}")
+    snapshot = get_lookup_snapshot()
     
     return render_template('admin/classes.html', 
                          classes=classes, 
-                         tutors=available_tutors,  # Only tutors with availability
-                         all_tutors=all_tutors,    # All tutors for reference
-                         tutors_without_availability=tutors_without_availability,
-                         students=students,
+                         available_tutor_count=snapshot.available_tutor_count(),
+                         tutors_without_availability=snapshot.tutors_without_availability(),
                          students_dict=students_dict,
-                         tutors_dict_data=tutors_dict_data,  # For JavaScript
-                         students_dict_data=students_dict_data,  # For JavaScript
+                         lookups_url=url_for('admin.api_lookups'),
                          today=date.today(),
                          csrf_token=generate_csrf)
 
+@bp.route('/export/<dataset>')
+@login_required
+@admin_required
+def export_data(dataset):
+    """Download classes, attendance or payroll as CSV or XLSX
+
+    With ``async=1`` the file is built by a background job instead.
+    Coordinators only get their own department's rows.
+    """
+    if dataset == 'payroll' and current_user.role not in ['superadmin', 'admin'] \
+            and not current_user.has_permission('finance_management'):
+        flash('Access denied. Payroll exports need the finance permission.', 'error')
+        return redirect(url_for('admin.classes'))
+
+    args = request.args.copy()
+    if current_user.role == 'coordinator':
+        args['department'] = str(current_user.department_id or 0)
+
+    fmt = args.get('format', 'csv').lower()
+    try:
+        if dataset == 'payroll':
+            payroll_period(args)
+        if args.get('async') in ('1', 'true') and dataset in DATASETS and fmt in MIMETYPES:
+            job_args = {key: value for key, value in args.items() if key not in ('async', 'format')}
+            job = enqueue('export', {'dataset': dataset, 'fmt': fmt, 'args': job_args}, created_by=current_user.id)
+            db.session.commit()
+            return redirect(url_for('admin.job_details', job_id=job.id))
+
+        response = export_response(dataset, fmt, args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin.classes'))
+
+    if response is None:
+        flash('Unknown export requested.', 'error')
+        return redirect(url_for('admin.classes'))
+    return response
+
+@bp.route('/classes/history')
+@login_required
+@admin_required
+def class_history():
+    """Archived classes, filterable like the classes page"""
+    page = request.args.get('page', 1, type=int)
+    tutor_filter = request.args.get('tutor', '', type=int)
+    student_filter = request.args.get('student', '', type=int)
+    status_filter = request.args.get('status', '')
+    start, end = request.args.get('start', ''), request.args.get('end', '')
+
+    query = db.session.query(ArchivedClass, User.full_name)\
+        .outerjoin(Tutor, Tutor.id == ArchivedClass.tutor_id)\
+        .outerjoin(User, User.id == Tutor.user_id)
+
+    try:
+        if start:
+            query = query.filter(ArchivedClass.scheduled_date >= datetime.strptime(start, '%Y-%m-%d').date())
+        if end:
+            query = query.filter(ArchivedClass.scheduled_date <= datetime.strptime(end, '%Y-%m-%d').date())
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'warning')
+
+    if tutor_filter:
+        query = query.filter(ArchivedClass.tutor_id == tutor_filter)
+    if student_filter:
+        query = query.filter(ArchivedClass.primary_student_id == student_filter)
+    if status_filter:
+        query = query.filter(ArchivedClass.status == status_filter)
+
+    classes = query.order_by(ArchivedClass.scheduled_date.desc(), ArchivedClass.scheduled_time.desc())\
+        .paginate(page=page, per_page=current_app.config.get('ARCHIVE_PER_PAGE', 50), error_out=False)
+
+    student_ids = {cls.primary_student_id for cls, _ in classes.items if cls.primary_student_id}
+    student_names = dict(db.session.query(Student.id, Student.full_name)
+                         .filter(Student.id.in_(student_ids)).all()) if student_ids else {}
+
+    filters = {'tutor': tutor_filter or '', 'student': student_filter or '', 'status': status_filter,
+               'start': start, 'end': end}
+    return render_template('admin/class_history.html', classes=classes, student_names=student_names,
+                           filters=filters, archive_after_days=current_app.config.get('ARCHIVE_AFTER_DAYS', 365),
+                           csrf_token=generate_csrf)
+
+@bp.route('/classes/history/archive', methods=['POST'])
+@login_required
+@admin_required
+def run_archive():
+    """Queue an archive run for finished classes past the configured age"""
+    job = enqueue('archive_classes', created_by=current_user.id)
+    db.session.commit()
+    return redirect(url_for('admin.job_details', job_id=job.id))
+
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_records():
+    """Upload a CSV/XLSX file of students or tutors"""
+    if request.method == 'POST':
+        kind = request.form.get('kind', 'students')
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a file to import.', 'error')
+            return redirect(url_for('admin.import_records', kind=kind))
+        try:
+            job = start_import(kind, upload, created_by=current_user.id)
+            db.session.commit()
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('admin.import_records', kind=kind))
+        return redirect(url_for('admin.job_details', job_id=job.id))
+
+    return render_template('admin/import.html', kind=request.args.get('kind', 'students'),
+                           kinds=IMPORT_KINDS, csrf_token=generate_csrf)
+
+
+@bp.route('/import/template/<kind>.csv')
+@login_required
+@admin_required
+def import_template(kind):
+    """Empty CSV with the accepted column headings"""
+    if kind not in IMPORT_KINDS:
+        return jsonify({'error': 'Unknown import type'}), 404
+    response = current_app.response_class(','.join(template_header(kind)) + '\r\n', mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}_import_template.csv'
+    return response
+
+
+@bp.route('/jobs')
+@login_required
+@admin_required
+def jobs():
+    """Recent background jobs"""
+    page = request.args.get('page', 1, type=int)
+    query = Job.query
+    if request.args.get('status'):
+        query = query.filter(Job.status == request.args['status'])
+    jobs = query.order_by(Job.id.desc()).paginate(page=page, per_page=25, error_out=False)
+    return render_template('admin/jobs.html', jobs=jobs, csrf_token=generate_csrf)
+
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+@admin_required
+def job_details(job_id):
+    """Progress and outcome of one background job"""
+    job = Job.query.get_or_404(job_id)
+    return render_template('admin/job_details.html', job=job, csrf_token=generate_csrf)
+
+
+@bp.route('/api/v1/jobs/<int:job_id>')
+@login_required
+@admin_required
+def api_job_status(job_id):
+    """Job status for polling"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    data = job.to_dict()
+    if job.artifact:
+        data['artifact_url'] = url_for('admin.job_artifact', job_id=job.id)
+    if job.get_result().get('proposal_id'):
+        data['proposal_url'] = url_for('admin.tutor_assignment', proposal=job.get_result()['proposal_id'])
+    return jsonify(data)
+
+
+@bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+@admin_required
+def cancel_job(job_id):
+    """Cancel a queued job or ask a running one to stop"""
+    job = Job.query.get_or_404(job_id)
+    if job.is_finished:
+        message = f'Job {job.id} has already finished.'
+        if request.is_json:
+            return jsonify({'error': message}), 400
+        flash(message, 'warning')
+    else:
+        request_cancel(job)
+        db.session.commit()
+        if request.is_json:
+            return jsonify(job.to_dict())
+        flash(f'Cancellation requested for job {job.id}.', 'info')
+    return redirect(url_for('admin.job_details', job_id=job.id))
+
+
+@bp.route('/jobs/<int:job_id>/artifact')
+@login_required
+@admin_required
+def job_artifact(job_id):
+    """Download the file a job produced"""
+    job = Job.query.get_or_404(job_id)
+    path = artifact_file(job)
+    if not path:
+        flash('This job has no file to download.', 'error')
+        return redirect(url_for('admin.job_details', job_id=job.id))
+    return send_file(path, as_attachment=True, download_name=job.artifact)
+
+
+@bp.route('/slow-queries')
+@login_required
+@admin_required
+def slow_queries():
+    """Statements from the slow-query log, grouped and ranked by total time"""
+    # Statements and parameters can carry any data, so coordinators are excluded
+    if current_user.role not in ['superadmin', 'admin']:
+        flash('Access denied. Insufficient permissions.', 'error')
+        return redirect(url_for('dashboard.index'))
+
+    records = read_log(current_app.config['SLOW_QUERY_LOG'])
+    route = request.args.get('route', '')
+    if route:
+        records = [record for record in records if record.get('endpoint') == route]
+    offenders = top_offenders(records, limit=request.args.get('limit', 25, type=int))
+
+    return render_template('admin/slow_queries.html', offenders=offenders, record_count=len(records),
+                           route=route, threshold=current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 0))
+
+
+@bp.route('/api/v1/lookups')
+@login_required
+@admin_required
+def api_lookups():
+    """Compact tutor/student lookup snapshot for the class forms"""
+    snapshot = get_lookup_snapshot()
+    
+    response = current_app.response_class(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 
 @bp.route('/classes/create', methods=['POST'])
 @login_required
@@ -998,89 +1080,34 @@ def create_class():
 @login_required
 @admin_required
 def bulk_create_classes():
-    """Create multiple classes in bulk with availability validation"""
+    """Create multiple classes in bulk with availability validation
+
+    With ``async=1`` the work is queued as a background job and its id is
+    returned straight away.
+    """
+    params = {
+        key: request.form.get(key)
+        for key in ('subject', 'grade', 'duration', 'tutor_id', 'class_type', 'start_date', 'end_date', 'start_time')
+    }
+    params['students'] = request.form.getlist('students')
+    params['days_of_week'] = request.form.getlist('days_of_week')
+
+    if request.values.get('async') in ('1', 'true', 'on'):
+        job = enqueue('bulk_create_classes', {'params': params, 'created_by': current_user.id},
+                      created_by=current_user.id)
+        db.session.commit()
+        if request.accept_mimetypes.best == 'application/json' or request.is_json:
+            return jsonify({'job_id': job.id, 'status_url': url_for('admin.api_job_status', job_id=job.id)}), 202
+        flash('Bulk creation queued; you can follow it on this page.', 'info')
+        return redirect(url_for('admin.job_details', job_id=job.id))
+
     try:
-        from datetime import timedelta
-        
-        # Get form data
-        subject = request.form['subject']
-        grade = request.form['grade']
-        duration = int(request.form['duration'])
-        tutor_id = int(request.form['tutor_id'])
-        class_type = request.form['class_type']
-        students = [int(s) for s in request.form.getlist('students')]
-        
-        # Validate tutor
-        tutor = Tutor.query.get_or_404(tutor_id)
-        availability = tutor.get_availability()
-        
-        if not availability:
-            flash(f'Cannot create classes: {tutor.user.full_name} has not set their availability yet.', 'error')
-            return redirect(url_for('admin.classes'))
-        
-        if tutor.status != 'active':
-            flash(f'Cannot create classes: {tutor.user.full_name} is not in active status.', 'error')
-            return redirect(url_for('admin.classes'))
-        
-        start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
-        end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
-        start_time = datetime.strptime(request.form['start_time'], '%H:%M').time()
-        
-        days_of_week = [int(d) for d in request.form.getlist('days_of_week')]
-        
-        created_count = 0
-        skipped_count = 0
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # Check if current day is in selected days of week
-            if current_date.weekday() in days_of_week:
-                day_of_week = current_date.strftime('%A').lower()
-                time_str = start_time.strftime('%H:%M')
-                
-                # Check tutor availability for this day/time
-                if tutor.is_available_at(day_of_week, time_str):
-                    # Check for existing classes at this time
-                    existing_class = Class.query.filter_by(
-                        tutor_id=tutor_id,
-                        scheduled_date=current_date,
-                        scheduled_time=start_time,
-                        status='scheduled'
-                    ).first()
-                    
-                    if not existing_class:
-                        class_data = {
-                            'subject': subject,
-                            'class_type': class_type,
-                            'scheduled_date': current_date,
-                            'scheduled_time': start_time,
-                            'duration': duration,
-                            'tutor_id': tutor_id,
-                            'grade': grade,
-                            'status': 'scheduled',
-                            'created_by': current_user.id
-                        }
-                        
-                        new_class = Class(**class_data)
-                        new_class.set_students(students)
-                        
-                        db.session.add(new_class)
-                        created_count += 1
-                    else:
-                        skipped_count += 1
-                else:
-                    skipped_count += 1
-            
-            current_date += timedelta(days=1)
-        
+        result = bulk_create_series(params, created_by=current_user.id)
         db.session.commit()
-        
-        message = f'{created_count} classes created successfully!'
-        if skipped_count > 0:
-            message += f' {skipped_count} classes were skipped due to availability conflicts or existing bookings.'
-        
-        flash(message, 'success')
-        
+        flash(result['message'], 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
     except Exception as e:
         db.session.rollback()
         flash(f'Error creating bulk classes: {str(e)}', 'error')
@@ -1133,6 +1160,50 @@ def class_details(class_id):
     return render_template('admin/class_details.html', class_item=class_obj, students=students)
 
 
+@bp.route('/api/v1/classes/<int:class_id>/series', methods=['POST'])
+@login_required
+@admin_required
+def api_update_series(class_id):
+    """Edit a recurring series, cancel one occurrence, or end the series"""
+    series = Class.query.get_or_404(class_id)
+    if not series.is_recurring:
+        return jsonify({'error': 'Class is not a recurring series'}), 400
+
+    data = request.get_json() or {}
+    action = data.get('action', 'update')
+
+    try:
+        if action == 'cancel_occurrence':
+            day = datetime.strptime(data['date'], '%Y-%m-%d').date()
+            cancel_occurrence(series, day, data.get('reason'))
+            message = f'Occurrence on {day.strftime("%d %b %Y")} cancelled'
+
+        elif action == 'end':
+            last_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+            removed = end_series(series, last_date)
+            message = f'Series ends on {last_date.strftime("%d %b %Y")}; {removed} upcoming classes removed'
+
+        else:
+            changes = dict(data.get('changes') or {})
+            if 'scheduled_time' in changes:
+                changes['scheduled_time'] = datetime.strptime(changes['scheduled_time'], '%H:%M').time()
+            if 'duration' in changes:
+                changes['duration'] = int(changes['duration'])
+            from_date = datetime.strptime(data['from_date'], '%Y-%m-%d').date() if data.get('from_date') else None
+            updated = update_series(series, from_date, **changes)
+            message = f'Series updated ({updated} upcoming classes changed)'
+
+        db.session.commit()
+        return jsonify({'success': True, 'message': message})
+
+    except SeriesConflict as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e), 'conflicts': e.conflicts}), 409
+    except (KeyError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Invalid request: {str(e)}'}), 400
+
+
 @bp.route('/api/v1/check-class-conflict')
 @login_required
 @admin_required
@@ -1212,20 +1283,11 @@ def api_compatible_tutors():
                 if tutor_boards and board.lower() not in tutor_boards:
                     continue
             
-            compatible_tutors.append({
-                'id': tutor.id,
-                'name': tutor.user.full_name if tutor.user else 'Unknown',
-                'email': tutor.user.email if tutor.user else '',
-                'subjects': tutor.get_subjects(),
-                'grades': tutor.get_grades(),
-                'boards': tutor.get_boards(),
-                'rating': tutor.rating or 0,
-                'completion_rate': tutor.get_completion_rate()
-            })
+            compatible_tutors.append(tutor)
         
         return jsonify({
             'success': True,
-            'tutors': compatible_tutors,
+            'tutors': COMPATIBLE_TUTOR_SCHEMA.dump_many(compatible_tutors),
             'total': len(compatible_tutors)
         })
         
@@ -1262,6 +1324,117 @@ def api_student_details(student_id):
             'error': str(e)
         }), 500
 
+@bp.route('/api/v1/student/<int:student_id>/calendar-feed')
+@login_required
+@admin_required
+def api_student_calendar_feed(student_id):
+    """Get the subscribable .ics feed URL for a student"""
+    student = Student.query.get_or_404(student_id)
+    
+    if current_user.role == 'coordinator' and current_user.department_id != student.department_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify({
+        'success': True,
+        'feed_url': url_for('calendar.feed', token=generate_feed_token('student', student.id), _external=True)
+    })
+
+@bp.route('/api/v1/student/<int:student_id>/calendar-feed/reset', methods=['POST'])
+@login_required
+@admin_required
+def api_reset_student_calendar_feed(student_id):
+    """Revoke a student's feed links and return the new one"""
+    student = Student.query.get_or_404(student_id)
+    
+    if current_user.role == 'coordinator' and current_user.department_id != student.department_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    revoke_feed_token('student', student.id)
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'feed_url': url_for('calendar.feed', token=generate_feed_token('student', student.id), _external=True)
+    })
+
+# ============ TUTOR ASSIGNMENT ROUTES ============
+
+def _can_use_proposal(proposal):
+    """Coordinators only see proposals for their own department"""
+    if current_user.role != 'coordinator':
+        return True
+    return proposal['department_id'] is not None and current_user.can_access_department(proposal['department_id'])
+
+
+@bp.route('/tutor-assignment')
+@login_required
+@admin_required
+def tutor_assignment():
+    """Review a batch tutor assignment proposal"""
+    proposal_id = request.args.get('proposal')
+    proposal = load_proposal(proposal_id) if proposal_id else None
+    if proposal and not _can_use_proposal(proposal):
+        proposal = None
+    if proposal_id and not proposal:
+        flash('Assignment proposal not found. Please generate a new one.', 'error')
+
+    departments = Department.query.filter_by(is_active=True)
+    if current_user.role == 'coordinator':
+        departments = departments.filter(Department.id == current_user.department_id)
+    return render_template('admin/tutor_assignment.html', proposal=proposal, departments=departments.all())
+
+
+@bp.route('/tutor-assignment/propose', methods=['POST'])
+@login_required
+@admin_required
+def propose_tutor_assignment():
+    """Queue a proposal for all students without a tutor; nothing is scheduled yet"""
+    department_id = request.form.get('department_id', type=int)
+    duration = request.form.get('duration', type=int)
+
+    if current_user.role == 'coordinator':
+        department_id = department_id or current_user.department_id
+        if not current_user.can_access_department(department_id):
+            flash('Access denied. You can only assign tutors in your department.', 'error')
+            return redirect(url_for('admin.tutor_assignment'))
+
+    job = enqueue('propose_assignments',
+                  {'department_id': department_id, 'duration': duration, 'created_by': current_user.id},
+                  created_by=current_user.id)
+    db.session.commit()
+    flash('Assignment proposal queued; it opens for review once the job completes.', 'info')
+    return redirect(url_for('admin.job_details', job_id=job.id))
+
+
+@bp.route('/tutor-assignment/<proposal_id>/apply', methods=['POST'])
+@login_required
+@admin_required
+def apply_tutor_assignment(proposal_id):
+    """Schedule the accepted rows of a proposal"""
+    proposal = load_proposal(proposal_id)
+    if not proposal or not _can_use_proposal(proposal):
+        flash('Assignment proposal not found. Please generate a new one.', 'error')
+        return redirect(url_for('admin.tutor_assignment'))
+
+    row_ids = {int(r) for r in request.form.getlist('rows')}
+    if not row_ids:
+        flash('Select at least one assignment to apply.', 'warning')
+        return redirect(url_for('admin.tutor_assignment', proposal=proposal_id))
+
+    try:
+        created, skipped = apply_proposal(proposal, row_ids, created_by=current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error applying assignments: {str(e)}', 'error')
+        return redirect(url_for('admin.tutor_assignment', proposal=proposal_id))
+
+    message = f'{created} weekly class series scheduled.'
+    if skipped:
+        message += f' {len(skipped)} rows were skipped because the slot is no longer free.'
+    flash(message, 'success')
+    return redirect(url_for('admin.classes'))
+
+
 # ============ TIMETABLE MANAGEMENT ============
 
 @bp.route('/timetable')
@@ -1298,41 +1471,37 @@ def api_timetable_week():
         start_of_week = target_date - timedelta(days=target_date.weekday())
         end_of_week = start_of_week + timedelta(days=6)
         
+        if wants_compact():
+            # Column arrays straight from a Core query; see app/utils/timetable.py
+            rows = timetable_rows(start_of_week, end_of_week)
+            statuses = [row[7] for row in rows]
+            completed_classes = statuses.count('completed')
+            payload = compact_payload(rows, start_of_week)
+            payload.update({
+                'success': True,
+                'stats': {
+                    'total_classes': len(rows),
+                    'scheduled_classes': statuses.count('scheduled'),
+                    'completed_classes': completed_classes,
+                    'completion_rate': round((completed_classes / len(rows) * 100) if rows else 0, 1)
+                },
+                'week_start': start_of_week.strftime('%Y-%m-%d'),
+                'week_end': end_of_week.strftime('%Y-%m-%d')
+            })
+            response = jsonify(payload)
+            response.mimetype = COMPACT_MIMETYPE
+            response.vary.add('Accept')
+            return response
+        
         classes = Class.query.filter(
             Class.scheduled_date >= start_of_week,
             Class.scheduled_date <= end_of_week
         ).order_by(Class.scheduled_date, Class.scheduled_time).all()
         
-        classes_data = []
-        for cls in classes:
-            try:
-                class_item = {
-                    'id': cls.id,
-                    'subject': cls.subject,
-                    'class_type': cls.class_type,
-                    'scheduled_date': cls.scheduled_date.strftime('%Y-%m-%d'),
-                    'scheduled_time': cls.scheduled_time.strftime('%H:%M'),
-                    'duration': cls.duration,
-                    'status': cls.status,
-                    'tutor_name': 'No Tutor Assigned',
-                    'student_count': 0
-                }
-                
-                # Get tutor name safely
-                if cls.tutor and hasattr(cls.tutor, 'user') and cls.tutor.user:
-                    class_item['tutor_name'] = cls.tutor.user.full_name
-                
-                # Get student count safely
-                try:
-                    if hasattr(cls, 'get_students'):
-                        student_ids = cls.get_students()
-                        class_item['student_count'] = len(student_ids) if student_ids else 0
-                except:
-                    pass
-                
-                classes_data.append(class_item)
-            except:
-                continue
+        # Recurring occurrences not yet materialized
+        classes = with_virtual_occurrences(classes, start_of_week, end_of_week)
+        
+        classes_data = TIMETABLE_WEEK_SCHEMA.dump_many(classes)
         
         # Simple stats
         total_classes = len(classes_data)
@@ -1346,13 +1515,15 @@ def api_timetable_week():
             'completion_rate': round((completed_classes / total_classes * 100) if total_classes > 0 else 0, 1)
         }
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'classes': classes_data,
             'stats': stats,
             'week_start': start_of_week.strftime('%Y-%m-%d'),
             'week_end': end_of_week.strftime('%Y-%m-%d')
         })
+        response.vary.add('Accept')
+        return response
         
     except Exception as e:
         return jsonify({
@@ -1370,40 +1541,9 @@ def api_timetable_today():
         
         classes = Class.query.filter(Class.scheduled_date == today)\
                            .order_by(Class.scheduled_time).all()
+        classes = with_virtual_occurrences(classes, today, today)
         
-        classes_data = []
-        for cls in classes:
-            try:
-                class_item = {
-                    'id': cls.id,
-                    'subject': cls.subject,
-                    'scheduled_time': cls.scheduled_time.strftime('%H:%M'),
-                    'duration': cls.duration,
-                    'status': cls.status,
-                    'tutor_name': 'No Tutor Assigned',
-                    'student_name': 'No Students'
-                }
-                
-                # Get tutor name
-                if cls.tutor and hasattr(cls.tutor, 'user') and cls.tutor.user:
-                    class_item['tutor_name'] = cls.tutor.user.full_name
-                
-                # Get first student name
-                try:
-                    if hasattr(cls, 'get_students'):
-                        student_ids = cls.get_students()
-                        if student_ids:
-                            students = Student.query.filter(Student.id.in_(student_ids)).all()
-                            if students:
-                                class_item['student_name'] = students[0].full_name
-                                if len(students) > 1:
-                                    class_item['student_name'] += f' +{len(students)-1} more'
-                except:
-                    pass
-                
-                classes_data.append(class_item)
-            except:
-                continue
+        classes_data = TIMETABLE_TODAY_SCHEMA.dump_many(classes)
         
         return jsonify({
             'success': True,
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user, login_required
+from werkzeug.security import check_password_hash
 from urllib.parse import urlparse as url_parse
 from app import db
 from app.models.user import User
@@ -0,0 +1,29 @@
+from flask import Blueprint, abort, send_file, current_app
+from app.utils.calendar_feed import verify_feed_token, get_feed_file
+
+bp = Blueprint('calendar', __name__)
+
+@bp.route('/<token>.ics')
+def feed(token):
+    """Tokenized iCalendar feed for a tutor or student (no login required)"""
+    owner = verify_feed_token(token)
+    if not owner:
+        abort(404)
+    
+    result = get_feed_file(*owner)
+    if result is None:
+        abort(404)
+    
+    path, version = result
+    owner_type, owner_id = owner
+    
+    # Conditional requests are answered from the ETag/file mtime with a 304
+    response = send_file(
+        path,
+        mimetype='text/calendar',
+        etag=f'{owner_type}-{owner_id}-{version}',
+        conditional=True,
+        max_age=current_app.config.get('CALENDAR_FEED_MAX_AGE', 900)
+    )
+    response.headers['Cache-Control'] = f"private, max-age={current_app.config.get('CALENDAR_FEED_MAX_AGE', 900)}"
+    return response
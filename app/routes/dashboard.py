@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, make_response
 from flask_login import login_required, current_user
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, and_
+import time
+from sqlalchemy import func, and_, case, distinct
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.user import User
 from app.models.department import Department
@@ -9,9 +11,18 @@ from app.models.tutor import Tutor
 from app.models.student import Student
 from app.models.class_model import Class
 from app.models.attendance import Attendance
+from app.utils.identity import get_current_tutor_profile
+from app.utils.routing import replica_reads
+from app.utils.dashboard_cache import ENTITY_TABLES, memoized, dashboard_etag, not_modified, cacheable
 
 bp = Blueprint('dashboard', __name__)
 
+# Tables each cached view reads
+STATS_TABLES = ('users', 'students', 'classes', 'attendance', 'departments')
+CHART_TABLES = ('attendance',)
+ALERT_TABLES = ('attendance', 'users', 'tutors', 'students')
+TASK_TABLES = ('tutors', 'students', 'classes')
+
 @bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -31,8 +42,16 @@ def admin_dashboard():
         flash('Access denied. Insufficient permissions.', 'error')
         return redirect(url_for('dashboard.index'))
     
+    # The page embeds the viewer's name and a CSRF token, so its ETag is per
+    # user and turns over before the token could expire
+    token_window = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    etag = dashboard_etag('dashboard', ENTITY_TABLES, current_user.id, int(time.time() // (token_window / 2)))
+    cached = not_modified(etag, page=True)
+    if cached:
+        return cached
+    
     # Get statistics
-    stats = get_dashboard_statistics()
+    stats = memoized('dashboard-stats', STATS_TABLES, get_dashboard_statistics)
     
     # Get today's classes
     today = date.today()
@@ -44,18 +63,19 @@ def admin_dashboard():
     recent_tutors = Tutor.query.filter(Tutor.created_at >= week_ago).order_by(Tutor.created_at.desc()).limit(5).all()
     
     # Get attendance alerts (late arrivals, absences)
-    attendance_alerts = get_attendance_alerts()
+    attendance_alerts = memoized('dashboard-alerts', ALERT_TABLES, get_attendance_alerts)
     
     # Get pending tasks
-    pending_tasks = get_pending_tasks()
+    pending_tasks = memoized('dashboard-tasks', TASK_TABLES, get_pending_tasks)
     
-    return render_template('dashboard/admin_dashboard.html',
+    response = make_response(render_template('dashboard/admin_dashboard.html',
                          stats=stats,
                          todays_classes=todays_classes,
                          recent_students=recent_students,
                          recent_tutors=recent_tutors,
                          attendance_alerts=attendance_alerts,
-                         pending_tasks=pending_tasks)
+                         pending_tasks=pending_tasks))
+    return cacheable(response, etag)
 
 @bp.route('/tutor-dashboard')
 @login_required
@@ -65,43 +85,37 @@ def tutor_dashboard():
         flash('Access denied. This page is for tutors only.', 'error')
         return redirect(url_for('dashboard.index'))
     
-    tutor = Tutor.query.filter_by(user_id=current_user.id).first()
+    tutor = get_current_tutor_profile(current_user)
     if not tutor:
         flash('Tutor profile not found. Please contact administrator.', 'error')
         return redirect(url_for('dashboard.index'))
     
-    # Get tutor statistics
-    tutor_stats = get_tutor_statistics(tutor)
-    
-    # Get today's classes
     today = date.today()
-    todays_classes = Class.get_classes_for_date(today, tutor_id=tutor.id)
-    
-    # Get this week's classes
     week_start = today - timedelta(days=today.weekday())
     week_end = week_start + timedelta(days=6)
-    week_classes = Class.query.filter(
+    month_start = today.replace(day=1)
+    upcoming_end = today + timedelta(days=7)
+    
+    # One query for the window covering this month so far, this week and the
+    # next 7 days; today, week and upcoming are carved out of it in memory
+    window_classes = Class.query.options(joinedload(Class.primary_student)).filter(
         Class.tutor_id == tutor.id,
-        Class.scheduled_date >= week_start,
-        Class.scheduled_date <= week_end
+        Class.scheduled_date >= min(week_start, month_start),
+        Class.scheduled_date <= max(week_end, upcoming_end)
     ).order_by(Class.scheduled_date, Class.scheduled_time).all()
     
-    # Get upcoming classes (next 7 days)
-    upcoming_classes = Class.query.filter(
-        Class.tutor_id == tutor.id,
-        Class.scheduled_date > today,
-        Class.scheduled_date <= today + timedelta(days=7),
-        Class.status.in_(['scheduled'])
-    ).order_by(Class.scheduled_date, Class.scheduled_time).limit(10).all()
+    todays_classes = [cls for cls in window_classes if cls.scheduled_date == today]
+    week_classes = [cls for cls in window_classes if week_start <= cls.scheduled_date <= week_end]
+    upcoming_classes = [
+        cls for cls in window_classes
+        if today < cls.scheduled_date <= upcoming_end and cls.status == 'scheduled'
+    ][:10]
     
-    # Get recent attendance
-    recent_attendance = Attendance.query.filter_by(tutor_id=tutor.id)\
-        .order_by(Attendance.class_date.desc()).limit(10).all()
+    # Get tutor statistics (one aggregate query)
+    tutor_stats = get_tutor_statistics(tutor, window_classes)
     
     # Get monthly earnings
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    monthly_earnings = tutor.get_monthly_earnings(current_month, current_year)
+    monthly_earnings = tutor.get_monthly_earnings(today.month, today.year)
     
     return render_template('dashboard/tutor_dashboard.html',
                          tutor=tutor,
@@ -109,7 +123,6 @@ def tutor_dashboard():
                          todays_classes=todays_classes,
                          week_classes=week_classes,
                          upcoming_classes=upcoming_classes,
-                         recent_attendance=recent_attendance,
                          monthly_earnings=monthly_earnings)
 
 @bp.route('/api/dashboard-stats')
@@ -119,16 +132,31 @@ def api_dashboard_stats():
     if current_user.role not in ['superadmin', 'admin', 'coordinator']:
         return jsonify({'error': 'Access denied'}), 403
     
-    stats = get_dashboard_statistics()
-    return jsonify(stats)
+    etag = dashboard_etag('dashboard-stats', STATS_TABLES)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    stats = memoized('dashboard-stats', STATS_TABLES, get_dashboard_statistics)
+    return cacheable(jsonify(stats), etag)
 
 @bp.route('/api/attendance-chart')
 @login_required
+@replica_reads
 def api_attendance_chart():
     """API endpoint for attendance chart data"""
     if current_user.role not in ['superadmin', 'admin', 'coordinator']:
         return jsonify({'error': 'Access denied'}), 403
     
+    etag = dashboard_etag('attendance-chart', CHART_TABLES)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return cacheable(jsonify(memoized('attendance-chart', CHART_TABLES, get_attendance_chart)), etag)
+
+def get_attendance_chart():
+    """Attendance chart data for the last 30 days"""
     # Get attendance data for last 30 days
     end_date = date.today()
     start_date = end_date - timedelta(days=30)
@@ -168,8 +196,9 @@ def api_attendance_chart():
         ]
     }
     
-    return jsonify(chart_data)
+    return chart_data
 
+@replica_reads
 def get_dashboard_statistics():
     """Get dashboard statistics for admin roles"""
     stats = {}
@@ -211,8 +240,8 @@ def get_dashboard_statistics():
     for dept in departments:
         dept_stats = {
             'name': dept.name,
-            'tutors': User.query.filter_by(department_id=dept.id, role='tutor', is_active=True).count(),
-            'students': Student.query.filter_by(department_id=dept.id, is_active=True).count()
+            'tutors': dept.get_tutor_count(),
+            'students': dept.get_student_count()
         }
         stats['departments'].append(dept_stats)
     
@@ -222,45 +251,78 @@ def get_dashboard_statistics():
     
     return stats
 
-def get_tutor_statistics(tutor):
-    """Get statistics for tutor dashboard"""
+def _capped(column, factor, cap):
+    """SQL for min(column * factor, cap) when column > 0, else 0"""
+    value = func.coalesce(column, 0) * factor
+    return case((func.coalesce(column, 0) <= 0, 0), (value > cap, cap), else_=value)
+
+
+def get_tutor_statistics(tutor, window_classes):
+    """Get statistics for tutor dashboard
+
+    ``window_classes`` are the tutor's classes from at least the start of the
+    month to today. Everything else comes from a single aggregate query over
+    attendance with the class totals as scalar subqueries.
+    """
     stats = {}
+    today = date.today()
     
-    # Class statistics
+    # Class statistics (maintained counters)
     stats['total_classes'] = tutor.total_classes
     stats['completed_classes'] = tutor.completed_classes
     stats['completion_rate'] = tutor.get_completion_rate()
     
     # This month's classes
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    month_start = date(current_year, current_month, 1)
+    month_start = today.replace(day=1)
+    stats['this_month_classes'] = sum(1 for cls in window_classes if month_start <= cls.scheduled_date <= today)
     
-    stats['this_month_classes'] = Class.query.filter(
+    student_count = db.session.query(func.count(distinct(Class.primary_student_id)))\
+        .filter(Class.tutor_id == tutor.id).scalar_subquery()
+    upcoming_count = db.session.query(func.count(Class.id)).filter(
         Class.tutor_id == tutor.id,
-        Class.scheduled_date >= month_start,
-        Class.scheduled_date <= date.today()
-    ).count()
-    
-    # Attendance statistics
-    attendance_summary = Attendance.get_attendance_summary(tutor_id=tutor.id)
-    stats['attendance'] = attendance_summary
+        Class.scheduled_date > today,
+        Class.status == 'scheduled'
+    ).scalar_subquery()
+    
+    # Same score as Attendance.get_punctuality_score, computed in SQL
+    punctuality = 100 - _capped(Attendance.tutor_late_minutes, 2, 50) \
+        - _capped(Attendance.student_late_minutes, 1, 25) \
+        - _capped(Attendance.tutor_early_leave_minutes, 3, 60)
+    
+    row = db.session.query(
+        func.count(Attendance.id),
+        func.sum(case((Attendance.tutor_present == True, 1), else_=0)),
+        func.sum(case((Attendance.tutor_late_minutes > 0, 1), else_=0)),
+        func.sum(case((Attendance.tutor_late_minutes > 0, Attendance.tutor_late_minutes), else_=0)),
+        func.sum(func.coalesce(Attendance.penalty_amount, 0)),
+        func.avg(case((punctuality < 0, 0), else_=punctuality)),
+        student_count,
+        upcoming_count
+    ).filter(Attendance.tutor_id == tutor.id).one()
+    total, present, late, late_minutes, penalty, punctuality_avg, students, upcoming = row
+    
+    # Attendance statistics (same shape as Attendance.get_attendance_summary)
+    attendance = {
+        'total_classes': total,
+        'present_count': int(present or 0),
+        'absent_count': total - int(present or 0),
+        'late_count': int(late or 0),
+        'total_late_minutes': int(late_minutes or 0),
+        'total_penalty': penalty or 0,
+        'average_punctuality_score': float(punctuality_avg or 0)
+    }
+    if total:
+        attendance['attendance_percentage'] = attendance['present_count'] / total * 100
+    stats['attendance'] = attendance
     
     # Student count
-    unique_students = db.session.query(Class.primary_student_id)\
-        .filter_by(tutor_id=tutor.id)\
-        .distinct().count()
-    stats['total_students'] = unique_students
+    stats['total_students'] = students
     
     # Rating
     stats['rating'] = tutor.rating
     
     # Upcoming classes count
-    stats['upcoming_classes'] = Class.query.filter(
-        Class.tutor_id == tutor.id,
-        Class.scheduled_date > date.today(),
-        Class.status == 'scheduled'
-    ).count()
+    stats['upcoming_classes'] = upcoming
     
     return stats
 
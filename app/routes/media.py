@@ -0,0 +1,91 @@
+from flask import Blueprint, abort, redirect, request, send_file, url_for
+from flask_login import login_required, current_user
+from app import db
+from app.models.class_model import Class
+from app.models.stored_file import StoredFile, FileReference
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.utils.images import ensure_thumbnail
+from app.utils.media import send_media
+from app.utils.storage import parse_name
+
+bp = Blueprint('media', __name__)
+
+# Thumbnail URLs never change content (upload names are unique)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+@bp.route('/thumb/<subfolder>/<size>/<path:filename>')
+def thumbnail(subfolder, size, filename):
+    """Square thumbnail of an uploaded image, WebP when the browser accepts it"""
+    # Browsers that decode WebP list it explicitly; */* alone does not count
+    webp = any(mimetype == 'image/webp' for mimetype, quality in request.accept_mimetypes if quality)
+    path = ensure_thumbnail(subfolder, filename, size, 'webp' if webp else 'fallback')
+    if path is None:
+        # Not an image we can thumbnail; fall back to the original upload
+        if '/' in filename or filename.startswith('.'):
+            abort(404)
+        return redirect(url_for('static', filename=f'uploads/{subfolder}/{filename}'))
+
+    response = send_file(path, conditional=True, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept')
+    return response
+
+
+def _owners(subfolder, filename):
+    """(user_id, department_id) of whoever a protected upload belongs to"""
+    digest = parse_name(filename)
+    if digest:
+        owners = []
+        references = FileReference.query.join(StoredFile).filter(StoredFile.digest == digest).all()
+        for reference in references:
+            if reference.owner_type == 'student':
+                student = db.session.get(Student, reference.owner_id)
+                owners.append((None, student.department_id if student else None))
+                continue
+            if reference.owner_type == 'class':
+                class_obj = db.session.get(Class, reference.owner_id)
+                tutor = class_obj.tutor if class_obj else None
+            else:
+                tutor = db.session.get(Tutor, reference.owner_id)
+            if tutor:
+                owners.append((tutor.user_id, tutor.user.department_id if tutor.user else None))
+        return owners
+
+    # Uploads saved before the content-addressed store
+    owners = []
+    if subfolder == 'videos':
+        tutors = Tutor.query.filter(
+            (Tutor.demo_video == filename) | (Tutor.interview_video == filename)
+        ).all()
+        tutors += [c.tutor for c in Class.query.filter_by(video_link=filename).all() if c.tutor]
+        owners += [(t.user_id, t.user.department_id if t.user else None) for t in tutors]
+    else:
+        for tutor in Tutor.query.filter(Tutor.documents.like(f'%"{filename}"%')):
+            if filename in tutor.get_documents().values():
+                owners.append((tutor.user_id, tutor.user.department_id if tutor.user else None))
+        for student in Student.query.filter(Student.documents.like(f'%"{filename}"%')):
+            if filename in student.get_documents().values():
+                owners.append((None, student.department_id))
+    return owners
+
+
+def _can_access(subfolder, filename):
+    if current_user.role in ['superadmin', 'admin']:
+        return True
+    owners = _owners(subfolder, filename)
+    if current_user.role == 'coordinator':
+        return any(department_id == current_user.department_id for _, department_id in owners)
+    return any(user_id == current_user.id for user_id, _ in owners)
+
+
+@bp.route('/<any(videos, documents):subfolder>/<filename>')
+@login_required
+def protected(subfolder, filename):
+    """Video or document upload, sent with Range support after an access check"""
+    if not _can_access(subfolder, filename):
+        abort(404)
+    response = send_media(subfolder, filename, as_attachment=request.args.get('download') == '1')
+    if response is None:
+        abort(404)
+    return response
@@ -6,6 +6,7 @@ from app.models.student import Student
 from app.models.class_model import Class
 from app.models.attendance import Attendance
 from app.models.tutor import Tutor
+from app.utils.serialization import STUDENT_SEARCH_SCHEMA
 from functools import wraps
 bp = Blueprint('student', __name__)
 
@@ -398,16 +399,4 @@ def search_students():
     
     students = search_query.limit(20).all()
     
-    results = []
-    for student in students:
-        results.append({
-            'id': student.id,
-            'name': student.full_name,
-            'email': student.email,
-            'grade': student.grade,
-            'board': student.board,
-            'department': student.department.name if student.department else '',
-            'enrollment_status': student.enrollment_status
-        })
-    
-    return jsonify(results)
\ No newline at end of file
+    return jsonify(STUDENT_SEARCH_SCHEMA.dump_many(students))
\ No newline at end of file
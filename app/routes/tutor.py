@@ -1,13 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from flask_wtf.csrf import generate_csrf
 from datetime import datetime, date, timedelta
-import os
+import json
+from sqlalchemy import func, case
 from app import db
-from app.models.tutor import Tutor
 from app.models.student import Student
 from app.models.class_model import Class
 from app.models.attendance import Attendance
+from app.utils.cache import get_versions
+from app.utils.identity import get_current_tutor_profile
+from app.utils.calendar_feed import generate_feed_token, revoke_feed_token, feed_cache_key, NAMES_KEY
+from app.utils.series import with_virtual_occurrences
+from app.utils.serialization import CALENDAR_EVENT_SCHEMA
+from app.utils.storage import store_file
 from functools import wraps
 
 bp = Blueprint('tutor', __name__)
@@ -23,8 +29,8 @@ def tutor_required(f):
     return decorated_function
 
 def get_current_tutor():
-    """Get current user's tutor profile"""
-    return Tutor.query.filter_by(user_id=current_user.id).first()
+    """Get current user's tutor profile (memoized for the request)"""
+    return get_current_tutor_profile(current_user)
 
 @bp.route('/my-classes')
 @login_required
@@ -72,16 +78,36 @@ def my_classes():
         scheduled_date=today
     ).order_by(Class.scheduled_time).all()
     
+    calendar_feed_url = url_for('calendar.feed', token=generate_feed_token('tutor', tutor.id), _external=True)
+    
     return render_template('tutor/my_classes.html', 
                          classes=classes, todays_classes=todays_classes,
-                         tutor=tutor)
+                         tutor=tutor, calendar_feed_url=calendar_feed_url,
+                         csrf_token=generate_csrf)
+
+@bp.route('/calendar-feed/reset', methods=['POST'])
+@login_required
+@tutor_required
+def reset_calendar_feed():
+    """Issue a new calendar feed link; the old one stops working"""
+    tutor = get_current_tutor()
+    if not tutor:
+        flash('Tutor profile not found.', 'error')
+        return redirect(url_for('dashboard.index'))
+
+    revoke_feed_token('tutor', tutor.id)
+    db.session.commit()
+    flash('Your calendar feed link has been reset. Subscribe again with the new link.', 'success')
+    return redirect(url_for('tutor.my_classes'))
 
 @bp.route('/today-classes')
 @login_required
 @tutor_required
 def today_classes():
     """View today's classes for tutor"""
-    tutor = Tutor.query.filter_by(user_id=current_user.id).first_or_404()
+    tutor = get_current_tutor()
+    if not tutor:
+        abort(404)
     today = date.today()
     
     # Get today's classes
@@ -120,7 +146,9 @@ def today_classes():
 @tutor_required
 def class_details(class_id):
     """View detailed information about a specific class"""
-    tutor = Tutor.query.filter_by(user_id=current_user.id).first_or_404()
+    tutor = get_current_tutor()
+    if not tutor:
+        abort(404)
     
     # Get the class and verify it belongs to this tutor
     class_item = Class.query.filter_by(id=class_id, tutor_id=tutor.id).first_or_404()
@@ -267,57 +295,108 @@ def mark_attendance():
         db.session.rollback()
         return jsonify({'error': 'Error marking attendance'}), 500
 
+def _tutor_student_ids(tutor_id):
+    """Every student in any of the tutor's classes (primary or group member)"""
+    student_ids = set()
+    rows = db.session.query(Class.class_type, Class.primary_student_id, Class.students)\
+        .filter(Class.tutor_id == tutor_id).distinct().all()
+    for class_type, primary_student_id, raw_students in rows:
+        # Same membership rule as Class.get_students
+        if class_type == 'one_on_one':
+            if primary_student_id:
+                student_ids.add(primary_student_id)
+        elif raw_students:
+            try:
+                student_ids.update(json.loads(raw_students))
+            except (TypeError, ValueError):
+                pass
+    return student_ids
+
+
+def get_my_students_view(tutor, page=1, per_page=30, grade=None):
+    """View model for the my-students page
+
+    A fixed number of queries however many students the tutor has: membership,
+    a grade/status rollup, the page of students, one attendance aggregate
+    grouped by student and one fetch of upcoming classes grouped in memory.
+    """
+    student_ids = _tutor_student_ids(tutor.id)
+    
+    # Header figures and the grade filter cover all students, not just this page
+    rollup = db.session.query(Student.grade, Student.enrollment_status, func.count(Student.id))\
+        .filter(Student.id.in_(student_ids)).group_by(Student.grade, Student.enrollment_status).all() \
+        if student_ids else []
+    grades = sorted({row_grade for row_grade, _, _ in rollup if row_grade})
+    
+    query = Student.query.filter(Student.id.in_(student_ids or [0]))
+    if grade:
+        query = query.filter(Student.grade == grade)
+    students = query.order_by(Student.full_name).paginate(page=page, per_page=per_page, error_out=False)
+    
+    # Attendance of each student in this tutor's classes
+    student_attendance = {}
+    if student_ids:
+        rows = db.session.query(
+            Attendance.student_id,
+            func.count(Attendance.id),
+            func.sum(case((Attendance.student_present == True, 1), else_=0))
+        ).filter(Attendance.tutor_id == tutor.id).group_by(Attendance.student_id).all()
+        for student_id, total, attended in rows:
+            attended = int(attended or 0)
+            student_attendance[student_id] = {
+                'total_classes': total,
+                'attended': attended,
+                'absent': total - attended,
+                'percentage': attended / total * 100 if total else 0
+            }
+    
+    # Next 5 classes per student from a single upcoming fetch
+    upcoming = Class.query.filter(
+        Class.tutor_id == tutor.id,
+        Class.scheduled_date >= date.today(),
+        Class.status == 'scheduled'
+    ).order_by(Class.scheduled_date, Class.scheduled_time).all()
+    student_upcoming_classes = {}
+    for cls in upcoming:
+        for student_id in cls.get_students():
+            classes = student_upcoming_classes.setdefault(student_id, [])
+            if len(classes) < 5:
+                classes.append(cls)
+    
+    return {
+        'students': students.items,
+        'pagination': students,
+        'total_students': len(student_ids),
+        'active_students': sum(count for _, status, count in rollup if status == 'active'),
+        'grades': grades,
+        'selected_grade': grade,
+        'student_attendance': student_attendance,
+        'student_upcoming_classes': student_upcoming_classes,
+        # Less than 75% attendance
+        'low_attendance_count': sum(
+            1 for student_id, data in student_attendance.items()
+            if student_id in student_ids and data['percentage'] < 75
+        ),
+        'upcoming_classes_count': len(upcoming)
+    }
+
+
 @bp.route('/my-students')
 @login_required
 @tutor_required
 def my_students():
     """View tutor's assigned students"""
-    tutor = Tutor.query.filter_by(user_id=current_user.id).first_or_404()
-    
-    # Get students from classes taught by this tutor
-    student_ids = set()
-    classes = Class.query.filter_by(tutor_id=tutor.id).all()
-    
-    for cls in classes:
-        student_ids.update(cls.get_students())
-    
-    students = Student.query.filter(Student.id.in_(student_ids)).all() if student_ids else []
-    
-    # Get attendance data for each student
-    student_attendance = {}
-    for student in students:
-        attendance_summary = Attendance.get_attendance_summary(student_id=student.id, tutor_id=tutor.id)
-        student_attendance[student.id] = attendance_summary
-    
-    # Get upcoming classes for each student
-    student_upcoming_classes = {}
-    for student in students:
-        upcoming = Class.query.filter(
-            Class.tutor_id == tutor.id,
-            Class.scheduled_date >= date.today(),
-            Class.status == 'scheduled'
-        ).order_by(Class.scheduled_date, Class.scheduled_time).all()
-        
-        student_classes = [cls for cls in upcoming if student.id in cls.get_students()]
-        student_upcoming_classes[student.id] = student_classes[:5]  # Next 5 classes
-    
-    # Get unique grades
-    grades = sorted(list(set(s.grade for s in students if s.grade)))
-    
-    # Count low attendance students (less than 75%)
-    low_attendance_count = sum(1 for s in students 
-                              if student_attendance.get(s.id, {}).get('percentage', 100) < 75)
-    
-    # Count total upcoming classes
-    upcoming_classes_count = sum(len(classes) for classes in student_upcoming_classes.values())
+    tutor = get_current_tutor()
+    if not tutor:
+        abort(404)
     
-    return render_template('tutor/my_students.html',
-                         students=students,
-                         student_attendance=student_attendance,
-                         student_upcoming_classes=student_upcoming_classes,
-                         grades=grades,
-                         low_attendance_count=low_attendance_count,
-                         upcoming_classes_count=upcoming_classes_count)
+    view = get_my_students_view(
+        tutor,
+        page=request.args.get('page', 1, type=int),
+        per_page=current_app.config.get('MY_STUDENTS_PER_PAGE', 30),
+        grade=request.args.get('grade') or None
+    )
+    return render_template('tutor/my_students.html', **view)
 
 @bp.route('/attendance')
 @login_required
@@ -437,17 +516,11 @@ def upload_video(class_id):
         return jsonify({'error': 'Invalid video format'}), 400
     
     try:
-        # Save video file
-        filename = secure_filename(video_file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        filename = f"class_{class_id}_{timestamp}{filename}"
-        
-        video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', filename)
-        os.makedirs(os.path.dirname(video_path), exist_ok=True)
-        video_file.save(video_path)
+        # Save video file (deduplicated by content)
+        stored = store_file(video_file)
         
         # Update class record
-        class_obj.video_link = filename
+        class_obj.video_link = stored.name
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Video uploaded successfully'})
@@ -490,42 +563,29 @@ def calendar_data():
         next_month = today.replace(day=28) + timedelta(days=4)
         end_date_obj = next_month - timedelta(days=next_month.day)
     
+    # Same version keys as the tutor's .ics feed: unchanged classes and names answer with a 304
+    feed_key = feed_cache_key('tutor', tutor.id)
+    versions = get_versions(feed_key, NAMES_KEY)
+    etag = f'tutor-{tutor.id}-{versions[feed_key]}.{versions[NAMES_KEY]}-{start_date_obj}-{end_date_obj}'
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
     # Get classes in date range
     classes = Class.query.filter(
         Class.tutor_id == tutor.id,
         Class.scheduled_date >= start_date_obj,
         Class.scheduled_date <= end_date_obj
     ).all()
+    classes = with_virtual_occurrences(classes, start_date_obj, end_date_obj, tutor_id=tutor.id)
     
-    # Format for calendar
-    events = []
-    for cls in classes:
-        events.append({
-            'id': cls.id,
-            'title': f"{cls.subject} - {cls.primary_student.full_name if cls.primary_student else 'Group Class'}",
-            'start': f"{cls.scheduled_date}T{cls.scheduled_time}",
-            'end': f"{cls.scheduled_date}T{cls.end_time}",
-            'backgroundColor': get_status_color(cls.status),
-            'borderColor': get_status_color(cls.status),
-            'extendedProps': {
-                'status': cls.status,
-                'student_count': len(cls.get_students()),
-                'class_type': cls.class_type
-            }
-        })
+    events = CALENDAR_EVENT_SCHEMA.dump_many(classes)
     
-    return jsonify(events)
-
-def get_status_color(status):
-    """Get color for class status"""
-    colors = {
-        'scheduled': '#F1A150',
-        'ongoing': '#28A745',
-        'completed': '#17A2B8',
-        'cancelled': '#DC3545',
-        'rescheduled': '#FFC107'
-    }
-    return colors.get(status, '#6C757D')
+    response = jsonify(events)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @bp.route('/student/<int:student_id>')
 @login_required
@@ -0,0 +1,182 @@
+"""Hot/cold archival of historical classes and attendance.
+
+``classes`` and ``attendance`` only grow, and every list that scans them
+pays for years of history. Classes that are finished (``completed`` or
+``cancelled``) and older than ``ARCHIVE_AFTER_DAYS`` are moved, with their
+attendance, into ``classes_archive`` and ``attendance_archive``. Day-to-day
+queries keep using ``Class`` and ``Attendance`` and so only see the hot set.
+
+Each batch is one transaction: ``INSERT ... SELECT`` into the archive tables,
+``DELETE`` from the hot ones and a bump of the cache versions the rows fed.
+Rows keep their ids, so links and exports stay stable. Series rows that other
+classes point at through ``parent_class_id`` are never moved.
+
+The denormalized counters (``app.utils.counters``) are not touched by a move,
+and their reconciliation counts hot and archived rows alike. Anything that
+needs the full history reads it through ``class_source('all')`` /
+``attendance_source('all')``, which behave like ``Class`` / ``Attendance``
+in column queries::
+
+    cls = class_source('all')
+    db.session.query(cls.id, cls.subject).filter(cls.tutor_id == 3)
+
+Run it with ``flask archive-classes`` or as an ``archive_classes`` job.
+"""
+import os
+import socket
+from datetime import date, datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.archive import ArchivedAttendance, ArchivedClass
+from app.models.attendance import Attendance
+from app.models.class_model import Class
+from app.utils.cache import bump_versions, keys_for
+from app.utils.jobs import job_handler
+from app.utils.lifecycle import acquire_lease, release_lease
+
+LEASE_NAME = 'class-archiver'
+
+SCOPES = ('hot', 'archive', 'all')
+
+# Statuses a class can no longer leave
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+
+def _source(model, archive_model, scope):
+    if scope not in SCOPES or scope == 'hot':
+        return model
+    names = [column.name for column in model.__table__.columns]
+    archived = sa.select(*[archive_model.__table__.c[name] for name in names])
+    if scope == 'archive':
+        selectable = archived.subquery(f'{model.__tablename__}_archived')
+    else:
+        selectable = sa.union_all(sa.select(model.__table__), archived).subquery(f'{model.__tablename__}_all')
+    return aliased(model, selectable, adapt_on_names=True)
+
+
+def class_source(scope='hot'):
+    """``Class``, or an alias over the archive ('archive') or both ('all')"""
+    return _source(Class, ArchivedClass, scope)
+
+
+def attendance_source(scope='hot'):
+    """``Attendance``, or an alias over the archive ('archive') or both ('all')"""
+    return _source(Attendance, ArchivedAttendance, scope)
+
+
+def archivable_filter(before):
+    """Finished classes dated before ``before`` that nothing else refers to"""
+    parents = sa.select(Class.parent_class_id).where(Class.parent_class_id.isnot(None))
+    # SQLite hands the highest rowid out again once it is deleted; keeping the
+    # newest class hot keeps archived ids from being reused
+    newest = sa.select(sa.func.max(Class.id)).scalar_subquery()
+    return sa.and_(
+        Class.status.in_(ARCHIVABLE_STATUSES),
+        Class.scheduled_date < before,
+        sa.not_(sa.and_(Class.is_recurring == True, Class.parent_class_id.is_(None))),
+        Class.id.notin_(parents),
+        Class.id < newest,
+    )
+
+
+def _copy(model, archive_model, condition, archived_at):
+    names = [column.name for column in model.__table__.columns]
+    columns = [model.__table__.c[name] for name in names]
+    return sa.insert(archive_model.__table__).from_select(
+        names + ['archived_at'],
+        sa.select(*columns, sa.literal(archived_at, sa.DateTime)).where(condition)
+    )
+
+
+def archive_classes(before=None, batch_size=None, renew=None):
+    """Move archivable classes and their attendance in batches
+
+    Returns ``(classes, attendance records)`` moved. ``renew`` is called after
+    each committed batch and stops the run when it returns False.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 1000)
+    if before is None:
+        before = date.today() - timedelta(days=config.get('ARCHIVE_AFTER_DAYS', 365))
+
+    condition = archivable_filter(before)
+    moved_classes = moved_attendance = 0
+    while True:
+        batch = Class.query.filter(condition).order_by(Class.id).limit(batch_size).all()
+        if not batch:
+            break
+        ids = [cls.id for cls in batch]
+        records = Attendance.query.filter(Attendance.class_id.in_(ids)).all()
+
+        keys = set()
+        for obj in batch + records:
+            keys |= keys_for(obj)
+
+        now = datetime.utcnow()
+        db.session.execute(_copy(Class, ArchivedClass, Class.id.in_(ids), now))
+        db.session.execute(_copy(Attendance, ArchivedAttendance, Attendance.class_id.in_(ids), now))
+        db.session.execute(sa.delete(Attendance).where(Attendance.class_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.execute(sa.delete(Class).where(Class.id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        bump_versions(keys)
+        db.session.commit()
+        # The moved rows no longer exist in the hot tables
+        for obj in batch + records:
+            db.session.expunge(obj)
+
+        moved_classes += len(ids)
+        moved_attendance += len(records)
+        if renew and not renew(moved_classes):
+            break
+        if len(batch) < batch_size:
+            break
+
+    return moved_classes, moved_attendance
+
+
+def _holder(prefix):
+    return f'{prefix}:{socket.gethostname()}:{os.getpid()}'
+
+
+@job_handler('archive_classes')
+def archive_job(ctx, days=None):
+    """Archive job; one archiver runs at a time across workers and cron"""
+    holder = _holder(f'job:{ctx.job_id}')
+    if not acquire_lease(LEASE_NAME, holder, 600):
+        raise RuntimeError('Another archiver is running; try again later')
+
+    def renew(moved):
+        ctx.progress(moved, message=f'{moved} classes archived')
+        return acquire_lease(LEASE_NAME, holder, 600)
+
+    before = date.today() - timedelta(days=days) if days else None
+    try:
+        classes, records = archive_classes(before=before, renew=renew)
+    finally:
+        release_lease(LEASE_NAME, holder)
+    return {'classes': classes, 'attendance': records}
+
+
+def init_app(app):
+    """Register the archive command"""
+
+    @app.cli.command('archive-classes')
+    @click.option('--days', default=None, type=int, help='Archive classes older than this (default ARCHIVE_AFTER_DAYS)')
+    @click.option('--batch-size', default=None, type=int, help='Classes per transaction (default ARCHIVE_BATCH_SIZE)')
+    def archive_classes_command(days, batch_size):
+        """Move old finished classes and their attendance to the archive tables"""
+        holder = _holder('cli')
+        if not acquire_lease(LEASE_NAME, holder, 600):
+            print('Another worker is archiving classes; try again later')
+            return
+        before = date.today() - timedelta(days=days) if days is not None else None
+        try:
+            classes, records = archive_classes(before=before, batch_size=batch_size,
+                                               renew=lambda moved: acquire_lease(LEASE_NAME, holder, 600))
+        finally:
+            release_lease(LEASE_NAME, holder)
+        print(f'Archived {classes} classes and {records} attendance records')
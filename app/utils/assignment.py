@@ -0,0 +1,507 @@
+"""Batch tutor assignment for students without a tutor.
+
+Every active student subject that has no upcoming class is a *demand*. The
+solver matches demands to active tutors that teach the subject, grade and
+board, have spare capacity, and share a free weekly slot with the student.
+
+Availability is turned into weekly bitmaps (one bit per
+``SLOT_MINUTES``), so testing a tutor/student pair for a common session is a
+few integer operations. Candidate tutors come from an index built once per
+(subject, grade, board) combination. Demands are assigned greedily, most
+constrained first, and a repair pass then moves already placed students to
+other tutors to make room for those left over. The repair pass is bounded by
+``REPAIR_ATTEMPTS`` and ends as soon as no tutor has capacity left, since a
+move then has nowhere to go.
+
+The result is a proposal saved as JSON, computed by a ``propose_assignments``
+job. Nothing is scheduled until an admin applies it; each accepted row then
+becomes a weekly class series.
+"""
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy.orm import load_only
+from app import db
+from app.models.class_model import Class
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.models.user import User
+from app.utils.jobs import job_handler
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+FULL_WEEK = (1 << (SLOTS_PER_DAY * len(DAYS))) - 1
+
+# Limits for the repair pass
+REPAIR_TUTORS = 10
+REPAIR_MOVES = 10
+REPAIR_ATTEMPTS = 20000  # Moves tried across the whole pass
+
+
+def _minutes(value):
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def availability_bitmap(availability):
+    """Weekly bitmap of the slots fully covered by an availability dict"""
+    bitmap = 0
+    for day_index, day in enumerate(DAYS):
+        for window in (availability or {}).get(day, []):
+            try:
+                first = -(-_minutes(window['start']) // SLOT_MINUTES)
+                last = _minutes(window['end']) // SLOT_MINUTES
+            except (KeyError, ValueError):
+                continue
+            for slot in range(max(first, 0), min(last, SLOTS_PER_DAY)):
+                bitmap |= 1 << (day_index * SLOTS_PER_DAY + slot)
+    return bitmap
+
+
+def session_mask(day_index, start_minutes, duration):
+    length = max(-(-duration // SLOT_MINUTES), 1)
+    first = day_index * SLOTS_PER_DAY + start_minutes // SLOT_MINUTES
+    return ((1 << length) - 1) << first
+
+
+def _valid_starts(length):
+    """Bits where a session of ``length`` slots can start without crossing midnight"""
+    day_starts = (1 << (SLOTS_PER_DAY - length + 1)) - 1
+    mask = 0
+    for day_index in range(len(DAYS)):
+        mask |= day_starts << (day_index * SLOTS_PER_DAY)
+    return mask
+
+
+def find_session(free, length, valid_starts):
+    """Mask of the earliest run of ``length`` free slots, or 0"""
+    runs = free
+    for offset in range(1, length):
+        runs &= free >> offset
+    runs &= valid_starts
+    if not runs:
+        return 0
+    start = (runs & -runs).bit_length() - 1
+    return ((1 << length) - 1) << start
+
+
+def describe_session(mask):
+    start = (mask & -mask).bit_length() - 1
+    day_index, slot = divmod(start, SLOTS_PER_DAY)
+    minutes = slot * SLOT_MINUTES
+    return DAYS[day_index], f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class _TutorState:
+    __slots__ = ('id', 'name', 'rating', 'free', 'remaining', 'assigned')
+
+    def __init__(self, tutor_id, name, rating, free, remaining):
+        self.id = tutor_id
+        self.name = name
+        self.rating = rating
+        self.free = free
+        self.remaining = remaining
+        self.assigned = []
+
+
+class _Demand:
+    __slots__ = ('student_id', 'student_name', 'subject', 'grade', 'board', 'free', 'candidates', 'tutor', 'mask')
+
+    def __init__(self, student, subject, free):
+        self.student_id = student.id
+        self.student_name = student.full_name
+        self.subject = subject
+        self.grade = str(student.grade or '')
+        self.board = student.board or ''
+        self.free = free
+        self.candidates = ()
+        self.tutor = None
+        self.mask = 0
+
+
+class TutorIndex:
+    """Inverted index from subject, grade and board to tutor ids
+
+    Tutors without grades or boards accept any, as in
+    ``Student.get_compatible_tutors``. Subjects match when one name contains
+    the other; that check runs once per distinct student subject.
+    """
+
+    def __init__(self, tutors):
+        self.by_subject = defaultdict(set)
+        self.by_grade = defaultdict(set)
+        self.by_board = defaultdict(set)
+        self.any_grade = set()
+        self.any_board = set()
+        self.order = {}
+        self._subjects = {}
+        self._combos = {}
+
+        ranked = sorted(tutors, key=lambda t: (-t.rating, t.id))
+        for position, tutor in enumerate(ranked):
+            self.order[tutor.id] = position
+        for tutor in tutors:
+            for subject in tutor_subjects(tutor):
+                self.by_subject[subject].add(tutor.id)
+            grades = [str(g) for g in tutor.get_grades()]
+            boards = [b.lower() for b in tutor.get_boards()]
+            for grade in grades:
+                self.by_grade[grade].add(tutor.id)
+            for board in boards:
+                self.by_board[board].add(tutor.id)
+            if not grades:
+                self.any_grade.add(tutor.id)
+            if not boards:
+                self.any_board.add(tutor.id)
+
+    def _subject_tutors(self, subject):
+        if subject not in self._subjects:
+            matched = set()
+            for name, tutor_ids in self.by_subject.items():
+                if subject in name or name in subject:
+                    matched |= tutor_ids
+            self._subjects[subject] = matched
+        return self._subjects[subject]
+
+    def candidates(self, subject, grade, board):
+        """Matching tutor ids, best rated first"""
+        key = (subject, grade, board)
+        if key not in self._combos:
+            tutor_ids = self._subject_tutors(subject)
+            if grade:
+                tutor_ids = tutor_ids & (self.by_grade.get(grade, set()) | self.any_grade)
+            if board:
+                tutor_ids = tutor_ids & (self.by_board.get(board, set()) | self.any_board)
+            self._combos[key] = tuple(sorted(tutor_ids, key=self.order.__getitem__))
+        return self._combos[key]
+
+
+def tutor_subjects(tutor):
+    return {s.strip().lower() for s in tutor.get_subjects() if s and s.strip()}
+
+
+def _upcoming_classes(today):
+    """(tutor_id, primary_student_id, students, subject, date, time, duration) of upcoming classes"""
+    return db.session.query(
+        Class.tutor_id, Class.primary_student_id, Class.students, Class.subject,
+        Class.scheduled_date, Class.scheduled_time, Class.duration
+    ).filter(
+        Class.scheduled_date >= today,
+        Class.status.in_(['scheduled', 'ongoing'])
+    ).all()
+
+
+def _class_students(primary_student_id, students_json):
+    student_ids = set()
+    if primary_student_id:
+        student_ids.add(primary_student_id)
+    if students_json:
+        try:
+            student_ids.update(json.loads(students_json))
+        except (TypeError, ValueError):
+            pass
+    return student_ids
+
+
+def load_problem(today=None, department_id=None):
+    """Build tutor states and open demands from the database"""
+    today = today or date.today()
+    capacity = current_app.config.get('TUTOR_ASSIGNMENT_CAPACITY', 30)
+
+    tutors = Tutor.query.options(load_only(
+        Tutor.id, Tutor.user_id, Tutor.subjects, Tutor.grades, Tutor.boards,
+        Tutor.availability, Tutor.rating, Tutor.status
+    )).filter(Tutor.status == 'active').all()
+    names = dict(db.session.query(User.id, User.full_name).filter(
+        User.id.in_([t.user_id for t in tutors])
+    ).all()) if tutors else {}
+
+    students = Student.query.options(load_only(
+        Student.id, Student.full_name, Student.grade, Student.board,
+        Student.subjects_enrolled, Student.availability, Student.department_id
+    )).filter(Student.is_active == True)
+    if department_id:
+        students = students.filter(Student.department_id == department_id)
+    students = students.all()
+
+    # Existing upcoming classes cover demands, load tutors and block their week
+    covered = set()
+    load = defaultdict(set)
+    busy = defaultdict(int)
+    week_end = today + timedelta(days=7)
+    for tutor_id, primary_id, students_json, subject, day, start, duration in _upcoming_classes(today):
+        subject = (subject or '').strip().lower()
+        for student_id in _class_students(primary_id, students_json):
+            covered.add((student_id, subject))
+            load[tutor_id].add((student_id, subject))
+        if day < week_end:
+            busy[tutor_id] |= session_mask(day.weekday(), start.hour * 60 + start.minute, duration or 0)
+
+    states = {}
+    for tutor in tutors:
+        free = availability_bitmap(tutor.get_availability()) & ~busy[tutor.id]
+        remaining = capacity - len(load[tutor.id])
+        if free and remaining > 0:
+            states[tutor.id] = _TutorState(
+                tutor.id, names.get(tutor.user_id, 'Unknown'), tutor.rating or 0, free, remaining
+            )
+
+    index = TutorIndex([t for t in tutors if t.id in states])
+    demands = []
+    for student in students:
+        # Students without a schedule can take any slot the tutor offers
+        free = availability_bitmap(student.get_availability()) or FULL_WEEK
+        subjects = {s.strip().lower(): s.strip() for s in student.get_subjects_enrolled() if s and s.strip()}
+        for key, subject in subjects.items():
+            if (student.id, key) in covered:
+                continue
+            demand = _Demand(student, subject, free)
+            demand.candidates = index.candidates(key, demand.grade, demand.board.lower())
+            demands.append(demand)
+
+    return states, demands
+
+
+class Solver:
+    """Greedy assignment with a bounded repair pass"""
+
+    def __init__(self, tutors, demands, duration):
+        self.tutors = tutors
+        self.demands = demands
+        self.length = max(-(-duration // SLOT_MINUTES), 1)
+        self.valid_starts = _valid_starts(self.length)
+        # Session bitmaps already taken per student, so one student is not double booked
+        self.student_busy = defaultdict(int)
+        self.student_tutors = defaultdict(list)
+        # Tutors that can still take a student; a repair move needs one of them
+        self.open = {tutor_id for tutor_id, tutor in tutors.items() if tutor.remaining > 0}
+        self.attempts = 0
+
+    def _fit(self, demand, tutor):
+        if tutor.remaining <= 0:
+            return 0
+        free = tutor.free & demand.free & ~self.student_busy[demand.student_id]
+        return find_session(free, self.length, self.valid_starts)
+
+    def _place(self, demand, tutor, mask):
+        demand.tutor = tutor
+        demand.mask = mask
+        tutor.free &= ~mask
+        tutor.remaining -= 1
+        if tutor.remaining <= 0:
+            self.open.discard(tutor.id)
+        tutor.assigned.append(demand)
+        self.student_busy[demand.student_id] |= mask
+        self.student_tutors[demand.student_id].append(tutor.id)
+
+    def _release(self, demand):
+        tutor = demand.tutor
+        tutor.free |= demand.mask
+        tutor.remaining += 1
+        if tutor.remaining > 0:
+            self.open.add(tutor.id)
+        tutor.assigned.remove(demand)
+        self.student_busy[demand.student_id] &= ~demand.mask
+        self.student_tutors[demand.student_id].remove(tutor.id)
+        demand.tutor = None
+        demand.mask = 0
+
+    def _assign(self, demand, exclude=None):
+        # Prefer a tutor the student already has for another subject
+        preferred = [t for t in self.student_tutors[demand.student_id] if t in demand.candidates]
+        for tutor_id in preferred + list(demand.candidates):
+            if tutor_id == exclude:
+                continue
+            tutor = self.tutors[tutor_id]
+            mask = self._fit(demand, tutor)
+            if mask:
+                self._place(demand, tutor, mask)
+                return True
+        return False
+
+    def _repair(self, demand):
+        """Make room on a full or clashing tutor by moving one of its students elsewhere"""
+        for tutor_id in demand.candidates[:REPAIR_TUTORS]:
+            tutor = self.tutors[tutor_id]
+            for other in list(tutor.assigned[:REPAIR_MOVES]):
+                if self.attempts >= REPAIR_ATTEMPTS:
+                    return False
+                # The moved student needs another tutor with capacity
+                if not any(t in self.open for t in other.candidates if t != tutor_id):
+                    continue
+                self.attempts += 1
+                previous = other.mask
+                self._release(other)
+                mask = self._fit(demand, tutor)
+                if mask:
+                    self._place(demand, tutor, mask)
+                    if self._assign(other, exclude=tutor_id):
+                        return True
+                    self._release(demand)
+                self._place(other, tutor, previous)
+        return False
+
+    def solve(self):
+        # Most constrained first: fewest candidate tutors, then fewest free slots
+        order = sorted(self.demands, key=lambda d: (len(d.candidates), bin(d.free).count('1')))
+        unplaced = [d for d in order if d.candidates and not self._assign(d)]
+        for demand in unplaced:
+            if not self.open or self.attempts >= REPAIR_ATTEMPTS:
+                break
+            self._repair(demand)
+        return self.demands
+
+
+def build_proposal(department_id=None, duration=None, created_by=None):
+    """Solve the current assignment problem and return a proposal dict"""
+    started = datetime.utcnow()
+    duration = duration or current_app.config.get('TUTOR_ASSIGNMENT_DURATION', 60)
+    tutors, demands = load_problem(department_id=department_id)
+    Solver(tutors, demands, duration).solve()
+
+    rows = []
+    unassigned = []
+    for demand in demands:
+        item = {
+            'student_id': demand.student_id,
+            'student_name': demand.student_name,
+            'subject': demand.subject,
+            'grade': demand.grade,
+            'board': demand.board
+        }
+        if demand.tutor:
+            day, start = describe_session(demand.mask)
+            item.update({
+                'id': len(rows) + 1,
+                'tutor_id': demand.tutor.id,
+                'tutor_name': demand.tutor.name,
+                'day': day,
+                'time': start,
+                'duration': duration
+            })
+            rows.append(item)
+        else:
+            item['reason'] = 'No matching tutor' if not demand.candidates else 'No tutor with capacity and a common free slot'
+            unassigned.append(item)
+
+    rows.sort(key=lambda r: (r['student_name'], r['subject']))
+    return {
+        'id': uuid.uuid4().hex,
+        'created_at': started.isoformat(),
+        'created_by': created_by,
+        'department_id': department_id,
+        'stats': {
+            'demands': len(demands),
+            'assigned': len(rows),
+            'unassigned': len(unassigned),
+            'tutors': len(tutors),
+            'seconds': round((datetime.utcnow() - started).total_seconds(), 2)
+        },
+        'rows': rows,
+        'unassigned': unassigned
+    }
+
+
+def _proposal_path(proposal_id):
+    if not proposal_id.isalnum():
+        raise ValueError('Invalid proposal id')
+    return os.path.join(current_app.config['ASSIGNMENT_PROPOSAL_FOLDER'], f'{proposal_id}.json')
+
+
+def save_proposal(proposal):
+    folder = current_app.config['ASSIGNMENT_PROPOSAL_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    with open(_proposal_path(proposal['id']), 'w', encoding='utf-8') as f:
+        json.dump(proposal, f)
+    return proposal['id']
+
+
+def load_proposal(proposal_id):
+    try:
+        with open(_proposal_path(proposal_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def apply_proposal(proposal, row_ids=None, weeks=None, created_by=None):
+    """Schedule accepted rows as weekly series; returns (created, skipped rows)
+
+    Rows are re-checked against the live schedule, since it may have changed
+    while the proposal was being reviewed.
+    """
+    from app.utils.series import create_series
+
+    weeks = weeks or current_app.config.get('TUTOR_ASSIGNMENT_WEEKS', 12)
+    selected = [r for r in proposal['rows'] if row_ids is None or r['id'] in row_ids]
+    today = date.today()
+
+    created = 0
+    skipped = []
+    for row in selected:
+        day_index = DAYS.index(row['day'])
+        first_date = today + timedelta(days=(day_index - today.weekday() - 1) % 7 + 1)
+        start = time.fromisoformat(row['time'])
+        conflict, _ = Class.check_time_conflict(row['tutor_id'], first_date, start, row['duration'])
+        if conflict:
+            skipped.append(row)
+            continue
+
+        create_series(
+            {
+                'frequency': 'weekly',
+                'interval': 1,
+                'days_of_week': [(day_index + 1) % 7],
+                'end_date': (first_date + timedelta(weeks=weeks) - timedelta(days=1)).isoformat()
+            },
+            students=[row['student_id']],
+            subject=row['subject'],
+            class_type='one_on_one',
+            grade=row['grade'],
+            board=row['board'] or None,
+            scheduled_date=first_date,
+            scheduled_time=start,
+            duration=row['duration'],
+            tutor_id=row['tutor_id'],
+            primary_student_id=row['student_id'],
+            status='scheduled',
+            created_by=created_by
+        )
+        created += 1
+
+    return created, skipped
+
+
+@job_handler('propose_assignments')
+def propose_assignments_job(ctx, department_id=None, duration=None, created_by=None):
+    """Background version of build_proposal; the proposal is saved for review"""
+    ctx.progress(0, 1, 'Matching students to tutors', force=True)
+    proposal = build_proposal(department_id=department_id, duration=duration, created_by=created_by)
+    save_proposal(proposal)
+    stats = proposal['stats']
+    return {
+        'proposal_id': proposal['id'],
+        'assigned': stats['assigned'],
+        'demands': stats['demands'],
+        'seconds': stats['seconds']
+    }
+
+
+def init_app(app):
+    """Register the command-line solver"""
+    app.config.setdefault('ASSIGNMENT_PROPOSAL_FOLDER', os.path.join(app.instance_path, 'assignments'))
+
+    @app.cli.command('propose-assignments')
+    def propose_assignments_command():
+        """Compute a tutor assignment proposal for students without a tutor"""
+        proposal = build_proposal()
+        save_proposal(proposal)
+        stats = proposal['stats']
+        print(f"Proposal {proposal['id']}: {stats['assigned']}/{stats['demands']} student subjects "
+              f"assigned across {stats['tutors']} tutors in {stats['seconds']}s")
+        for row in proposal['unassigned'][:20]:
+            print(f"  unassigned: {row['student_name']} - {row['subject']} ({row['reason']})")
@@ -0,0 +1,153 @@
+"""Version counters for cached data.
+
+Tables are registered with ``watch()``. Whenever a flush inserts, updates or
+deletes a watched row, the matching keys in ``cache_versions`` are bumped in
+the same transaction, so every worker sees the new version as soon as the
+change commits. Cached values are stored next to the version they were built
+from and rebuilt when it moves.
+"""
+from datetime import datetime
+from flask import g, has_request_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models.cache_version import CacheVersion
+
+# table name -> [(keys or resolver, columns or None), ...]
+_watchers = {}
+
+
+def watch(table_name, keys, columns=None):
+    """Bump ``keys`` whenever a row of ``table_name`` changes.
+
+    ``keys`` is a key, a tuple of keys or a callable that receives the changed
+    instance and returns an iterable of keys. If ``columns`` is given, updates
+    that only touch other columns are ignored. Registering the same watcher
+    again (e.g. from a second ``init_app``) has no effect.
+    """
+    watcher = (keys, frozenset(columns) if columns else None)
+    watchers = _watchers.setdefault(table_name, [])
+    if watcher not in watchers:
+        watchers.append(watcher)
+
+
+def previous_value(obj, attr):
+    """Get the value an attribute had before the pending change"""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+
+def _changed_columns(obj):
+    state = inspect(obj)
+    return {
+        attr.key for attr in state.mapper.column_attrs
+        if state.attrs[attr.key].history.has_changes()
+    }
+
+
+def _keys_for(obj, changed=None):
+    keys = set()
+    for watched_keys, columns in _watchers.get(getattr(obj, '__tablename__', None), ()):
+        if changed is not None and columns is not None and not (changed & columns):
+            continue
+        if callable(watched_keys):
+            keys.update(k for k in watched_keys(obj) if k)
+        elif isinstance(watched_keys, str):
+            keys.add(watched_keys)
+        else:
+            keys.update(watched_keys)
+    return keys
+
+
+def keys_for(obj, columns=None):
+    """Keys the watchers would bump if ``columns`` of ``obj`` changed.
+
+    For bulk ``UPDATE`` statements, which bypass the flush listener.
+    """
+    return _keys_for(obj, set(columns) if columns else None)
+
+
+def _after_flush(session, flush_context):
+    """Collect the cache keys touched by this flush and bump them"""
+    if not _watchers:
+        return
+
+    keys = set()
+    for obj in list(session.new) + list(session.deleted):
+        keys |= _keys_for(obj)
+    for obj in session.dirty:
+        changed = _changed_columns(obj)
+        if changed:
+            keys |= _keys_for(obj, changed)
+
+    if keys:
+        bump_versions(keys, session.connection(bind_arguments={'mapper': inspect(CacheVersion)}))
+
+
+def bump_versions(keys, connection=None):
+    """Increment the version of each key, creating missing rows"""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+
+    if connection is None:
+        connection = db.session.connection(bind_arguments={'mapper': inspect(CacheVersion)})
+
+    table = CacheVersion.__table__
+    now = datetime.utcnow()
+    dialect = connection.dialect.name
+
+    for key in keys:
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).values(key=key, version=1, updated_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={'version': table.c.version + 1, 'updated_at': now}
+            )
+            connection.execute(stmt)
+        else:
+            result = connection.execute(
+                table.update().where(table.c.key == key)
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if not result.rowcount:
+                connection.execute(table.insert().values(key=key, version=1, updated_at=now))
+
+    if has_request_context():
+        memo = g.get('_cache_versions')
+        if memo:
+            for key in keys:
+                memo.pop(key, None)
+
+
+def get_versions(*keys):
+    """Get current versions for keys (0 if never bumped), memoized per request"""
+    memo = g.setdefault('_cache_versions', {}) if has_request_context() else {}
+
+    missing = [k for k in keys if k not in memo]
+    if missing:
+        found = dict(
+            db.session.query(CacheVersion.key, CacheVersion.version)
+            .filter(CacheVersion.key.in_(missing)).all()
+        )
+        for key in missing:
+            memo[key] = found.get(key, 0)
+
+    return {key: memo[key] for key in keys}
+
+
+def get_version(key):
+    """Get current version for a single key"""
+    return get_versions(key)[key]
+
+
+def init_app(app):
+    """Register the flush listener that keeps versions in step with data"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
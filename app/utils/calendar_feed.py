@@ -0,0 +1,336 @@
+"""iCalendar (.ics) feeds for tutors and students.
+
+Feeds are addressed by a signed token so calendar clients can poll them
+without a session. Each token carries the owner's token version
+(``calendar-token:<owner>:<id>``); ``revoke_feed_token`` bumps it, which
+invalidates every link handed out so far.
+
+Each feed is rendered to disk once per version of its ``calendar:<owner>:<id>``
+cache key, bumped whenever one of the owner's classes changes, and of
+``calendar:names``, bumped when a user or student is renamed, and served with
+ETag/Last-Modified headers.
+"""
+import glob
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import jwt
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from app.models.class_model import Class
+from app.models.tutor import Tutor
+from app.models.student import Student
+from app.utils.cache import watch, previous_value, get_version, get_versions, bump_versions
+from app.utils.series import get_exdates, series_start
+
+FEED_OWNERS = ('tutor', 'student')
+
+# Accepts both 0=Sunday and 7=Sunday numbering; 1-6 are Monday-Saturday
+BYDAY_CODES = {0: 'SU', 1: 'MO', 2: 'TU', 3: 'WE', 4: 'TH', 5: 'FR', 6: 'SA', 7: 'SU'}
+FREQUENCIES = {'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY'}
+
+
+def _student_ids(raw_students, primary_student_id):
+    ids = set()
+    if primary_student_id:
+        ids.add(primary_student_id)
+    if raw_students:
+        try:
+            ids.update(json.loads(raw_students))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def _calendar_keys(cls):
+    """Feeds that must be regenerated when this class row changes"""
+    tutor_ids = {cls.tutor_id, previous_value(cls, 'tutor_id')}
+    student_ids = _student_ids(cls.students, cls.primary_student_id) | _student_ids(
+        previous_value(cls, 'students'), previous_value(cls, 'primary_student_id')
+    )
+    return [feed_cache_key('tutor', t) for t in tutor_ids if t] + \
+           [feed_cache_key('student', s) for s in student_ids if s]
+
+
+# Feeds show tutor and student names. Renames are rare, so one shared key
+# re-renders every feed lazily instead of finding the feeds a name appears in.
+NAMES_KEY = 'calendar:names'
+
+
+def feed_cache_key(owner_type, owner_id):
+    return f'calendar:{owner_type}:{owner_id}'
+
+
+def token_version_key(owner_type, owner_id):
+    return f'calendar-token:{owner_type}:{owner_id}'
+
+
+def generate_feed_token(owner_type, owner_id):
+    """Generate the signed token that identifies a feed"""
+    return jwt.encode(
+        {'calendar_feed': owner_type, 'id': owner_id,
+         'v': get_version(token_version_key(owner_type, owner_id))},
+        current_app.config['SECRET_KEY'],
+        algorithm='HS256'
+    )
+
+
+def revoke_feed_token(owner_type, owner_id):
+    """Invalidate every feed link issued so far for an owner; caller commits"""
+    bump_versions([token_version_key(owner_type, owner_id)])
+
+
+def verify_feed_token(token):
+    """Return (owner_type, owner_id) for a valid, unrevoked token, else None"""
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.PyJWTError:
+        return None
+    owner_type, owner_id = payload.get('calendar_feed'), payload.get('id')
+    if owner_type not in FEED_OWNERS or not isinstance(owner_id, int):
+        return None
+
+    # One lookup also loads the versions get_feed_file needs
+    token_key = token_version_key(owner_type, owner_id)
+    versions = get_versions(token_key, feed_cache_key(owner_type, owner_id), NAMES_KEY)
+    # Tokens issued before versioning carry no 'v' and match version 0
+    if payload.get('v', 0) != versions[token_key]:
+        return None
+    return owner_type, owner_id
+
+
+def _escape(text):
+    return str(text or '').replace('\\', '\\\\').replace(';', '\\;')\
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Fold content lines at 75 octets as required by RFC 5545"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _local_stamp(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _utc_stamp(value, tz):
+    return value.replace(tzinfo=tz).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _timezone_block(tz_name, tz):
+    """Single-offset VTIMEZONE; correct for zones without DST such as Asia/Kolkata"""
+    offset = datetime.now(tz).utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = '+' if minutes >= 0 else '-'
+    offset_str = f'{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+    return [
+        'BEGIN:VTIMEZONE',
+        f'TZID:{tz_name}',
+        'BEGIN:STANDARD',
+        'DTSTART:19700101T000000',
+        f'TZOFFSETFROM:{offset_str}',
+        f'TZOFFSETTO:{offset_str}',
+        'END:STANDARD',
+        'END:VTIMEZONE'
+    ]
+
+
+def build_rrule(pattern, tz):
+    """Translate a Class.recurring_pattern dict into an RRULE value"""
+    frequency = FREQUENCIES.get((pattern.get('frequency') or '').lower())
+    if not frequency:
+        return None
+
+    parts = [f'FREQ={frequency}']
+    interval = pattern.get('interval') or 1
+    if int(interval) > 1:
+        parts.append(f'INTERVAL={int(interval)}')
+
+    days = [BYDAY_CODES[int(d)] for d in pattern.get('days_of_week') or [] if int(d) in BYDAY_CODES]
+    if days and frequency == 'WEEKLY':
+        parts.append('BYDAY=' + ','.join(dict.fromkeys(days)))
+
+    if pattern.get('end_date'):
+        try:
+            end = datetime.strptime(pattern['end_date'], '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+            parts.append('UNTIL=' + _utc_stamp(end, tz))
+        except ValueError:
+            pass
+    elif pattern.get('total_classes'):
+        parts.append(f"COUNT={int(pattern['total_classes'])}")
+
+    return ';'.join(parts)
+
+
+def _event_lines(cls, owner_type, tz_name, tz, uid_domain, exdates=()):
+    if cls.is_recurring and cls.recurring_pattern:
+        start = datetime.combine(series_start(cls), cls.scheduled_time)
+    else:
+        start = cls.get_scheduled_datetime()
+    end = start + timedelta(minutes=cls.duration or 0)
+
+    if owner_type == 'tutor':
+        other = cls.primary_student.full_name if cls.primary_student else 'Group Class'
+    else:
+        other = cls.tutor.user.full_name if cls.tutor and cls.tutor.user else 'Tutor'
+
+    description = [f"Type: {cls.class_type.replace('_', ' ').title()}"]
+    if cls.grade:
+        description.append(f'Grade: {cls.grade}')
+    if cls.meeting_link:
+        description.append(f'Join: {cls.meeting_link}')
+
+    stamp = cls.updated_at or cls.created_at or datetime.utcnow()
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:class-{cls.id}@{uid_domain}',
+        'DTSTAMP:' + stamp.strftime('%Y%m%dT%H%M%SZ'),
+        f'DTSTART;TZID={tz_name}:{_local_stamp(start)}',
+        f'DTEND;TZID={tz_name}:{_local_stamp(end)}',
+        'SUMMARY:' + _escape(f'{cls.subject} - {other}'),
+        'DESCRIPTION:' + _escape('\n'.join(description)),
+        'STATUS:' + ('CANCELLED' if cls.status == 'cancelled' else 'CONFIRMED')
+    ]
+    if cls.meeting_link:
+        lines.append('LOCATION:' + _escape(cls.meeting_link))
+
+    if cls.is_recurring and cls.recurring_pattern:
+        rrule = build_rrule(cls.get_recurring_pattern(), tz)
+        if rrule:
+            lines.append('RRULE:' + rrule)
+            for exdate in sorted(set(exdates)):
+                lines.append(f'EXDATE;TZID={tz_name}:{_local_stamp(exdate)}')
+
+    lines.append('END:VEVENT')
+    return lines
+
+
+def _feed_classes(owner_type, owner_id):
+    past_days = current_app.config.get('CALENDAR_FEED_PAST_DAYS', 90)
+    cutoff = datetime.now().date() - timedelta(days=past_days)
+
+    query = Class.query.options(
+        joinedload(Class.primary_student),
+        joinedload(Class.tutor).joinedload(Tutor.user)
+    ).filter((Class.scheduled_date >= cutoff) | (Class.is_recurring == True))
+
+    if owner_type == 'tutor':
+        return query.filter(Class.tutor_id == owner_id)\
+            .order_by(Class.scheduled_date, Class.scheduled_time).all()
+
+    # Group membership lives in a JSON column; narrow with LIKE, then check exactly
+    candidates = query.filter(
+        (Class.primary_student_id == owner_id) | Class.students.like(f'%{owner_id}%')
+    ).order_by(Class.scheduled_date, Class.scheduled_time).all()
+    return [c for c in candidates if owner_id in c.get_students()]
+
+
+def render_feed(owner_type, owner_id, name):
+    """Render the full VCALENDAR text for a tutor or student"""
+    tz_name = current_app.config.get('CALENDAR_TIMEZONE', 'Asia/Kolkata')
+    tz = ZoneInfo(tz_name)
+    uid_domain = current_app.config.get('CALENDAR_UID_DOMAIN', 'lms.i2global.co.in')
+
+    classes = _feed_classes(owner_type, owner_id)
+    series_by_id = {c.id: c for c in classes if c.is_recurring and c.recurring_pattern}
+
+    # Occurrences of a series are covered by its RRULE. Removed slots become
+    # EXDATEs; moved or rescheduled ones also get their own event.
+    exdates = {
+        series_id: [datetime.combine(day, series.scheduled_time) for day in get_exdates(series)]
+        for series_id, series in series_by_id.items()
+    }
+    events = []
+    for cls in classes:
+        series = series_by_id.get(cls.parent_class_id)
+        if series is not None:
+            slot = datetime.combine(cls.occurrence_date or cls.scheduled_date, series.scheduled_time)
+            moved = cls.status == 'rescheduled' or cls.get_scheduled_datetime() != slot
+            if cls.status == 'cancelled' or moved:
+                exdates[series.id].append(slot)
+            if not moved or cls.status == 'cancelled':
+                continue
+        events.append(cls)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:-//{current_app.config['COMPANY_NAME']}//{current_app.config['APP_NAME']}//EN",
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:' + _escape(f"{name} - {current_app.config['APP_NAME']}"),
+        f'X-WR-TIMEZONE:{tz_name}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        'X-PUBLISHED-TTL:PT15M'
+    ]
+    lines.extend(_timezone_block(tz_name, tz))
+    for cls in events:
+        lines.extend(_event_lines(cls, owner_type, tz_name, tz, uid_domain, exdates.get(cls.id, ())))
+    lines.append('END:VCALENDAR')
+
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def _owner_name(owner_type, owner_id):
+    if owner_type == 'tutor':
+        tutor = Tutor.query.get(owner_id)
+        if tutor and tutor.user:
+            return tutor.user.full_name
+        return None
+    student = Student.query.get(owner_id)
+    return student.full_name if student else None
+
+
+def get_feed_file(owner_type, owner_id):
+    """Return (path, version) of the cached feed, regenerating it if stale
+
+    Returns None when the owner does not exist.
+    """
+    feed_key = feed_cache_key(owner_type, owner_id)
+    versions = get_versions(feed_key, NAMES_KEY)
+    version = f'{versions[feed_key]}.{versions[NAMES_KEY]}'
+    folder = current_app.config['CALENDAR_FEED_FOLDER']
+    path = os.path.join(folder, f'{owner_type}_{owner_id}_v{version}.ics')
+
+    if os.path.exists(path):
+        return path, version
+
+    name = _owner_name(owner_type, owner_id)
+    if name is None:
+        return None
+
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(render_feed(owner_type, owner_id, name))
+    os.replace(tmp_path, path)
+
+    # Drop feeds rendered for older versions
+    for old in glob.glob(os.path.join(folder, f'{owner_type}_{owner_id}_v*.ics')):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return path, version
+
+
+def init_app(app):
+    """Register the watchers that move feed versions when classes or names change"""
+    watch('classes', _calendar_keys)
+    watch('users', NAMES_KEY, columns=('full_name',))
+    watch('students', NAMES_KEY, columns=('full_name',))
@@ -0,0 +1,353 @@
+"""Denormalized headcounts and class counters.
+
+Kept in step by a flush listener: every inserted, deleted or changed row is
+turned into per-row deltas that are applied with a single atomic
+``UPDATE ... SET count = count + delta`` in the same transaction.
+
+``Department``  ``user_count``, ``tutor_count``, ``student_count`` from
+                active users and students.
+``Tutor``       ``total_classes`` (not cancelled), ``completed_classes``
+                (completion status ``completed``) and ``last_class``.
+``Student``     ``total_classes`` (not cancelled, primary or group member),
+                ``attended_classes`` (attendance with ``student_present``)
+                and ``last_class``.
+
+``last_class`` only moves forward (``CASE WHEN last_class < new``); a class
+that is un-completed later leaves it until the next reconcile. Changes made
+outside the ORM (bulk updates, raw SQL) are corrected by
+``reconcile_department_counts()`` and ``reconcile_class_counts()``, which the
+``reconcile-counts`` CLI command runs periodically. Archiving moves rows
+without touching the counters, so reconciliation counts archived classes and
+attendance too (``app.utils.archive``).
+"""
+import json
+from collections import defaultdict
+from datetime import datetime, time
+import sqlalchemy as sa
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models.attendance import Attendance
+from app.models.class_model import Class
+from app.models.department import Department
+from app.models.tutor import Tutor
+from app.models.user import User
+from app.models.student import Student
+from app.utils.archive import attendance_source, class_source
+from app.utils.cache import previous_value
+
+COUNTER_COLUMNS = ('user_count', 'tutor_count', 'student_count')
+TUTOR_COUNTER_COLUMNS = ('total_classes', 'completed_classes', 'last_class')
+STUDENT_COUNTER_COLUMNS = ('total_classes', 'attended_classes', 'last_class')
+
+# Columns that decide which counters a row contributes to
+TRACKED_ATTRIBUTES = (
+    User.department_id, User.is_active, User.role,
+    Student.department_id, Student.is_active,
+    Class.tutor_id, Class.primary_student_id, Class.students, Class.status, Class.completion_status,
+    Attendance.student_id, Attendance.student_present,
+)
+
+
+def _load_previous(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history makes SQLAlchemy load the old value before an expired
+# attribute is overwritten, so the delta can subtract the old contribution
+for _attribute in TRACKED_ATTRIBUTES:
+    event.listen(_attribute, 'set', _load_previous, active_history=True)
+
+
+def _value(obj, attr, previous):
+    return previous_value(obj, attr) if previous else getattr(obj, attr)
+
+
+def _student_ids(obj, previous):
+    ids = set()
+    primary = _value(obj, 'primary_student_id', previous)
+    if primary:
+        ids.add(primary)
+    raw = _value(obj, 'students', previous)
+    if raw:
+        try:
+            ids.update(json.loads(raw))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def _contributions(obj, previous=False):
+    """[(model, row id, {counter: 1})] a row contributes, before or after the change"""
+    if isinstance(obj, User):
+        dept_id = _value(obj, 'department_id', previous)
+        if not dept_id or not _value(obj, 'is_active', previous):
+            return []
+        counts = {'user_count': 1}
+        if _value(obj, 'role', previous) == 'tutor':
+            counts['tutor_count'] = 1
+        return [(Department, dept_id, counts)]
+
+    if isinstance(obj, Student):
+        dept_id = _value(obj, 'department_id', previous)
+        if not dept_id or not _value(obj, 'is_active', previous):
+            return []
+        return [(Department, dept_id, {'student_count': 1})]
+
+    if isinstance(obj, Class):
+        if _value(obj, 'status', previous) == 'cancelled':
+            return []
+        result = [(Student, student_id, {'total_classes': 1}) for student_id in _student_ids(obj, previous)]
+        tutor_id = _value(obj, 'tutor_id', previous)
+        if tutor_id:
+            counts = {'total_classes': 1}
+            if _value(obj, 'status', previous) == 'completed' and \
+                    _value(obj, 'completion_status', previous) == 'completed':
+                counts['completed_classes'] = 1
+            result.append((Tutor, tutor_id, counts))
+        return result
+
+    if isinstance(obj, Attendance):
+        student_id = _value(obj, 'student_id', previous)
+        if student_id and _value(obj, 'student_present', previous):
+            return [(Student, student_id, {'attended_classes': 1})]
+
+    return []
+
+
+def _last_class(obj):
+    """[(model, row id, start datetime)] a row may advance ``last_class`` to"""
+    if isinstance(obj, Class):
+        if obj.tutor_id and obj.status == 'completed' and obj.completion_status == 'completed' \
+                and obj.scheduled_date:
+            return [(Tutor, obj.tutor_id, datetime.combine(obj.scheduled_date, obj.scheduled_time or time()))]
+    elif isinstance(obj, Attendance):
+        if obj.student_id and obj.student_present and obj.class_date:
+            return [(Student, obj.student_id, datetime.combine(obj.class_date, obj.scheduled_start or time()))]
+    return []
+
+
+def _apply(deltas, obj, sign, previous=False):
+    for model, row_id, counts in _contributions(obj, previous):
+        for column, value in counts.items():
+            deltas[(model, row_id)][column] += sign * value
+
+
+def _advance(latest, obj):
+    for model, row_id, started in _last_class(obj):
+        key = (model, row_id)
+        if key not in latest or latest[key] < started:
+            latest[key] = started
+
+
+def _after_flush(session, flush_context):
+    """Turn changes in this flush into counter deltas"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    latest = {}
+
+    for obj in session.new:
+        _apply(deltas, obj, 1)
+        _advance(latest, obj)
+    for obj in session.deleted:
+        _apply(deltas, obj, -1, previous=True)
+    for obj in session.dirty:
+        if isinstance(obj, (User, Student, Class, Attendance)) and session.is_modified(obj, include_collections=False):
+            _apply(deltas, obj, -1, previous=True)
+            _apply(deltas, obj, 1)
+            _advance(latest, obj)
+
+    changes = defaultdict(dict)
+    for key, columns in deltas.items():
+        for column, delta in columns.items():
+            if delta:
+                changes[key][column] = delta
+    for key, started in latest.items():
+        changes[key]['last_class'] = started
+    if not changes:
+        return
+
+    connection = session.connection(bind_arguments={'mapper': inspect(Department)})
+    # Fixed order so concurrent flushes lock rows the same way
+    for model, row_id in sorted(changes, key=lambda key: (key[0].__tablename__, key[1])):
+        table = model.__table__
+        values = {}
+        for column, delta in changes[(model, row_id)].items():
+            if column == 'last_class':
+                values[table.c.last_class] = sa.case(
+                    (sa.or_(table.c.last_class.is_(None), table.c.last_class < delta), delta),
+                    else_=table.c.last_class
+                )
+            else:
+                values[table.c[column]] = func.coalesce(table.c[column], 0) + delta
+        connection.execute(table.update().where(table.c.id == row_id).values(values))
+
+    # Loaded rows now hold stale counters; reload them on next access
+    for obj in session.identity_map.values():
+        model = type(obj)
+        if (model, getattr(obj, 'id', None)) in changes:
+            session.expire(obj, list(changes[(model, obj.id)]))
+
+
+def count_department_members():
+    """Recount every department from the source tables"""
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+
+    user_rows = db.session.query(
+        User.department_id, User.role, func.count(User.id)
+    ).filter(User.is_active == True, User.department_id.isnot(None))\
+        .group_by(User.department_id, User.role).all()
+    for dept_id, role, total in user_rows:
+        counts[dept_id]['user_count'] += total
+        if role == 'tutor':
+            counts[dept_id]['tutor_count'] += total
+
+    student_rows = db.session.query(
+        Student.department_id, func.count(Student.id)
+    ).filter(Student.is_active == True, Student.department_id.isnot(None))\
+        .group_by(Student.department_id).all()
+    for dept_id, total in student_rows:
+        counts[dept_id]['student_count'] = total
+
+    return counts
+
+
+def reconcile_department_counts(commit=True):
+    """Correct any drift between the stored counters and the real counts
+
+    Returns a list of (department code, column, stored, actual) for each fix.
+    """
+    actual = count_department_members()
+    fixes = []
+
+    for dept in Department.query.order_by(Department.id).all():
+        expected = actual.get(dept.id, dict.fromkeys(COUNTER_COLUMNS, 0))
+        for column in COUNTER_COLUMNS:
+            stored = getattr(dept, column) or 0
+            if stored != expected[column]:
+                fixes.append((dept.code, column, stored, expected[column]))
+                setattr(dept, column, expected[column])
+
+    if commit:
+        db.session.commit()
+    return fixes
+
+
+def _latest_start(owner, day, start, condition):
+    """{owner id: latest day + start time} among rows matching ``condition``"""
+    latest_day = db.session.query(owner.label('owner_id'), func.max(day).label('day'))\
+        .filter(condition).group_by(owner).subquery()
+    rows = db.session.query(owner, day, func.max(start))\
+        .join(latest_day, sa.and_(owner == latest_day.c.owner_id, day == latest_day.c.day))\
+        .filter(condition).group_by(owner, day).all()
+    return {owner_id: datetime.combine(d, t or time()) for owner_id, d, t in rows}
+
+
+def count_tutor_classes():
+    """{tutor id: {counter: value}} recomputed from hot and archived classes in one grouped query"""
+    Class = class_source('all')
+    completed = sa.and_(Class.status == 'completed', Class.completion_status == 'completed')
+    rows = db.session.query(
+        Class.tutor_id, func.count(Class.id), func.sum(sa.case((completed, 1), else_=0))
+    ).filter(Class.status != 'cancelled').group_by(Class.tutor_id).all()
+    counts = {tutor_id: {'total_classes': total, 'completed_classes': int(done or 0), 'last_class': None}
+              for tutor_id, total, done in rows}
+    for tutor_id, started in _latest_start(Class.tutor_id, Class.scheduled_date, Class.scheduled_time,
+                                           completed).items():
+        counts[tutor_id]['last_class'] = started
+    return counts
+
+
+def count_student_classes():
+    """{student id: {counter: value}} recomputed from hot and archived classes and attendance"""
+    Class, Attendance = class_source('all'), attendance_source('all')
+    counts = defaultdict(lambda: {'total_classes': 0, 'attended_classes': 0, 'last_class': None})
+    not_cancelled = Class.status != 'cancelled'
+
+    rows = db.session.query(Class.primary_student_id, func.count(Class.id))\
+        .filter(not_cancelled, Class.primary_student_id.isnot(None))\
+        .group_by(Class.primary_student_id).all()
+    for student_id, total in rows:
+        counts[student_id]['total_classes'] = total
+
+    # Group membership lives in a JSON column, so it is counted here
+    group_rows = db.session.query(Class.primary_student_id, Class.students)\
+        .filter(not_cancelled, Class.students.isnot(None), Class.students != '', Class.students != '[]').all()
+    for primary, raw in group_rows:
+        try:
+            members = set(json.loads(raw)) - {primary}
+        except (TypeError, ValueError):
+            continue
+        for student_id in members:
+            counts[student_id]['total_classes'] += 1
+
+    present = Attendance.student_present == True
+    rows = db.session.query(Attendance.student_id, func.count(Attendance.id))\
+        .filter(present).group_by(Attendance.student_id).all()
+    for student_id, attended in rows:
+        counts[student_id]['attended_classes'] = attended
+    for student_id, started in _latest_start(Attendance.student_id, Attendance.class_date,
+                                             Attendance.scheduled_start, present).items():
+        counts[student_id]['last_class'] = started
+
+    return counts
+
+
+def _reconcile_rows(model, columns, actual):
+    """Write corrected counters for rows that drifted; returns the fixes"""
+    empty = dict.fromkeys(columns, None)
+    empty.update({column: 0 for column in columns if column != 'last_class'})
+    fixes = []
+    updates = []
+
+    stored_rows = db.session.query(model.id, *[getattr(model, column) for column in columns]).all()
+    for row_id, *stored in stored_rows:
+        expected = actual.get(row_id, empty)
+        drifted = {
+            column: expected[column] for column, value in zip(columns, stored)
+            if (value or (None if column == 'last_class' else 0)) != expected[column]
+        }
+        if drifted:
+            fixes.extend((row_id, column, value, expected[column])
+                         for column, value in zip(columns, stored) if column in drifted)
+            updates.append(dict({f'new_{column}': expected[column] for column in columns}, row_id=row_id))
+
+    if updates:
+        table = model.__table__
+        db.session.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id'))
+            .values({column: sa.bindparam(f'new_{column}') for column in columns}),
+            updates
+        )
+    return fixes
+
+
+def reconcile_class_counts(commit=True):
+    """Recompute tutor and student class counters in bulk
+
+    Returns a list of (table, row id, column, stored, actual) for each fix.
+    """
+    fixes = [('tutors',) + fix for fix in _reconcile_rows(Tutor, TUTOR_COUNTER_COLUMNS, count_tutor_classes())]
+    fixes += [('students',) + fix for fix in _reconcile_rows(Student, STUDENT_COUNTER_COLUMNS, count_student_classes())]
+    if commit:
+        db.session.commit()
+    db.session.expire_all()
+    return fixes
+
+
+def init_app(app):
+    """Register the flush listener and the reconciliation command"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+    @app.cli.command('reconcile-counts')
+    def reconcile_counts_command():
+        """Recount department headcounts and class counters and fix any drift"""
+        fixes = reconcile_department_counts()
+        for code, column, stored, expected in fixes:
+            print(f"{code}.{column}: {stored} -> {expected}")
+        print(f"Reconciled department counts ({len(fixes)} corrections)")
+
+        fixes = reconcile_class_counts()
+        for table, row_id, column, stored, expected in fixes[:50]:
+            print(f"{table}[{row_id}].{column}: {stored} -> {expected}")
+        print(f"Reconciled class counters ({len(fixes)} corrections)")
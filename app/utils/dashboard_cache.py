@@ -0,0 +1,79 @@
+"""Version-keyed caching for the admin dashboard and its stats APIs.
+
+Every change to one of ``ENTITY_TABLES`` bumps that table's ``entity:<table>``
+version in the same transaction (see ``app.utils.cache``). A dashboard view
+names the tables it reads; its ETag is derived from their versions, today's
+date and the viewer, so:
+
+* a client whose copy is still current gets a bare 304 after one
+  ``cache_versions`` lookup;
+* other clients get the computed data from the in-process memo, which is
+  rebuilt only when one of those versions has moved.
+"""
+import hashlib
+import threading
+from datetime import date
+from flask import current_app, request, session
+from app.utils.cache import watch, get_versions
+
+ENTITY_TABLES = ('users', 'students', 'tutors', 'classes', 'attendance', 'departments')
+
+
+def entity_key(table):
+    return f'entity:{table}'
+
+
+_lock = threading.Lock()
+_memo = {}
+
+
+def _stamp(tables, extra):
+    versions = get_versions(*(entity_key(table) for table in tables))
+    return tuple(versions[entity_key(table)] for table in tables) + (date.today().isoformat(),) + tuple(extra)
+
+
+def memoized(name, tables, build, extra=()):
+    """Result of ``build()``, reused until a version of ``tables`` or the day changes"""
+    stamp = _stamp(tables, extra)
+    entry = _memo.get(name)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    value = build()
+    with _lock:
+        _memo[name] = (stamp, value)
+    return value
+
+
+def dashboard_etag(name, tables, *extra):
+    """ETag for a view that reads ``tables``; ``extra`` scopes it (e.g. to the viewer)"""
+    stamp = ':'.join(str(part) for part in _stamp(tables, extra))
+    return f"{name}-{hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:20]}"
+
+
+def not_modified(etag, page=False):
+    """A 304 response if the client already holds ``etag``, else None.
+
+    Pages (``page=True``) are never answered with a 304 while flash messages
+    are pending, since the cached copy would not show them.
+    """
+    if page and session.get('_flashes'):
+        return None
+    if etag not in request.if_none_match:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cacheable(response, etag):
+    """Mark a fresh response so the next request can be answered with a 304"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def init_app(app):
+    """Register one version watcher per dashboard table"""
+    for table in ENTITY_TABLES:
+        watch(table, entity_key(table))
@@ -0,0 +1,112 @@
+"""SQLite engine profile for multi-worker deployments.
+
+With the stock settings every gunicorn worker shares ``app.db`` through a
+rollback journal, so a writer blocks all readers and concurrent writers fail
+with "database is locked". When the database is SQLite, each new connection is
+switched to WAL (readers no longer wait for writers), a relaxed but safe
+``synchronous=NORMAL``, a larger page cache and memory map, and a busy timeout
+so writers queue instead of failing. The WAL file is checkpointed passively
+after requests at most every ``SQLITE_CHECKPOINT_INTERVAL`` seconds, and fully
+by the ``sqlite-checkpoint`` command.
+"""
+import threading
+import time
+from sqlalchemy import event, text
+from app import db
+
+SQLITE_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT': 15000,            # ms a writer waits for the lock
+    'SQLITE_CACHE_SIZE': -65536,             # negative = KiB, i.e. 64 MB per connection
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_WAL_AUTOCHECKPOINT': 1000,       # pages
+    'SQLITE_CHECKPOINT_INTERVAL': 300,       # seconds, 0 disables the request hook
+}
+
+_checkpoint_lock = threading.Lock()
+_last_checkpoint = 0.0
+
+
+def sqlite_settings(config):
+    """Profile values from an app config (or any mapping), falling back to defaults"""
+    return {key: config.get(key, default) for key, default in SQLITE_DEFAULTS.items()}
+
+
+def apply_sqlite_pragmas(dbapi_connection, settings):
+    """Apply the profile to a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings['SQLITE_BUSY_TIMEOUT'])}")
+        if settings['SQLITE_JOURNAL_MODE']:
+            cursor.execute(f"PRAGMA journal_mode = {settings['SQLITE_JOURNAL_MODE']}")
+        if settings['SQLITE_SYNCHRONOUS']:
+            cursor.execute(f"PRAGMA synchronous = {settings['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA cache_size = {int(settings['SQLITE_CACHE_SIZE'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA wal_autocheckpoint = {int(settings['SQLITE_WAL_AUTOCHECKPOINT'])}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite_engine(engine, settings):
+    """Apply the profile to every connection the engine opens"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return False
+
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, settings)
+
+    event.listen(engine, 'connect', _on_connect)
+    return True
+
+
+def checkpoint(mode='PASSIVE'):
+    """Run a WAL checkpoint on every SQLite engine; returns {bind: (busy, log, checkpointed)}"""
+    results = {}
+    for bind_key, engine in db.engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        with engine.connect() as connection:
+            row = connection.execute(text(f'PRAGMA wal_checkpoint({mode})')).fetchone()
+            results[bind_key or 'default'] = tuple(row) if row else None
+    return results
+
+
+def _checkpoint_if_due(interval):
+    global _last_checkpoint
+    now = time.monotonic()
+    if now - _last_checkpoint < interval or not _checkpoint_lock.acquire(blocking=False):
+        return
+    try:
+        _last_checkpoint = now
+        checkpoint('PASSIVE')
+    except Exception as e:
+        print(f"WAL checkpoint failed: {str(e)}")
+    finally:
+        _checkpoint_lock.release()
+
+
+def init_app(app):
+    """Tune SQLite engines and register checkpointing"""
+    if not app.config.get('SQLITE_TUNING', True):
+        return
+
+    settings = sqlite_settings(app.config)
+    with app.app_context():
+        tuned = [configure_sqlite_engine(engine, settings) for engine in db.engines.values()]
+    if not any(tuned):
+        return
+
+    interval = settings['SQLITE_CHECKPOINT_INTERVAL']
+    if interval:
+        @app.teardown_request
+        def checkpoint_wal(exception=None):
+            _checkpoint_if_due(interval)
+
+    @app.cli.command('sqlite-checkpoint')
+    def sqlite_checkpoint_command():
+        """Checkpoint and truncate the SQLite WAL file"""
+        for bind, result in checkpoint('TRUNCATE').items():
+            print(f"{bind}: busy={result[0]} wal_pages={result[1]} checkpointed={result[2]}")
@@ -0,0 +1,275 @@
+"""Streaming CSV and XLSX exports.
+
+Rows are read with ``yield_per`` so the driver hands them over in batches
+(a server-side cursor on PostgreSQL) and are written out as they arrive:
+
+* CSV is yielded in chunks straight into the response, so memory stays
+  constant whatever the row count.
+* XLSX uses openpyxl's write-only mode, which spools each row to a temporary
+  file. The archive can only be sent once it is complete, so the finished
+  file is then streamed from disk in chunks.
+
+Each dataset is a function returning ``(header, rows)`` where rows is an
+iterator of plain tuples from a column query, never ORM objects. The classes
+and attendance datasets read the hot tables by default; ``source=archive`` or
+``source=all`` includes archived history (see ``app.utils.archive``).
+``department=<id>`` keeps the rows whose tutor or student belongs to that
+department; the export route forces it for coordinators.
+
+Very large exports can also run as an ``export`` background job whose
+artifact is the finished file.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from flask import current_app, stream_with_context
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.attendance import Attendance
+from app.models.class_model import Class
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.models.user import User
+from app.utils.archive import attendance_source, class_source
+from app.utils.jobs import job_handler
+
+CHUNK_SIZE = 64 * 1024
+
+# Excel's sheet limit, less the header row
+XLSX_MAX_ROWS = 1048575
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+
+def _stream(query):
+    batch = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    return query.execution_options(yield_per=batch)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def classes_dataset(args):
+    """Classes with tutor and primary student, filtered like the classes page"""
+    Class = class_source(args.get('source', 'hot'))
+    tutor_user = aliased(User)
+    query = db.session.query(
+        Class.id, Class.scheduled_date, Class.scheduled_time, Class.duration,
+        Class.subject, Class.class_type, Class.grade, Class.board,
+        tutor_user.full_name, Student.full_name, Class.status, Class.completion_status,
+        Class.platform, Class.is_recurring, Class.parent_class_id, Class.created_at
+    ).join(Tutor, Class.tutor_id == Tutor.id)\
+     .join(tutor_user, Tutor.user_id == tutor_user.id)\
+     .outerjoin(Student, Class.primary_student_id == Student.id)
+
+    start, end = _parse_date(args.get('start')), _parse_date(args.get('end'))
+    if start:
+        query = query.filter(Class.scheduled_date >= start)
+    if end:
+        query = query.filter(Class.scheduled_date <= end)
+    if args.get('tutor', type=int):
+        query = query.filter(Class.tutor_id == args.get('tutor', type=int))
+    if args.get('status'):
+        query = query.filter(Class.status == args['status'])
+    if args.get('class_type'):
+        query = query.filter(Class.class_type == args['class_type'])
+    if args.get('department', type=int):
+        department_id = args.get('department', type=int)
+        query = query.filter(or_(tutor_user.department_id == department_id, Student.department_id == department_id))
+
+    header = ['Class ID', 'Date', 'Time', 'Duration (min)', 'Subject', 'Type', 'Grade', 'Board',
+              'Tutor', 'Student', 'Status', 'Completion', 'Platform', 'Recurring', 'Series ID', 'Created At']
+    return header, _stream(query.order_by(Class.scheduled_date, Class.scheduled_time, Class.id))
+
+
+def attendance_dataset(args):
+    """Attendance records with class, tutor and student names"""
+    source = args.get('source', 'hot')
+    Class, Attendance = class_source(source), attendance_source(source)
+    tutor_user = aliased(User)
+    query = db.session.query(
+        Attendance.id, Attendance.class_date, Attendance.class_id, Class.subject,
+        tutor_user.full_name, Student.full_name,
+        Attendance.tutor_present, Attendance.student_present,
+        Attendance.tutor_late_minutes, Attendance.student_late_minutes,
+        Attendance.class_duration_actual, Attendance.penalty_amount, Attendance.penalty_reason,
+        Attendance.marked_at
+    ).join(Class, Attendance.class_id == Class.id)\
+     .join(Tutor, Attendance.tutor_id == Tutor.id)\
+     .join(tutor_user, Tutor.user_id == tutor_user.id)\
+     .join(Student, Attendance.student_id == Student.id)
+
+    start, end = _parse_date(args.get('start')), _parse_date(args.get('end'))
+    if start:
+        query = query.filter(Attendance.class_date >= start)
+    if end:
+        query = query.filter(Attendance.class_date <= end)
+    if args.get('tutor', type=int):
+        query = query.filter(Attendance.tutor_id == args.get('tutor', type=int))
+    if args.get('student', type=int):
+        query = query.filter(Attendance.student_id == args.get('student', type=int))
+    if args.get('department', type=int):
+        department_id = args.get('department', type=int)
+        query = query.filter(or_(tutor_user.department_id == department_id, Student.department_id == department_id))
+
+    header = ['Attendance ID', 'Date', 'Class ID', 'Subject', 'Tutor', 'Student',
+              'Tutor Present', 'Student Present', 'Tutor Late (min)', 'Student Late (min)',
+              'Actual Duration (min)', 'Penalty', 'Penalty Reason', 'Marked At']
+    return header, _stream(query.order_by(Attendance.class_date, Attendance.id))
+
+
+def payroll_period(args):
+    """First and last day of the requested payroll month; ValueError if invalid"""
+    today = date.today()
+    month = args.get('month', today.month, type=int)
+    year = args.get('year', today.year, type=int)
+    if not 1 <= month <= 12 or not 1 <= year <= 9998:
+        raise ValueError('Invalid payroll month.')
+    start = date(year, month, 1)
+    end = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def payroll_dataset(args):
+    """Per-tutor payroll for one month, aggregated in the database"""
+    start, end = payroll_period(args)
+
+    classes_taught = func.sum(case((Attendance.tutor_present == True, 1), else_=0))
+    minutes_taught = func.sum(case(
+        (Attendance.tutor_present == True, func.coalesce(Attendance.class_duration_actual, Class.duration)),
+        else_=0
+    ))
+    penalties = func.sum(Attendance.penalty_amount)
+
+    query = db.session.query(
+        Tutor.id, User.full_name, Tutor.salary_type, Tutor.monthly_salary, Tutor.hourly_rate,
+        func.coalesce(classes_taught, 0), func.coalesce(minutes_taught, 0), func.coalesce(penalties, 0)
+    ).join(User, Tutor.user_id == User.id)\
+     .outerjoin(Attendance, and_(Attendance.tutor_id == Tutor.id, Attendance.class_date.between(start, end)))\
+     .outerjoin(Class, Attendance.class_id == Class.id)\
+     .filter(Tutor.status == 'active')\
+     .group_by(Tutor.id, User.full_name, Tutor.salary_type, Tutor.monthly_salary, Tutor.hourly_rate)\
+     .order_by(User.full_name)
+    if args.get('department', type=int):
+        query = query.filter(User.department_id == args.get('department', type=int))
+
+    def rows():
+        period = start.strftime('%Y-%m')
+        for tutor_id, name, salary_type, monthly, hourly, count, minutes, penalty in _stream(query):
+            hours = round((minutes or 0) / 60, 2)
+            gross = (monthly or 0) if salary_type == 'monthly' else round(hours * (hourly or 0), 2)
+            yield (period, tutor_id, name, salary_type, monthly, hourly, count, hours,
+                   gross, round(penalty or 0, 2), round(gross - (penalty or 0), 2))
+
+    header = ['Period', 'Tutor ID', 'Tutor', 'Salary Type', 'Monthly Salary', 'Hourly Rate',
+              'Classes Taught', 'Hours Taught', 'Gross', 'Penalties', 'Net']
+    return header, rows()
+
+
+DATASETS = {
+    'classes': classes_dataset,
+    'attendance': attendance_dataset,
+    'payroll': payroll_dataset
+}
+
+
+def iter_csv(header, rows):
+    """Yield CSV text in chunks of roughly CHUNK_SIZE"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_xlsx(header, rows, title='Export'):
+    """Write a write-only workbook to a temp file, then yield it in chunks"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(header)
+    for count, row in enumerate(rows, start=1):
+        if count >= XLSX_MAX_ROWS:
+            sheet.append(['Export truncated at the Excel row limit; use CSV for the full data'])
+            break
+        sheet.append(tuple(row))
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_filename(dataset, fmt):
+    return f"{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def export_body(dataset, fmt, args, rows_filter=None):
+    """Chunk iterator for a dataset, or None for an unknown dataset or format"""
+    if dataset not in DATASETS or fmt not in MIMETYPES:
+        return None
+
+    header, rows = DATASETS[dataset](args)
+    if rows_filter:
+        rows = rows_filter(rows)
+    if fmt == 'csv':
+        return iter_csv(header, rows)
+    return iter_xlsx(header, rows, title=dataset.title())
+
+
+@job_handler('export')
+def export_job(ctx, dataset, fmt, args):
+    """Write an export to the job's artifact folder"""
+    def counted(rows):
+        for count, row in enumerate(rows, start=1):
+            if count % 1000 == 0:
+                ctx.progress(count, message=f'{count} rows written')
+            yield row
+
+    body = export_body(dataset, fmt, MultiDict(args), rows_filter=counted)
+    if body is None:
+        raise ValueError(f'Unknown export: {dataset}.{fmt}')
+
+    filename = export_filename(dataset, fmt)
+    mode, encoding = ('w', 'utf-8') if fmt == 'csv' else ('wb', None)
+    with open(ctx.artifact_path(filename), mode, encoding=encoding, newline='' if encoding else None) as f:
+        for chunk in body:
+            f.write(chunk)
+    return {'dataset': dataset, 'format': fmt, 'filename': filename}
+
+
+def export_response(dataset, fmt, args):
+    """Streaming download response, or None for an unknown dataset or format"""
+    body = export_body(dataset, fmt, args)
+    if body is None:
+        return None
+
+    response = current_app.response_class(stream_with_context(body), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={export_filename(dataset, fmt)}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,174 @@
+"""Short-lived identity cache for the Flask-Login user loader.
+
+``load_user`` runs on every authenticated request. Instead of loading the full
+``User`` row each time, the essentials the routes and templates read
+(role, department, names, tutor profile id) are kept in a process-local cache
+for up to ``IDENTITY_CACHE_TTL`` seconds and wrapped in a lightweight
+``Identity``. Each entry remembers the version of the user's
+``identity:<user id>`` cache key, which is bumped whenever the user row or
+their tutor profile changes (update, deactivation, role change, password
+reset). An entry is only reused while that version is unchanged, so every
+worker sees the change on its next request. Anything not cached, such as the
+password hash or model methods, is read from the real ``User`` row, which is
+then loaded once for the rest of the request.
+"""
+import threading
+import time
+from flask import current_app, g, has_request_context
+from flask_login import UserMixin
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.user import User
+from app.models.tutor import Tutor
+from app.utils.cache import watch, previous_value, get_version
+
+IDENTITY_FIELDS = ('id', 'username', 'email', 'full_name', 'role', 'department_id',
+                   'is_active', 'profile_picture')
+
+# User columns whose change must reach every worker at once
+WATCHED_USER_FIELDS = IDENTITY_FIELDS[1:] + ('password_hash',)
+
+ROLE_DISPLAY = {
+    'superadmin': 'Super Admin',
+    'admin': 'Admin',
+    'coordinator': 'Coordinator',
+    'tutor': 'Tutor'
+}
+
+_lock = threading.Lock()
+_identities = {}  # user_id -> (expires_at, version, data)
+
+
+class Identity(UserMixin):
+    """Cached view of a logged-in user that loads the full row only on demand"""
+
+    def __init__(self, data):
+        self.__dict__['_data'] = dict(data)
+        self.__dict__['_user'] = None
+
+    @property
+    def is_active(self):
+        return bool(self._data['is_active'])
+
+    def get_user(self):
+        """The full User row, loaded at most once per Identity"""
+        user = self.__dict__['_user']
+        if user is None:
+            user = self.__dict__['_user'] = db.session.get(User, self._data['id'])
+        return user
+
+    def __getattr__(self, name):
+        data = self.__dict__['_data']
+        if name in data:
+            return data[name]
+        return getattr(self.get_user(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get_user(), name, value)
+        if name in self._data:
+            self._data[name] = value
+
+    @property
+    def tutor_profile(self):
+        """Tutor profile, shared with get_current_tutor for the request"""
+        return get_current_tutor_profile(self)
+
+    # Templates refer to the profile as current_user.tutor
+    tutor = tutor_profile
+
+    def has_permission(self, permission):
+        """Check if user has specific permission"""
+        if self.role == 'superadmin':
+            return True
+        from app.utils.permissions import get_user_permissions
+        return permission in get_user_permissions(self)
+
+    def can_access_department(self, dept_id):
+        """Check if user can access specific department"""
+        if self.role == 'superadmin':
+            return True
+        if self.role in ['admin', 'coordinator']:
+            return self.department_id == dept_id
+        return False
+
+    def get_role_display(self):
+        """Get formatted role name"""
+        return ROLE_DISPLAY.get(self.role, self.role.title())
+
+    def __repr__(self):
+        return f'<Identity {self.username}>'
+
+
+def _fetch(user_id):
+    row = db.session.query(
+        *[getattr(User, field) for field in IDENTITY_FIELDS], Tutor.id.label('tutor_id')
+    ).outerjoin(Tutor, Tutor.user_id == User.id)\
+        .filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return dict(row._mapping)
+
+
+def identity_key(user_id):
+    return f'identity:{user_id}'
+
+
+def _user_keys(user):
+    return (identity_key(user.id),)
+
+
+def _tutor_keys(tutor):
+    return {identity_key(user_id) for user_id in (tutor.user_id, previous_value(tutor, 'user_id')) if user_id}
+
+
+def load_identity(user_id):
+    """Identity for a user id, from cache while fresh and unchanged"""
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 60)
+    if not ttl:
+        data = _fetch(user_id)
+        return Identity(data) if data is not None else None
+
+    # Read before the row, so a change committed in between is refetched next time
+    version = get_version(identity_key(user_id))
+    entry = _identities.get(user_id)
+    now = time.monotonic()
+    if entry and entry[0] > now and entry[1] == version:
+        return Identity(entry[2])
+
+    data = _fetch(user_id)
+    if data is None:
+        invalidate_identity(user_id)
+        return None
+
+    with _lock:
+        _identities[user_id] = (now + ttl, version, data)
+    return Identity(data)
+
+
+def invalidate_identity(*user_ids):
+    with _lock:
+        for user_id in user_ids:
+            _identities.pop(user_id, None)
+
+
+def get_current_tutor_profile(user):
+    """Tutor profile of a user, memoized for the current request"""
+    if not has_request_context():
+        return Tutor.query.filter_by(user_id=user.id).first()
+
+    memo = g.setdefault('_tutor_profiles', {})
+    if user.id not in memo:
+        if isinstance(user, Identity):
+            tutor_id = user.tutor_id
+            memo[user.id] = db.session.get(Tutor, tutor_id, options=[joinedload(Tutor.user)]) if tutor_id else None
+        else:
+            memo[user.id] = Tutor.query.filter_by(user_id=user.id).first()
+    return memo[user.id]
+
+
+def init_app(app):
+    """Register the watchers that expire cached identities in every worker"""
+    app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+    watch('users', _user_keys, columns=WATCHED_USER_FIELDS)
+    # Only the profile's existence is cached, so other tutor edits do not matter
+    watch('tutors', _tutor_keys, columns=('user_id',))
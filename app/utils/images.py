@@ -0,0 +1,164 @@
+"""Thumbnails for uploaded images.
+
+Profile pictures are often multi-megabyte phone photos, while list pages
+show them at 40px. Each uploaded image gets fixed-size square thumbnails
+(``IMAGE_THUMBNAIL_SIZES``) in WebP plus a JPEG/PNG fallback. They are
+written next to the original as ``<stem>.<size>.<ext>``:
+
+    uploads/profiles/20250101_120000_me.jpg
+    uploads/profiles/20250101_120000_me.sm.webp
+    uploads/profiles/20250101_120000_me.sm.jpg
+
+Thumbnails are made on upload, lazily on first request, or in bulk with
+``flask generate-thumbnails``. Upload names carry a timestamp and are never
+reused, so ``/media/thumb/...`` can be cached as immutable.
+"""
+import os
+import re
+import click
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp')
+
+
+def _sizes():
+    return current_app.config.get('IMAGE_THUMBNAIL_SIZES', {'sm': 96, 'md': 320})
+
+
+def is_image(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_thumbnail(filename):
+    """True for files written by this module"""
+    sizes = '|'.join(re.escape(size) for size in _sizes())
+    return re.search(rf'\.({sizes})\.(webp|jpg|png)$', filename) is not None
+
+
+def original_path(subfolder, filename):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder, filename)
+
+
+def thumbnail_path(subfolder, filename, size, fmt):
+    """``fmt`` is 'webp' or 'fallback'; the fallback is PNG for images with transparency"""
+    stem = filename.rsplit('.', 1)[0]
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+    if fmt == 'webp':
+        return os.path.join(folder, f'{stem}.{size}.webp')
+    png = os.path.join(folder, f'{stem}.{size}.png')
+    return png if os.path.exists(png) else os.path.join(folder, f'{stem}.{size}.jpg')
+
+
+def _save(image, path, **options):
+    """Write atomically so a concurrent request never serves a half-written file"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    image.save(tmp_path, **options)
+    os.replace(tmp_path, path)
+
+
+def generate_thumbnails(path, force=False):
+    """Write every thumbnail size of one image; returns the number of files written"""
+    from PIL import Image, ImageOps
+
+    sizes = _sizes()
+    folder, filename = os.path.split(path)
+    stem = filename.rsplit('.', 1)[0]
+    if not force and all(os.path.exists(os.path.join(folder, f'{stem}.{size}.webp')) for size in sizes):
+        return 0
+
+    quality = current_app.config.get('IMAGE_THUMBNAIL_QUALITY', 82)
+    written = 0
+    with Image.open(path) as source:
+        # Let the JPEG decoder downscale while reading instead of decoding every pixel
+        largest = max(sizes.values())
+        source.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for size, pixels in sorted(sizes.items(), key=lambda item: -item[1]):
+            thumb = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+            _save(thumb, os.path.join(folder, f'{stem}.{size}.webp'), format='WEBP', quality=quality, method=4)
+            if has_alpha:
+                _save(thumb, os.path.join(folder, f'{stem}.{size}.png'), format='PNG', optimize=True)
+            else:
+                _save(thumb, os.path.join(folder, f'{stem}.{size}.jpg'), format='JPEG',
+                      quality=quality, optimize=True, progressive=True)
+            written += 2
+    return written
+
+
+def process_upload(subfolder, filename):
+    """Make thumbnails for a freshly saved upload; failures never block the upload"""
+    if subfolder not in current_app.config.get('IMAGE_THUMBNAIL_FOLDERS', ('profiles',)) or not is_image(filename):
+        return
+    try:
+        generate_thumbnails(original_path(subfolder, filename))
+    except Exception as e:
+        print(f"Thumbnail generation failed for {subfolder}/{filename}: {e}")
+
+
+def ensure_thumbnail(subfolder, filename, size, fmt):
+    """Path of a thumbnail, generating it on first request; None if it cannot be made"""
+    filename = secure_filename(filename)
+    if (subfolder not in current_app.config.get('IMAGE_THUMBNAIL_FOLDERS', ('profiles',))
+            or size not in _sizes() or not is_image(filename)):
+        return None
+
+    path = thumbnail_path(subfolder, filename, size, fmt)
+    if os.path.exists(path):
+        return path
+    source = original_path(subfolder, filename)
+    if not os.path.exists(source):
+        return None
+    try:
+        generate_thumbnails(source, force=True)
+    except Exception as e:
+        print(f"Thumbnail generation failed for {subfolder}/{filename}: {e}")
+        return None
+    path = thumbnail_path(subfolder, filename, size, fmt)
+    return path if os.path.exists(path) else None
+
+
+def thumbnail_url(filename, size='sm', subfolder='profiles'):
+    """Template helper: URL of a thumbnail of an uploaded image"""
+    if not filename:
+        return ''
+    return url_for('media.thumbnail', subfolder=subfolder, size=size, filename=filename)
+
+
+def backfill(subfolder, force=False):
+    """Generate missing thumbnails for every upload in a folder; returns (images, files)"""
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+    if not os.path.isdir(folder):
+        return 0, 0
+
+    images = written = 0
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file() or not is_image(entry.name) or is_thumbnail(entry.name):
+            continue
+        try:
+            count = generate_thumbnails(entry.path, force=force)
+        except Exception as e:
+            print(f"  skipped {entry.name}: {e}")
+            continue
+        if count:
+            images += 1
+            written += count
+    return images, written
+
+
+def init_app(app):
+    """Register the template helper and the backfill command"""
+    app.config.setdefault('IMAGE_THUMBNAIL_SIZES', {'sm': 96, 'md': 320})
+    app.config.setdefault('IMAGE_THUMBNAIL_FOLDERS', ('profiles',))
+    app.add_template_global(thumbnail_url)
+
+    @app.cli.command('generate-thumbnails')
+    @click.option('--force', is_flag=True, help='Regenerate thumbnails that already exist')
+    def generate_thumbnails_command(force):
+        """Create thumbnails for existing uploaded images"""
+        for subfolder in app.config['IMAGE_THUMBNAIL_FOLDERS']:
+            images, written = backfill(subfolder, force=force)
+            print(f"{subfolder}: {written} thumbnails written for {images} images")
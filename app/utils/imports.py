@@ -0,0 +1,403 @@
+"""Bulk import of students and tutors from CSV or XLSX.
+
+Files are read row by row (``csv`` reader, openpyxl read-only mode), each row
+is validated with ``StudentImportForm`` / ``TutorImportForm`` (the
+registration forms minus file uploads), duplicates are looked up per batch
+against the indexed email, username and phone columns, and valid rows are
+inserted ``IMPORT_BATCH_SIZE`` at a time, one transaction per batch.
+
+Uploads run as ``import_records`` background jobs: progress is reported on
+the job and rejected rows are written to an error report, the job's artifact.
+"""
+import click
+import csv
+import os
+import uuid
+from datetime import date, datetime
+from flask import current_app
+from werkzeug.datastructures import MultiDict
+from app import db
+from app.models.department import Department
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.models.user import User
+from app.utils.jobs import enqueue, job_handler
+
+IMPORT_KINDS = ('students', 'tutors')
+ALLOWED_EXTENSIONS = ('csv', 'xlsx')
+
+
+def _split(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+def build_student(form):
+    """Student from a validated registration or import form (documents excluded)"""
+    student = Student(
+        full_name=form.full_name.data,
+        email=form.email.data,
+        phone=form.phone.data,
+        date_of_birth=form.date_of_birth.data,
+        address=form.address.data,
+        state=form.state.data,
+        pin_code=form.pin_code.data,
+        grade=form.grade.data,
+        board=form.board.data,
+        school_name=form.school_name.data,
+        academic_year=form.academic_year.data,
+        course_start_date=form.course_start_date.data,
+        department_id=form.department_id.data,
+        relationship_manager=form.relationship_manager.data,
+        created_at=datetime.utcnow()
+    )
+
+    student.set_parent_details({
+        'father': {
+            'name': form.father_name.data,
+            'phone': form.father_phone.data,
+            'email': form.father_email.data,
+            'profession': form.father_profession.data,
+            'workplace': form.father_workplace.data
+        },
+        'mother': {
+            'name': form.mother_name.data,
+            'phone': form.mother_phone.data,
+            'email': form.mother_email.data,
+            'profession': form.mother_profession.data,
+            'workplace': form.mother_workplace.data
+        }
+    })
+
+    student.set_academic_profile({
+        'siblings': form.siblings.data,
+        'hobbies': _split(form.hobbies.data),
+        'learning_styles': _split(form.learning_styles.data),
+        'learning_patterns': _split(form.learning_patterns.data),
+        'parent_feedback': form.parent_feedback.data
+    })
+
+    student.set_subjects_enrolled([s.strip() for s in form.subjects_enrolled.data.split(',')])
+    if form.favorite_subjects.data:
+        student.set_favorite_subjects([s.strip() for s in form.favorite_subjects.data.split(',')])
+    if form.difficult_subjects.data:
+        student.set_difficult_subjects([s.strip() for s in form.difficult_subjects.data.split(',')])
+
+    student.set_fee_structure({
+        'total_fee': form.total_fee.data,
+        'amount_paid': form.amount_paid.data or 0,
+        'balance_amount': form.total_fee.data - (form.amount_paid.data or 0),
+        'payment_mode': form.payment_mode.data,
+        'payment_schedule': form.payment_schedule.data
+    })
+    return student
+
+
+def build_tutor(form):
+    """(User, Tutor) from a validated registration or import form (documents excluded)"""
+    user = User(
+        username=form.username.data,
+        email=form.email.data,
+        full_name=form.full_name.data,
+        phone=form.phone.data,
+        role='tutor',
+        department_id=form.department_id.data,
+        address=form.address.data,
+        is_active=True,
+        is_verified=False,
+        joining_date=datetime.now().date()
+    )
+    user.set_password(form.password.data)
+
+    tutor = Tutor(
+        qualification=form.qualification.data,
+        experience=form.experience.data,
+        salary_type=form.salary_type.data,
+        monthly_salary=form.monthly_salary.data,
+        hourly_rate=form.hourly_rate.data,
+        status='pending',
+        verification_status='pending',
+        date_of_birth=form.date_of_birth.data,
+        state=form.state.data,
+        pin_code=form.pin_code.data
+    )
+    tutor.user = user
+
+    tutor.set_subjects([s.strip() for s in form.subjects.data.split(',')])
+    tutor.set_grades([g.strip() for g in form.grades.data.split(',')])
+    tutor.set_boards([b.strip() for b in form.boards.data.split(',')])
+    tutor.set_bank_details({
+        'account_holder_name': form.account_holder_name.data,
+        'bank_name': form.bank_name.data,
+        'branch_name': form.branch_name.data,
+        'account_number': form.account_number.data,
+        'ifsc_code': form.ifsc_code.data
+    })
+    return user, tutor
+
+
+# ============ READING ============
+
+def _cell(value):
+    """Spreadsheet cell as the string a form field would receive"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_rows(path):
+    """Yield (row_number, [cells]) for every row, header first"""
+    if path.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for number, row in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+                yield number, [_cell(v) for v in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for number, row in enumerate(csv.reader(f), start=1):
+                yield number, [v.strip() for v in row]
+
+
+def count_rows(path):
+    """Data rows in a file, for progress; XLSX uses the sheet's stored dimensions"""
+    if path.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return max((workbook.active.max_row or 1) - 1, 0)
+        finally:
+            workbook.close()
+    with open(path, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+# ============ FILES ============
+
+def _folder():
+    return current_app.config['IMPORT_FOLDER']
+
+
+# ============ IMPORT ============
+
+class RowImporter:
+    """Per-kind validation, duplicate lookup and model building"""
+
+    def __init__(self, kind):
+        from app.forms.user import StudentImportForm, TutorImportForm
+
+        self.kind = kind
+        self.form_class = StudentImportForm if kind == 'students' else TutorImportForm
+        departments = Department.query.filter_by(is_active=True).all()
+        self.department_choices = [(0, 'Select Department')] + [(d.id, d.name) for d in departments]
+        self.department_ids = {}
+        for d in departments:
+            self.department_ids[str(d.id)] = d.id
+            self.department_ids[d.name.lower()] = d.id
+            if d.code:
+                self.department_ids[d.code.lower()] = d.id
+
+        # Header cells may use field names or form labels
+        sample = self.form_class(formdata=None, department_choices=self.department_choices)
+        self.aliases = {}
+        for name, field in sample._fields.items():
+            self.aliases[name] = name
+            self.aliases[field.label.text.lower()] = name
+        self.aliases['department'] = 'department_id'
+        self.seen = {'email': set(), 'phone': set(), 'username': set()}
+
+    def map_header(self, header):
+        return [self.aliases.get(h.strip().lower(), self.aliases.get(h.strip().lower().replace(' ', '_'))) for h in header]
+
+    def validate(self, fields, cells):
+        data = MultiDict((name, value) for name, value in zip(fields, cells) if name and value != '')
+        if 'department_id' in data:
+            data['department_id'] = str(self.department_ids.get(data['department_id'].lower(), 0))
+        if self.kind == 'tutors' and 'password' in data:
+            data['password_confirm'] = data['password']
+
+        form = self.form_class(formdata=data, department_choices=self.department_choices)
+        if form.validate():
+            return form, []
+        return None, [(name, '; '.join(messages)) for name, messages in form.errors.items()]
+
+    def _keys(self, form):
+        keys = {'email': (form.email.data or '').strip(), 'phone': (form.phone.data or '').strip()}
+        if self.kind == 'tutors':
+            keys['username'] = form.username.data.strip()
+        return keys
+
+    def duplicates(self, forms):
+        """{index: [(field, message)]} for rows that clash with the database or the file"""
+        keys = [self._keys(form) for form in forms]
+        model = Student if self.kind == 'students' else User
+        existing = {}
+        for field in ('email', 'phone', 'username'):
+            values = {k[field] for k in keys if k.get(field)}
+            if not values:
+                continue
+            # Plain IN on the indexed column, with lower-cased variants for emails typed in capitals
+            values |= {v.lower() for v in values}
+            column = getattr(model, field)
+            existing[field] = {(v or '').lower() for (v,) in db.session.query(column).filter(column.in_(values))}
+
+        problems = {}
+        for index, row_keys in enumerate(keys):
+            row_keys = {field: value.lower() for field, value in row_keys.items() if value}
+            for field, value in row_keys.items():
+                if value in existing.get(field, ()):
+                    problems.setdefault(index, []).append((field, f'{field.title()} already registered'))
+                elif value in self.seen[field]:
+                    problems.setdefault(index, []).append((field, f'Duplicate {field} earlier in the file'))
+            if index not in problems:
+                for field, value in row_keys.items():
+                    self.seen[field].add(value)
+        return problems
+
+    def build(self, form):
+        if self.kind == 'students':
+            return [build_student(form)]
+        return list(build_tutor(form))
+
+
+def run_import(kind, path, report_path, on_progress=None):
+    """Import a file, writing rejected rows to ``report_path``; returns the counts
+
+    ``on_progress`` is called with the counts after every committed batch.
+    """
+    batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 500)
+    importer = RowImporter(kind)
+    status = {'total': count_rows(path), 'processed': 0, 'created': 0, 'failed': 0}
+    if on_progress:
+        on_progress(status)
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as report_file:
+        report = csv.writer(report_file)
+        report.writerow(['Row', 'Field', 'Error'])
+
+        def reject(number, errors):
+            status['failed'] += 1
+            for field, message in errors:
+                report.writerow([number, field, message])
+
+        def flush(batch):
+            problems = importer.duplicates([form for _, form in batch])
+            accepted = []
+            for index, (number, form) in enumerate(batch):
+                if index in problems:
+                    reject(number, problems[index])
+                else:
+                    accepted.append((number, form))
+
+            try:
+                for _, form in accepted:
+                    db.session.add_all(importer.build(form))
+                db.session.commit()
+                status['created'] += len(accepted)
+            except Exception:
+                # Retry one row at a time so a single bad row only rejects itself
+                db.session.rollback()
+                for number, form in accepted:
+                    try:
+                        db.session.add_all(importer.build(form))
+                        db.session.commit()
+                        status['created'] += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        reject(number, [('', str(getattr(e, 'orig', e)))])
+
+            status['processed'] += len(batch)
+            report_file.flush()
+            if on_progress:
+                on_progress(status)
+
+        rows = read_rows(path)
+        header = next(rows, (1, []))[1]
+        fields = importer.map_header(header)
+        if not any(fields):
+            raise ValueError('The first row must contain column headings')
+
+        batch = []
+        for number, cells in rows:
+            if not any(cells):
+                continue
+            form, errors = importer.validate(fields, cells)
+            if errors:
+                reject(number, errors)
+                status['processed'] += 1
+                continue
+            batch.append((number, form))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    return status
+
+
+@job_handler('import_records')
+def import_records_job(ctx, kind, path, filename=None):
+    """Background import of an uploaded file; the error report is the job artifact"""
+    def report(status):
+        ctx.progress(status['processed'], status['total'],
+                     f"{status['created']} created, {status['failed']} rejected",
+                     force=not status['processed'])
+
+    try:
+        status = run_import(kind, path, ctx.artifact_path('errors.csv'), on_progress=report)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    if not status['failed']:
+        ctx.artifact = None
+    return dict(status, kind=kind, filename=filename)
+
+
+def start_import(kind, upload, created_by=None):
+    """Save an uploaded file and queue its import; returns the job (caller commits)"""
+    extension = upload.filename.rsplit('.', 1)[-1].lower() if '.' in upload.filename else ''
+    if kind not in IMPORT_KINDS or extension not in ALLOWED_EXTENSIONS:
+        raise ValueError('Upload a .csv or .xlsx file of students or tutors')
+
+    os.makedirs(_folder(), exist_ok=True)
+    path = os.path.join(_folder(), f'{uuid.uuid4().hex}.{extension}')
+    upload.save(path)
+    # Who started the import is kept on the job row
+    return enqueue('import_records', {'kind': kind, 'path': path, 'filename': upload.filename},
+                   created_by=created_by)
+
+
+def template_header(kind):
+    """Column headings accepted for an import kind"""
+    importer = RowImporter(kind)
+    form = importer.form_class(formdata=None, department_choices=importer.department_choices)
+    return [name for name in form._fields if name not in ('password_confirm', 'department_id')] + ['department']
+
+
+def init_app(app):
+    """Register the command-line importer"""
+    app.config.setdefault('IMPORT_FOLDER', os.path.join(app.instance_path, 'imports'))
+
+    @app.cli.command('import-records')
+    @click.argument('kind', type=click.Choice(IMPORT_KINDS))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_records_command(kind, path):
+        """Import students or tutors from a CSV or XLSX file"""
+        os.makedirs(_folder(), exist_ok=True)
+        report_path = os.path.join(_folder(), f'{uuid.uuid4().hex}_errors.csv')
+
+        def report(status):
+            print(f"  {status['processed']}/{status['total']} rows, "
+                  f"{status['created']} created, {status['failed']} rejected")
+
+        status = run_import(kind, path, report_path, on_progress=report)
+        print(f"Imported {status['created']} {kind}; {status['failed']} rows rejected "
+              f"(report: {report_path})")
@@ -0,0 +1,309 @@
+"""Background jobs with the database as the queue.
+
+Heavy admin operations are queued as ``Job`` rows and run outside the
+request, so gunicorn's worker timeout no longer applies. No broker is needed:
+
+* ``enqueue()`` adds a row in the caller's transaction, so a job only becomes
+  visible once the request that created it commits.
+* Workers claim the oldest queued row with a conditional UPDATE
+  (``FOR UPDATE SKIP LOCKED`` on PostgreSQL), so several workers can share
+  one queue.
+* Handlers report progress through ``JobContext.progress()``, which is also
+  where a cancellation request is noticed (``JobCancelled``).
+* A handler may write one result file with ``JobContext.artifact_path()``.
+
+Workers run either as threads inside the web app (``JOB_WORKER_THREADS``)
+or as a separate process pool: ``flask jobs-worker --processes N``.
+"""
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models.job import Job
+
+_handlers = {}
+_embedded_lock = threading.Lock()
+_embedded_started = False
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind
+
+    The handler is called as ``handler(ctx, **params)`` inside an app
+    context and may return a JSON-serializable result.
+    """
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, params=None, created_by=None, total=None):
+    """Queue a job; it is picked up once the current transaction commits"""
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job type: {kind}')
+    job = Job(kind=kind, status='queued', created_by=created_by, total=total, progress=0)
+    job.set_params(params or {})
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def request_cancel(job):
+    """Cancel a queued job now, or ask a running one to stop; caller commits"""
+    if job.status == 'queued':
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+    elif job.status == 'running':
+        job.cancel_requested = True
+        job.message = 'Cancelling...'
+
+
+def artifact_folder(job_id):
+    return os.path.join(current_app.config['JOB_ARTIFACT_FOLDER'], str(job_id))
+
+
+def artifact_file(job):
+    """Full path of a job's artifact, if it exists"""
+    if not job.artifact:
+        return None
+    path = os.path.join(artifact_folder(job.id), job.artifact)
+    return path if os.path.exists(path) else None
+
+
+def _jobs():
+    return Job.__table__
+
+
+def _update_job(job_id, **values):
+    """Write job fields in their own short transaction, apart from the handler's session"""
+    with db.engine.begin() as connection:
+        connection.execute(sa.update(_jobs()).where(_jobs().c.id == job_id).values(**values))
+
+
+class JobContext:
+    """Handed to a handler: progress reporting, cancellation and artifacts"""
+
+    def __init__(self, job_id, worker):
+        self.job_id = job_id
+        self.worker = worker
+        self.artifact = None
+        self._last_update = 0.0
+        self._interval = current_app.config.get('JOB_PROGRESS_INTERVAL', 1.0)
+
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress (throttled) and raise JobCancelled if cancellation was requested"""
+        now = time.monotonic()
+        if not force and now - self._last_update < self._interval:
+            return
+        self._last_update = now
+
+        values = {'progress': done, 'heartbeat_at': datetime.utcnow()}
+        if total is not None:
+            values['total'] = total
+        if message is not None:
+            values['message'] = message[:255]
+        try:
+            with db.engine.begin() as connection:
+                table = _jobs()
+                connection.execute(sa.update(table).where(table.c.id == self.job_id).values(**values))
+                cancelled = connection.execute(
+                    sa.select(table.c.cancel_requested).where(table.c.id == self.job_id)
+                ).scalar()
+        except sa.exc.OperationalError:
+            # e.g. SQLite busy while the handler holds a write; try again next time
+            return
+        if cancelled:
+            raise JobCancelled()
+
+    def artifact_path(self, filename):
+        """Path to write the job's result file to"""
+        folder = artifact_folder(self.job_id)
+        os.makedirs(folder, exist_ok=True)
+        self.artifact = filename
+        return os.path.join(folder, filename)
+
+
+def claim_next(worker):
+    """Mark the oldest queued job as running for this worker; returns its id or None"""
+    table = _jobs()
+    for _ in range(5):
+        with db.engine.begin() as connection:
+            job_id = connection.execute(
+                sa.select(table.c.id)
+                .where(table.c.status == 'queued')
+                .order_by(table.c.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar()
+            if job_id is None:
+                return None
+            now = datetime.utcnow()
+            claimed = connection.execute(
+                sa.update(table)
+                .where(table.c.id == job_id, table.c.status == 'queued')
+                .values(status='running', worker=worker, started_at=now, heartbeat_at=now)
+            ).rowcount
+        if claimed:
+            return job_id
+    return None
+
+
+def _heartbeat(app, job_id, stop):
+    """Keep a running job's heartbeat fresh even if its handler reports no progress"""
+    with app.app_context():
+        while not stop.wait(app.config.get('JOB_HEARTBEAT_SECONDS', 30)):
+            try:
+                _update_job(job_id, heartbeat_at=datetime.utcnow())
+            except sa.exc.OperationalError:
+                pass
+
+
+def run_job(job_id, worker):
+    """Run one claimed job to completion, failure or cancellation"""
+    job = db.session.get(Job, job_id)
+    handler = _handlers.get(job.kind)
+    params = job.get_params()
+    ctx = JobContext(job_id, worker)
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(current_app._get_current_object(), job_id, stop), daemon=True).start()
+
+    print(f"[{worker}] job {job_id} ({job.kind}) started")
+    try:
+        if handler is None:
+            raise ValueError(f'No handler registered for job type {job.kind}')
+        result = handler(ctx, **params)
+        db.session.commit()
+        total = db.session.query(Job.total).filter(Job.id == job_id).scalar()
+        values = {'status': 'completed', 'artifact': ctx.artifact, 'message': None, 'finished_at': datetime.utcnow()}
+        if total:
+            values['progress'] = total
+        if result is not None:
+            values['result'] = json.dumps(result, default=str)
+        _update_job(job_id, **values)
+        print(f"[{worker}] job {job_id} completed")
+    except JobCancelled:
+        db.session.rollback()
+        _update_job(job_id, status='cancelled', message='Cancelled', finished_at=datetime.utcnow())
+        print(f"[{worker}] job {job_id} cancelled")
+    except Exception as e:
+        db.session.rollback()
+        _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+        print(f"[{worker}] job {job_id} failed: {e}")
+        print(traceback.format_exc())
+    finally:
+        stop.set()
+        db.session.remove()
+
+
+def fail_stale_jobs():
+    """Fail running jobs whose worker stopped sending heartbeats"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('JOB_STALE_SECONDS', 300))
+    table = _jobs()
+    with db.engine.begin() as connection:
+        return connection.execute(
+            sa.update(table)
+            .where(table.c.status == 'running', table.c.heartbeat_at < cutoff)
+            .values(status='failed', error='Worker stopped before the job finished', finished_at=datetime.utcnow())
+        ).rowcount
+
+
+def work(app, worker, burst=False, stop=None):
+    """Worker loop: claim and run jobs until stopped (or the queue is empty in burst mode)"""
+    stop = stop or threading.Event()
+    with app.app_context():
+        poll = app.config.get('JOB_POLL_INTERVAL', 2.0)
+        fail_stale_jobs()
+        while not stop.is_set():
+            try:
+                job_id = claim_next(worker)
+            except sa.exc.OperationalError as e:
+                print(f"[{worker}] could not poll the job queue: {e}")
+                job_id = None
+            if job_id is None:
+                if burst:
+                    break
+                stop.wait(poll)
+                continue
+            run_job(job_id, worker)
+
+
+def _worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def _process_main(app, index, burst):
+    # Connections must not be shared with the parent after fork
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+    work(app, _worker_name(index), burst=burst)
+
+
+def start_embedded_workers(app):
+    """Start JOB_WORKER_THREADS worker threads inside this process, once"""
+    global _embedded_started
+    count = app.config.get('JOB_WORKER_THREADS', 0)
+    if not count or _embedded_started:
+        return
+    with _embedded_lock:
+        if _embedded_started:
+            return
+        _embedded_started = True
+        for index in range(count):
+            threading.Thread(
+                target=work, args=(app, _worker_name(f't{index}')), daemon=True, name=f'job-worker-{index}'
+            ).start()
+
+
+def init_app(app):
+    """Register the worker command and, if configured, in-process worker threads"""
+    app.config.setdefault('JOB_ARTIFACT_FOLDER', os.path.join(app.instance_path, 'jobs'))
+    app.config.setdefault('JOB_WORKER_THREADS', 0)
+
+    if app.config['JOB_WORKER_THREADS'] and not app.testing:
+        # Started on the first request so CLI commands such as `flask db upgrade` stay worker-free
+        @app.before_request
+        def _start_job_workers():
+            start_embedded_workers(current_app._get_current_object())
+
+    @app.cli.command('jobs-worker')
+    @click.option('--processes', '-p', default=None, type=int, help='Worker processes (default JOB_WORKER_PROCESSES)')
+    @click.option('--burst', is_flag=True, help='Exit once the queue is empty')
+    def jobs_worker_command(processes, burst):
+        """Run background job workers"""
+        processes = processes or app.config.get('JOB_WORKER_PROCESSES', 2)
+        print(f"Starting {processes} job worker process(es){' in burst mode' if burst else ''}")
+        if processes == 1:
+            work(app, _worker_name(0), burst=burst)
+            return
+
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=_process_main, args=(app, index, burst)) for index in range(processes)]
+        for child in children:
+            child.start()
+
+        def shutdown(*args):
+            for child in children:
+                child.terminate()
+        signal.signal(signal.SIGTERM, shutdown)
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            shutdown()
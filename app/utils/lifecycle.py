@@ -0,0 +1,217 @@
+"""Class lifecycle sweeper.
+
+Classes whose end time has passed are closed in bulk instead of waiting for
+a tutor to open them:
+
+* ``scheduled`` classes that never started become ``completed`` with
+  completion status ``no_show``;
+* ``ongoing`` classes that were never ended become ``completed`` with
+  completion status ``incomplete``.
+
+Both transitions are set-based ``UPDATE`` statements over batches of ids,
+guarded by the expected status so a tutor who starts or ends a class while
+the sweep runs always wins. Bulk updates bypass the flush listeners, so the
+cache versions the rows feed (calendar feeds, dashboards) are bumped by hand
+in the same transaction.
+
+Every web worker may run the sweeper (``CLASS_SWEEP_INTERVAL``); a row in
+``leases`` makes sure only one of them does at a time. Cron can call
+``flask sweep-classes`` instead.
+"""
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db
+from app.models.class_model import Class
+from app.models.lease import Lease
+from app.utils.cache import bump_versions, keys_for
+
+LEASE_NAME = 'class-sweeper'
+
+# (status to close, completion status it gets)
+TRANSITIONS = (
+    ('scheduled', 'no_show'),
+    ('ongoing', 'incomplete'),
+)
+
+_started_lock = threading.Lock()
+_started = False
+
+
+def acquire_lease(name, holder, seconds):
+    """Take or renew the named lease; False if someone else holds it"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    table = Lease.__table__
+
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            table.update()
+            .where(table.c.name == name, sa.or_(table.c.expires_at < now, table.c.holder == holder))
+            .values(holder=holder, expires_at=expires_at, acquired_at=now)
+        )
+        if result.rowcount:
+            return True
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(table.insert().values(name=name, holder=holder, expires_at=expires_at, acquired_at=now))
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lease(name, holder):
+    """Give the lease up early so the next run need not wait for it to expire"""
+    table = Lease.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            table.update().where(table.c.name == name, table.c.holder == holder)
+            .values(expires_at=datetime.utcnow())
+        )
+
+
+def overdue_filter(status, cutoff):
+    """Classes in ``status`` that ended at or before ``cutoff``.
+
+    Dates and times are separate columns, so the comparison is spelled out
+    rather than computed in SQL; it uses ``ix_classes_status_date``. Classes
+    that run past midnight end the day after they are scheduled.
+    """
+    cutoff_date, cutoff_time = cutoff.date(), cutoff.time()
+    previous_date = cutoff_date - timedelta(days=1)
+
+    same_day = sa.and_(
+        Class.end_time >= Class.scheduled_time,
+        sa.or_(Class.scheduled_date < cutoff_date,
+               sa.and_(Class.scheduled_date == cutoff_date, Class.end_time <= cutoff_time))
+    )
+    overnight = sa.and_(
+        Class.end_time < Class.scheduled_time,
+        sa.or_(Class.scheduled_date < previous_date,
+               sa.and_(Class.scheduled_date == previous_date, Class.end_time <= cutoff_time))
+    )
+    # Without an end time, only close classes whose whole day is long over
+    no_end = sa.and_(Class.end_time.is_(None), Class.scheduled_date < previous_date)
+
+    return sa.and_(Class.status == status, sa.or_(same_day, overnight, no_end))
+
+
+def sweep_classes(now=None, batch_size=None, grace_minutes=None, renew=None):
+    """Close overdue classes in batches; returns counts per completion status.
+
+    ``renew`` is called after each committed batch and stops the sweep when it
+    returns False (e.g. the lease could not be extended).
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('CLASS_SWEEP_BATCH_SIZE', 500)
+    if grace_minutes is None:
+        grace_minutes = config.get('CLASS_SWEEP_GRACE_MINUTES', 60)
+    cutoff = (now or datetime.now()) - timedelta(minutes=grace_minutes)
+
+    counts = {completion: 0 for _, completion in TRANSITIONS}
+    stopped = False
+    for status, completion in TRANSITIONS:
+        condition = overdue_filter(status, cutoff)
+        while not stopped:
+            batch = Class.query.filter(condition).order_by(Class.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            keys = set()
+            for cls in batch:
+                keys |= keys_for(cls, ('status', 'completion_status'))
+
+            result = db.session.execute(
+                sa.update(Class)
+                .where(Class.id.in_([cls.id for cls in batch]), Class.status == status)
+                .values(status='completed', completion_status=completion)
+                .execution_options(synchronize_session=False)
+            )
+            bump_versions(keys)
+            db.session.commit()
+            counts[completion] += result.rowcount
+
+            if renew and not renew():
+                stopped = True
+            elif len(batch) < batch_size:
+                break
+
+    return counts
+
+
+def run_sweep(holder, lease_seconds, release=True):
+    """Sweep under the lease; None if another worker holds it"""
+    if not acquire_lease(LEASE_NAME, holder, lease_seconds):
+        return None
+    try:
+        return sweep_classes(renew=lambda: acquire_lease(LEASE_NAME, holder, lease_seconds))
+    finally:
+        db.session.remove()
+        if release:
+            release_lease(LEASE_NAME, holder)
+
+
+def _sweeper_loop(app, holder):
+    interval = app.config['CLASS_SWEEP_INTERVAL']
+    # Spread workers out so they do not all wake at once
+    time.sleep(random.uniform(0, interval))
+    while True:
+        with app.app_context():
+            try:
+                # Keep the lease for the whole interval: one sweep per interval across all workers
+                counts = run_sweep(holder, interval, release=False)
+                if counts and any(counts.values()):
+                    print(f"Class sweeper closed {counts['no_show']} no-show and "
+                          f"{counts['incomplete']} incomplete classes")
+            except OperationalError as exc:
+                db.session.rollback()
+                print(f'Class sweeper skipped a run: {exc}')
+        time.sleep(interval)
+
+
+def start_sweeper(app):
+    """Start the periodic sweeper thread in this process, once"""
+    global _started
+    if _started:
+        return
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+        holder = f'{socket.gethostname()}:{os.getpid()}'
+        threading.Thread(target=_sweeper_loop, args=(app, holder), daemon=True, name='class-sweeper').start()
+
+
+def init_app(app):
+    """Register the sweep command and, if configured, the periodic sweeper"""
+    app.config.setdefault('CLASS_SWEEP_INTERVAL', 0)
+
+    if app.config['CLASS_SWEEP_INTERVAL'] and not app.testing:
+        # Started on the first request so CLI commands never sweep by accident
+        @app.before_request
+        def _start_class_sweeper():
+            start_sweeper(current_app._get_current_object())
+
+    @app.cli.command('sweep-classes')
+    @click.option('--grace', default=None, type=int, help='Minutes after the end time (default CLASS_SWEEP_GRACE_MINUTES)')
+    @click.option('--batch-size', default=None, type=int, help='Rows per UPDATE (default CLASS_SWEEP_BATCH_SIZE)')
+    def sweep_classes_command(grace, batch_size):
+        """Close classes whose end time has passed"""
+        holder = f'cli:{socket.gethostname()}:{os.getpid()}'
+        if not acquire_lease(LEASE_NAME, holder, 600):
+            print('Another worker is sweeping classes; try again later')
+            return
+        try:
+            counts = sweep_classes(batch_size=batch_size, grace_minutes=grace,
+                                   renew=lambda: acquire_lease(LEASE_NAME, holder, 600))
+        finally:
+            release_lease(LEASE_NAME, holder)
+        print(f"Closed {counts['no_show']} no-show and {counts['incomplete']} incomplete classes")
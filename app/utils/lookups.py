@@ -0,0 +1,112 @@
+"""Compact tutor/student lookup snapshot for the class scheduling forms.
+
+The snapshot is a column-only JSON array payload built once per version of the
+``lookups`` cache key and served from its own URL with an ETag, so the classes
+page no longer embeds every tutor and student on each view.
+"""
+import hashlib
+import json
+import threading
+from app import db
+from app.models.user import User
+from app.models.tutor import Tutor
+from app.models.student import Student
+from app.utils.cache import watch, get_version
+
+LOOKUPS_KEY = 'lookups'
+
+TUTOR_FIELDS = ['id', 'name', 'email', 'status', 'has_availability', 'rating',
+                'subjects', 'grades', 'boards']
+STUDENT_FIELDS = ['id', 'name', 'grade', 'board', 'subjects']
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def _load_json(raw, default):
+    if raw:
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return default
+    return default
+
+
+class LookupSnapshot:
+    """Built snapshot: raw rows plus the encoded response body"""
+
+    def __init__(self, version, tutors, students):
+        self.version = version
+        self.tutors = tutors
+        self.students = students
+        self.body = json.dumps({
+            'version': version,
+            'fields': {'tutors': TUTOR_FIELDS, 'students': STUDENT_FIELDS},
+            'tutors': tutors,
+            'students': students
+        }, separators=(',', ':')).encode('utf-8')
+        self.etag = f"{version}-{hashlib.sha1(self.body).hexdigest()[:16]}"
+
+    def available_tutor_count(self):
+        """Active tutors that have set availability"""
+        status_idx = TUTOR_FIELDS.index('status')
+        avail_idx = TUTOR_FIELDS.index('has_availability')
+        return sum(1 for t in self.tutors if t[status_idx] == 'active' and t[avail_idx])
+
+    def tutors_without_availability(self):
+        """Tutors that cannot be scheduled until they set availability"""
+        return [
+            {'id': t[0], 'name': t[1], 'status': t[3]}
+            for t in self.tutors if not t[TUTOR_FIELDS.index('has_availability')]
+        ]
+
+
+def _build_snapshot(version):
+    tutor_rows = db.session.query(
+        Tutor.id, User.full_name, User.email, Tutor.status, Tutor.availability,
+        Tutor.rating, Tutor.subjects, Tutor.grades, Tutor.boards
+    ).join(User, Tutor.user_id == User.id)\
+        .filter(User.is_active == True)\
+        .order_by(User.full_name).all()
+
+    tutors = [
+        [t.id, t.full_name, t.email, t.status, bool(_load_json(t.availability, {})),
+         t.rating or 0, _load_json(t.subjects, []), _load_json(t.grades, []),
+         _load_json(t.boards, [])]
+        for t in tutor_rows
+    ]
+
+    student_rows = db.session.query(
+        Student.id, Student.full_name, Student.grade, Student.board, Student.subjects_enrolled
+    ).filter(Student.is_active == True).order_by(Student.full_name).all()
+
+    students = [
+        [s.id, s.full_name, s.grade, s.board, _load_json(s.subjects_enrolled, [])]
+        for s in student_rows
+    ]
+
+    return LookupSnapshot(version, tutors, students)
+
+
+def get_lookup_snapshot():
+    """Get the snapshot for the current version, rebuilding it if stale"""
+    global _snapshot
+    version = get_version(LOOKUPS_KEY)
+
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = _build_snapshot(version)
+            snapshot = _snapshot
+
+    return snapshot
+
+
+def init_app(app):
+    """Register the watchers that move the snapshot version when a listed field changes"""
+    watch('tutors', LOOKUPS_KEY,
+          columns=('user_id', 'status', 'rating', 'subjects', 'grades', 'boards', 'availability'))
+    watch('students', LOOKUPS_KEY,
+          columns=('full_name', 'grade', 'board', 'subjects_enrolled', 'is_active'))
+    watch('users', LOOKUPS_KEY, columns=('full_name', 'email', 'is_active'))
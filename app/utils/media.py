@@ -0,0 +1,123 @@
+"""Authenticated delivery of uploaded videos and documents.
+
+Access is checked in Python, but the bytes need not be. ``MEDIA_DELIVERY``
+selects who sends the file:
+
+``python``      Werkzeug ``send_file`` with Range/206 and conditional
+                (ETag / If-Modified-Since / If-Range) support. Whole-file
+                responses go through the server's ``wsgi.file_wrapper``
+                (gunicorn uses ``sendfile``).
+``x-accel``     nginx: the response carries ``X-Accel-Redirect`` pointing at
+                an ``internal`` location and nginx serves the file, ranges
+                and all, with zero-copy ``sendfile``::
+
+                    location /protected-uploads/ {
+                        internal;
+                        alias /path/to/app/static/uploads/;
+                    }
+                    location /protected-blobs/ {
+                        internal;
+                        alias /path/to/instance/blobs/;
+                    }
+
+``x-sendfile``  Apache mod_xsendfile / lighttpd: ``X-Sendfile`` with the
+                absolute path.
+
+The blob store (``STORAGE_FOLDER``) lives outside the static folder, so no
+static route can reach it. Legacy uploads still in ``static/uploads/videos``
+and ``static/uploads/documents`` must not be served by the front server;
+Flask's own static route refuses any path that resolves into them (or into
+the old ``static/uploads/blobs``), however the URL spells it.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import abort, current_app, request, send_file
+from werkzeug.utils import secure_filename
+from app.utils.storage import parse_name, path_for_name
+
+PROTECTED_FOLDERS = ('videos', 'documents')
+
+
+def media_path(subfolder, filename):
+    """Absolute path of a protected upload, or None if it does not exist"""
+    if subfolder not in PROTECTED_FOLDERS or secure_filename(filename) != filename:
+        return None
+    if parse_name(filename):
+        return path_for_name(filename)
+    # Uploads saved before the content-addressed store
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder, filename)
+    return path if os.path.isfile(path) else None
+
+
+def _offload_response(filename, as_attachment):
+    """Empty response whose body the front server fills in"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = current_app.response_class(mimetype=mimetype)
+    if as_attachment:
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def send_media(subfolder, filename, as_attachment=False):
+    """Response for a protected upload using the configured delivery mode"""
+    path = media_path(subfolder, filename)
+    if path is None:
+        return None
+
+    mode = current_app.config.get('MEDIA_DELIVERY', 'python')
+    max_age = current_app.config.get('MEDIA_MAX_AGE', 3600)
+
+    if mode == 'x-accel':
+        response = _offload_response(filename, as_attachment)
+        if parse_name(filename):
+            prefix = current_app.config.get('MEDIA_ACCEL_BLOB_PREFIX', '/protected-blobs/').rstrip('/')
+            root = current_app.config['STORAGE_FOLDER']
+        else:
+            prefix = current_app.config.get('MEDIA_ACCEL_PREFIX', '/protected-uploads/').rstrip('/')
+            root = current_app.config['UPLOAD_FOLDER']
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = quote(f'{prefix}/{relative}')
+    elif mode == 'x-sendfile':
+        response = _offload_response(filename, as_attachment)
+        response.headers['X-Sendfile'] = path
+    else:
+        # Blobs have no extension, so the type and download name come from the stored name
+        response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], as_attachment=as_attachment,
+                             download_name=filename, conditional=True, etag=True, max_age=max_age)
+
+    # Authenticated content: browsers may cache it, shared caches may not
+    response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    return response
+
+
+def _resolved(path):
+    # Compared case-insensitively for case-insensitive filesystems
+    return os.path.normcase(os.path.realpath(path)).lower()
+
+
+def protected_roots(config):
+    """Folders whose files are only served through the media endpoint"""
+    upload_folder = config['UPLOAD_FOLDER']
+    folders = [os.path.join(upload_folder, folder) for folder in PROTECTED_FOLDERS]
+    folders += [os.path.join(upload_folder, 'blobs'), config['STORAGE_FOLDER']]
+    return tuple(_resolved(folder) for folder in folders)
+
+
+def is_protected(static_folder, filename, roots):
+    """True if a static ``filename`` resolves to a file inside one of ``roots``"""
+    path = _resolved(os.path.join(static_folder, filename))
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+def init_app(app):
+    """Keep Flask's static route from serving protected uploads"""
+    app.config.setdefault('MEDIA_DELIVERY', 'python')
+
+    @app.before_request
+    def _protect_uploads():
+        # The raw filename is checked after resolving it, since safe_join
+        # accepts spellings such as 'uploads/./videos/x' or 'uploads//videos/x'
+        if request.endpoint == 'static' and is_protected(
+                app.static_folder, (request.view_args or {}).get('filename', ''), protected_roots(app.config)):
+            abort(404)
@@ -0,0 +1,84 @@
+"""Precompiled permission sets for role and department checks.
+
+Department permissions are parsed once into frozensets and kept in process for
+the current version of the ``department_permissions`` cache key, which is
+bumped whenever a department's permissions column changes. Each request keeps
+the resolved set for its users in ``g``, so ``User.has_permission`` is a set
+lookup without JSON parsing or a lazy load of ``user.department``.
+"""
+import json
+import threading
+from flask import g, has_request_context
+from app import db
+from app.models.department import Department
+from app.utils.cache import watch, get_version
+
+PERMISSIONS_KEY = 'department_permissions'
+
+ADMIN_PERMISSIONS = frozenset([
+    'user_management', 'tutor_management', 'student_management',
+    'class_management', 'attendance', 'finance', 'reports'
+])
+
+NO_PERMISSIONS = frozenset()
+
+_lock = threading.Lock()
+_compiled = (None, {})
+
+
+def _parse(raw):
+    if not raw:
+        return NO_PERMISSIONS
+    try:
+        return frozenset(json.loads(raw))
+    except (TypeError, ValueError):
+        return NO_PERMISSIONS
+
+
+def _department_sets():
+    """{department_id: frozenset} for the current permissions version"""
+    global _compiled
+    version = get_version(PERMISSIONS_KEY)
+
+    compiled_version, sets = _compiled
+    if compiled_version != version:
+        with _lock:
+            if _compiled[0] != version:
+                rows = db.session.query(Department.id, Department.permissions).all()
+                _compiled = (version, {dept_id: _parse(raw) for dept_id, raw in rows})
+            sets = _compiled[1]
+
+    return sets
+
+
+def get_department_permissions(department_id):
+    """Compiled permission set of a department"""
+    if not department_id:
+        return NO_PERMISSIONS
+    return _department_sets().get(department_id, NO_PERMISSIONS)
+
+
+def _compile_for(role, department_id):
+    if role == 'admin':
+        return ADMIN_PERMISSIONS
+    if role == 'coordinator':
+        return get_department_permissions(department_id)
+    return NO_PERMISSIONS
+
+
+def get_user_permissions(user):
+    """Permission set for a non-superadmin user, memoized per request"""
+    if not has_request_context():
+        return _compile_for(user.role, user.department_id)
+
+    memo = g.setdefault('_user_permissions', {})
+    key = (user.id, user.role, user.department_id)
+    permissions = memo.get(key)
+    if permissions is None:
+        permissions = memo[key] = _compile_for(user.role, user.department_id)
+    return permissions
+
+
+def init_app(app):
+    """Register the watcher that invalidates compiled sets when permissions change"""
+    watch('departments', PERMISSIONS_KEY, columns=('permissions',))
@@ -0,0 +1,206 @@
+"""Opt-in slow-query log with captured query plans.
+
+With ``SLOW_QUERY_THRESHOLD_MS`` set, every statement run through one of the
+app's engines is timed between ``before_cursor_execute`` and
+``after_cursor_execute``. Statements at or over the threshold are written as
+one JSON line to a rotating log (``SLOW_QUERY_LOG``) with:
+
+* the SQL, its parameters (truncated) and the duration;
+* the endpoint, method and path of the request that ran it;
+* the innermost frame in ``app/routes`` that led to it;
+* for ``SELECT`` statements (not executemany), the plan from ``EXPLAIN`` (``EXPLAIN
+  QUERY PLAN`` on SQLite), run on a separate cursor of the same connection
+  so the statement's own results are untouched. Plans are never run with
+  ``ANALYZE``, so nothing is executed twice.
+
+``top_offenders()`` groups the log by statement for the admin page; ``flask
+slow-queries`` prints the same table. Each process rotates its own handler,
+so with several workers a file may briefly exceed ``SLOW_QUERY_LOG_MAX_BYTES``.
+"""
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import click
+from flask import has_request_context, request
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger('app.slow_queries')
+
+ROUTES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'routes') + os.sep
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(ROUTES_FOLDER.rstrip(os.sep)))
+
+MAX_PARAMS_LENGTH = 500
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN ',
+}
+
+# Expanded IN lists differ only in their number of placeholders
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def _route_frame():
+    """'app/routes/<file>:<line> in <function>' for the innermost route frame"""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(ROUTES_FOLDER):
+            return f'{os.path.relpath(frame.filename, PROJECT_FOLDER)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def _explain(conn, cursor, statement, parameters):
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if not prefix or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    explain = cursor.connection.cursor()
+    try:
+        explain.execute(prefix + statement, parameters)
+        return [' | '.join(str(value) for value in row) for row in explain.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        explain.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute never runs for a failed statement
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def _make_after_cursor_execute(threshold, explain_plans):
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = (time.perf_counter() - started.pop()) * 1000
+        if elapsed < threshold:
+            return
+
+        record = {
+            'at': datetime.utcnow().isoformat(timespec='seconds'),
+            'ms': round(elapsed, 1),
+            'statement': statement,
+            'params': repr(parameters)[:MAX_PARAMS_LENGTH],
+            'executemany': executemany,
+            'database': conn.engine.url.database,
+            'frame': _route_frame(),
+            'endpoint': None,
+        }
+        if has_request_context():
+            record.update(endpoint=request.endpoint, method=request.method, path=request.path)
+        if explain_plans and not executemany:
+            record['plan'] = _explain(conn, cursor, statement, parameters)
+        logger.warning(json.dumps(record, default=str))
+
+    return _after_cursor_execute
+
+
+def normalize(statement):
+    """Statement text with whitespace and expanded IN lists collapsed"""
+    return _IN_LIST.sub('(...)', _SPACES.sub(' ', statement).strip())
+
+
+def read_log(path):
+    """Records from the log and its rotated backups, oldest file first"""
+    paths = [path]
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        paths.insert(0, f'{path}.{index}')
+        index += 1
+
+    records = []
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def top_offenders(records, limit=25):
+    """Records grouped by normalized statement, ordered by total time"""
+    groups = {}
+    for record in records:
+        key = normalize(record['statement'])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'statement': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'endpoints': set(), 'frames': set(), 'last_seen': None, 'slowest': None,
+            }
+        group['count'] += 1
+        group['total_ms'] += record['ms']
+        if record.get('endpoint'):
+            group['endpoints'].add(record['endpoint'])
+        if record.get('frame'):
+            group['frames'].add(record['frame'])
+        if record.get('at') and (group['last_seen'] is None or record['at'] > group['last_seen']):
+            group['last_seen'] = record['at']
+        if record['ms'] >= group['max_ms']:
+            group['max_ms'] = record['ms']
+            group['slowest'] = record
+
+    ranked = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:limit]
+    for group in ranked:
+        group['mean_ms'] = group['total_ms'] / group['count']
+        group['endpoints'] = sorted(group['endpoints'])
+        group['frames'] = sorted(group['frames'])
+    return ranked
+
+
+def _configure_logger(app):
+    path = app.config['SLOW_QUERY_LOG']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not any(getattr(handler, 'baseFilename', None) == os.path.abspath(path) for handler in logger.handlers):
+        handler = RotatingFileHandler(path, maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024),
+                                      backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 3), encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+
+def init_app(app):
+    """Time statements on every engine when a threshold is configured"""
+    app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 0)
+    app.config.setdefault('SLOW_QUERY_LOG', os.path.join(app.instance_path, 'slow_queries.log'))
+
+    @app.cli.command('slow-queries')
+    @click.option('--limit', default=10, help='Statements to show')
+    def slow_queries_command(limit):
+        """Show the statements with the most total time in the slow-query log"""
+        for group in top_offenders(read_log(app.config['SLOW_QUERY_LOG']), limit):
+            print(f"{group['total_ms']:10.0f} ms  {group['count']:5d}x  max {group['max_ms']:8.1f} ms  "
+                  f"{', '.join(group['endpoints']) or '-'}")
+            print(f"    {group['statement'][:200]}")
+
+    threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+    if not threshold:
+        return
+
+    _configure_logger(app)
+    after = _make_after_cursor_execute(threshold, app.config.get('SLOW_QUERY_EXPLAIN', True))
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after)
+            event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,158 @@
+"""Read/write routing between the primary database and read replicas.
+
+Replicas are ordinary Flask-SQLAlchemy binds listed in
+``SQLALCHEMY_REPLICA_BINDS``. ``RoutingSession`` sends a read to a replica
+only when it is safe to see slightly stale data:
+
+* flushes and INSERT/UPDATE/DELETE statements always go to the primary;
+* GET/HEAD requests read from a replica, other methods use the primary;
+* once a session has written, the rest of that request reads the primary,
+  and so do the user's requests for ``REPLICA_READ_AFTER_WRITE_SECONDS``
+  afterwards (e.g. the page a form redirects to);
+* code outside a request (CLI, jobs) uses the primary.
+
+``using_replica()`` / ``@replica_reads`` mark report queries that may read a
+replica regardless, and ``using_primary()`` / ``@primary_reads`` force the
+primary for a read that must see the latest data.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+RECENT_WRITE_KEY = '_primary_reads_until'
+
+_forced_target = ContextVar('db_route', default=None)
+
+
+class RoutingSession(Session):
+    """Session that routes reads to a replica when the request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing or isinstance(clause, sa.sql.expression.UpdateBase):
+            return primary
+
+        # Models with their own bind_key are not replicated
+        if primary is not self._db.engines.get(None):
+            return primary
+
+        replica = self._replica_engine()
+        if replica is None or not self._may_read_replica():
+            return primary
+        return replica
+
+    def _replica_engine(self):
+        bind_keys = current_app.config.get('SQLALCHEMY_REPLICA_BINDS') or ()
+        engines = [self._db.engines[key] for key in bind_keys if key in self._db.engines]
+        if not engines:
+            return None
+        # Stay on one replica for the whole request so reads are consistent
+        index = self.info.get('replica_index')
+        if index is None or index >= len(engines):
+            index = self.info['replica_index'] = random.randrange(len(engines))
+        return engines[index]
+
+    def _may_read_replica(self):
+        forced = _forced_target.get()
+        if forced is not None:
+            return forced == REPLICA
+        if self.info.get('wrote'):
+            return False
+        if not has_request_context():
+            return False
+        if request.method not in SAFE_METHODS:
+            return False
+        return flask_session.get(RECENT_WRITE_KEY, 0) < time.time()
+
+
+def _after_flush(session, flush_context):
+    """Pin the rest of this request, and the user's next few, to the primary"""
+    if not isinstance(session, RoutingSession) or session.info.get('wrote'):
+        return
+    session.info['wrote'] = True
+
+    window = current_app.config.get('REPLICA_READ_AFTER_WRITE_SECONDS', 0)
+    if window and has_request_context() and current_app.config.get('SQLALCHEMY_REPLICA_BINDS'):
+        flask_session[RECENT_WRITE_KEY] = time.time() + window
+
+
+@contextmanager
+def _route(target):
+    token = _forced_target.set(target)
+    try:
+        yield
+    finally:
+        _forced_target.reset(token)
+
+
+def using_replica():
+    """Context manager: reads inside may come from a replica (report queries)"""
+    return _route(REPLICA)
+
+
+def using_primary():
+    """Context manager: reads inside always come from the primary"""
+    return _route(PRIMARY)
+
+
+def replica_reads(f):
+    """Decorator form of using_replica()"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with using_replica():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def primary_reads(f):
+    """Decorator form of using_primary()"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with using_primary():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def _copy_sqlite(source_engine, target_engine):
+    import sqlite3
+    source = sqlite3.connect(source_engine.url.database)
+    target = sqlite3.connect(target_engine.url.database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def init_app(app, db):
+    """Register routing listeners and the local replica sync command"""
+    app.config.setdefault('SQLALCHEMY_REPLICA_BINDS', [])
+    app.config.setdefault('REPLICA_READ_AFTER_WRITE_SECONDS', 5)
+
+    if not sa.event.contains(RoutingSession, 'after_flush', _after_flush):
+        sa.event.listen(RoutingSession, 'after_flush', _after_flush)
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the primary SQLite database into each SQLite replica (local testing)"""
+        primary = db.engines[None]
+        if primary.dialect.name != 'sqlite':
+            print("sync-replicas only copies SQLite files; use streaming replication for other databases")
+            return
+        for key in app.config['SQLALCHEMY_REPLICA_BINDS']:
+            replica = db.engines[key]
+            if replica.dialect.name != 'sqlite':
+                print(f"{key}: skipped, not SQLite")
+                continue
+            replica.dispose()
+            _copy_sqlite(primary, replica)
+            print(f"{key}: copied from {primary.url.database}")
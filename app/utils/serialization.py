@@ -0,0 +1,525 @@
+"""Schema-declared serializers for API payloads.
+
+A ``Schema`` lists its output fields once and is compiled to a list of
+getters, so dumping a row is a tight loop rather than a hand-written dict.
+Anything that would touch the database per row (tutor names, student names,
+department names) is resolved for the whole list in ``prefetch()``: rows
+already loaded in the session are read in place and the rest come from one
+query per relationship, so ``dump_many`` over 10,000 classes costs a handful
+of queries instead of tens of thousands of lazy loads, and ``dump`` of an
+object whose relationships are loaded costs none::
+
+    CLASS_SCHEMA.dump_many(classes)   # list of dicts
+    CLASS_SCHEMA.dump(cls)            # one dict, what Class.to_dict() returns
+
+Besides the model schemas there is one schema per list endpoint, which keeps
+that endpoint's existing keys and formats.
+
+If ``orjson`` is installed and ``JSON_USE_ORJSON`` is on, ``init_app`` also
+swaps Flask's JSON provider for an orjson-backed one, which every
+``jsonify`` call then uses. Keys are sorted as with Flask's provider, and
+dates and other non-native types still go through Flask's usual
+conversions. ``flask bench-serialization`` compares the paths.
+"""
+import json
+import time as timer
+from datetime import date, datetime, time, timedelta
+from operator import attrgetter
+import click
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect
+from sqlalchemy.orm.util import identity_key
+from app import db
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def hhmm(value):
+    return value.strftime('%H:%M') if value else None
+
+
+class Schema:
+    """Output fields of one model.
+
+    ``fields`` holds ``(key, source)`` or ``(key, source, formatter)``. A
+    source is an attribute name or a callable ``(obj, context)``; ``context``
+    is whatever ``prefetch()`` returned for the list being dumped.
+    """
+    fields = ()
+
+    def __init__(self):
+        self._getters = [(field[0], self._compile(*field[1:])) for field in self.fields]
+
+    @staticmethod
+    def _compile(source, formatter=None):
+        if callable(source):
+            getter = source
+        else:
+            attribute = attrgetter(source)
+            getter = lambda obj, context: attribute(obj)
+        if formatter is None:
+            return getter
+        return lambda obj, context: formatter(getter(obj, context))
+
+    def prefetch(self, objs):
+        """Batch-load what the fields need for ``objs``; returns the context"""
+        return {}
+
+    def dump_many(self, objs):
+        objs = list(objs)
+        if not objs:
+            return []
+        context = self.prefetch(objs)
+        getters = self._getters
+        return [{key: getter(obj, context) for key, getter in getters} for obj in objs]
+
+    def dump(self, obj):
+        return self.dump_many([obj])[0]
+
+
+_MISSING = object()
+
+
+def _names(query):
+    return dict(query.all())
+
+
+def _loaded(obj, attribute):
+    """An attribute's value if it is already loaded, without loading it"""
+    if obj is None or obj is _MISSING or attribute in inspect(obj).unloaded:
+        return _MISSING
+    return getattr(obj, attribute)
+
+
+def _session_values(model, ids, value_of, fetch):
+    """{id: value}, read from rows already in the session where possible
+
+    ``value_of(obj)`` returns the value or _MISSING when it would need a
+    load; ``fetch(ids)`` queries the remaining ids in one go.
+    """
+    values = {}
+    missing = set()
+    identity_map = db.session.identity_map
+    for obj_id in set(ids):
+        if not obj_id:
+            continue
+        obj = identity_map.get(identity_key(model, obj_id))
+        value = value_of(obj) if obj is not None else _MISSING
+        if value is _MISSING or value is None:
+            missing.add(obj_id)
+        else:
+            values[obj_id] = value
+    if missing:
+        values.update(fetch(missing))
+    return values
+
+
+def _tutor_names(tutor_ids):
+    from app.models.tutor import Tutor
+    from app.models.user import User
+    return _session_values(
+        Tutor, tutor_ids,
+        lambda tutor: _loaded(_loaded(tutor, 'user'), 'full_name'),
+        lambda ids: _names(db.session.query(Tutor.id, User.full_name).join(User, User.id == Tutor.user_id)
+                           .filter(Tutor.id.in_(ids)))
+    )
+
+
+def _user_names(user_ids):
+    from app.models.user import User
+    return _session_values(
+        User, user_ids,
+        lambda user: _loaded(user, 'full_name'),
+        lambda ids: _names(db.session.query(User.id, User.full_name).filter(User.id.in_(ids)))
+    )
+
+
+def _student_names(student_ids):
+    from app.models.student import Student
+    return _session_values(
+        Student, student_ids,
+        lambda student: _loaded(student, 'full_name'),
+        lambda ids: _names(db.session.query(Student.id, Student.full_name).filter(Student.id.in_(ids)))
+    )
+
+
+def _department_names(department_ids):
+    from app.models.department import Department
+    return _session_values(
+        Department, department_ids,
+        lambda department: _loaded(department, 'name'),
+        lambda ids: _names(db.session.query(Department.id, Department.name).filter(Department.id.in_(ids)))
+    )
+
+
+class ClassSchema(Schema):
+    fields = (
+        ('id', 'id'),
+        ('subject', 'subject'),
+        ('class_type', 'class_type'),
+        ('grade', 'grade'),
+        ('board', 'board'),
+        ('scheduled_date', 'scheduled_date', iso),
+        ('scheduled_time', 'scheduled_time', hhmm),
+        ('duration', 'duration'),
+        ('duration_display', lambda cls, context: cls.get_duration_display()),
+        ('tutor_name', lambda cls, context: context['tutors'].get(cls.tutor_id, '')),
+        ('student_names', lambda cls, context: [
+            context['students'][student_id] for student_id in context['members'][id(cls)]
+            if student_id in context['students']
+        ]),
+        ('status', 'status'),
+        ('completion_status', 'completion_status'),
+        ('platform', 'platform'),
+        ('meeting_link', 'meeting_link'),
+        ('is_today', lambda cls, context: cls.scheduled_date == context['today']),
+        ('is_upcoming', lambda cls, context: datetime.combine(cls.scheduled_date, cls.scheduled_time) > context['now']),
+        ('created_at', 'created_at', iso),
+    )
+
+    def prefetch(self, classes):
+        members = {id(cls): cls.get_students() for cls in classes}
+        now = datetime.now()
+        return {
+            'tutors': _tutor_names(cls.tutor_id for cls in classes),
+            'students': _student_names(student_id for ids in members.values() for student_id in ids),
+            'members': members,
+            'now': now,
+            'today': now.date(),
+        }
+
+
+class AttendanceSchema(Schema):
+    fields = (
+        ('id', 'id'),
+        ('class_id', 'class_id'),
+        ('class_date', 'class_date', iso),
+        ('tutor_name', lambda record, context: context['tutors'].get(record.tutor_id, '')),
+        ('student_name', lambda record, context: context['students'].get(record.student_id, '')),
+        ('tutor_present', 'tutor_present'),
+        ('student_present', 'student_present'),
+        ('tutor_late_minutes', 'tutor_late_minutes'),
+        ('student_late_minutes', 'student_late_minutes'),
+        ('attendance_status', lambda record, context: record.get_attendance_status()),
+        ('punctuality_score', lambda record, context: record.get_punctuality_score()),
+        ('penalty_amount', 'penalty_amount'),
+        ('student_engagement', 'student_engagement'),
+        ('marked_at', 'marked_at', iso),
+    )
+
+    def prefetch(self, records):
+        return {
+            'tutors': _tutor_names(record.tutor_id for record in records),
+            'students': _student_names(record.student_id for record in records),
+        }
+
+
+class TutorSchema(Schema):
+    fields = (
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('user_name', lambda tutor, context: context['users'].get(tutor.user_id, '')),
+        ('qualification', 'qualification'),
+        ('experience', 'experience'),
+        ('subjects', lambda tutor, context: tutor.get_subjects()),
+        ('grades', lambda tutor, context: tutor.get_grades()),
+        ('boards', lambda tutor, context: tutor.get_boards()),
+        ('salary_type', 'salary_type'),
+        ('monthly_salary', 'monthly_salary'),
+        ('hourly_rate', 'hourly_rate'),
+        ('status', 'status'),
+        ('verification_status', 'verification_status'),
+        ('rating', 'rating'),
+        ('total_classes', 'total_classes'),
+        ('completed_classes', 'completed_classes'),
+        ('completion_rate', lambda tutor, context: tutor.get_completion_rate()),
+        ('created_at', 'created_at', iso),
+    )
+
+    def prefetch(self, tutors):
+        return {'users': _user_names(tutor.user_id for tutor in tutors)}
+
+
+def _fee(student, context):
+    """(status, balance) from one parse of the fee structure"""
+    fee_structure = context['fees'].get(student.id)
+    if fee_structure is None:
+        fee_structure = context['fees'][student.id] = student.get_fee_structure()
+    if not fee_structure:
+        return 'unknown', 0
+    total_fee = fee_structure.get('total_fee', 0)
+    amount_paid = fee_structure.get('amount_paid', 0)
+    if amount_paid >= total_fee:
+        status = 'paid'
+    elif amount_paid > 0:
+        status = 'partial'
+    else:
+        status = 'pending'
+    return status, max(0, total_fee - amount_paid)
+
+
+class StudentSchema(Schema):
+    fields = (
+        ('id', 'id'),
+        ('full_name', 'full_name'),
+        ('email', 'email'),
+        ('phone', 'phone'),
+        ('grade', 'grade'),
+        ('board', 'board'),
+        ('school_name', 'school_name'),
+        ('department', lambda student, context: context['departments'].get(student.department_id, '')),
+        ('subjects_enrolled', lambda student, context: student.get_subjects_enrolled()),
+        ('enrollment_status', 'enrollment_status'),
+        ('attendance_percentage', lambda student, context: student.get_attendance_percentage()),
+        ('fee_status', lambda student, context: _fee(student, context)[0]),
+        ('balance_amount', lambda student, context: _fee(student, context)[1]),
+        ('relationship_manager', 'relationship_manager'),
+        ('created_at', 'created_at', iso),
+        ('age', lambda student, context: student.get_age()),
+    )
+
+    def prefetch(self, students):
+        return {
+            'departments': _department_names(student.department_id for student in students),
+            'fees': {},
+        }
+
+
+class StudentSearchSchema(Schema):
+    """Rows of the admin student search box"""
+    fields = (
+        ('id', 'id'),
+        ('name', 'full_name'),
+        ('email', 'email'),
+        ('grade', 'grade'),
+        ('board', 'board'),
+        ('department', lambda student, context: context['departments'].get(student.department_id, '')),
+        ('enrollment_status', 'enrollment_status'),
+    )
+
+    def prefetch(self, students):
+        return {'departments': _department_names(student.department_id for student in students)}
+
+
+NO_TUTOR = 'No Tutor Assigned'
+
+
+def _is_virtual(cls, context):
+    return getattr(cls, 'is_virtual', False)
+
+
+def _class_tutors(classes):
+    return _tutor_names(cls.tutor_id for cls in classes)
+
+
+class TimetableWeekSchema(Schema):
+    """Rows of the admin week timetable; classes and virtual occurrences alike"""
+    fields = (
+        ('id', 'id'),
+        ('is_virtual', _is_virtual),
+        ('series_id', lambda cls, context: cls.parent_class_id or (cls.id if cls.is_recurring else None)),
+        ('subject', 'subject'),
+        ('class_type', 'class_type'),
+        ('scheduled_date', 'scheduled_date', iso),
+        ('scheduled_time', 'scheduled_time', hhmm),
+        ('duration', 'duration'),
+        ('status', 'status'),
+        ('tutor_name', lambda cls, context: context['tutors'].get(cls.tutor_id, NO_TUTOR)),
+        ('student_count', lambda cls, context: len(cls.get_students() or [])),
+    )
+
+    def prefetch(self, classes):
+        return {'tutors': _class_tutors(classes)}
+
+
+def _first_student(cls, context):
+    names = [context['students'][student_id] for student_id in context['members'][id(cls)]
+             if student_id in context['students']]
+    if not names:
+        return 'No Students'
+    return names[0] + (f' +{len(names) - 1} more' if len(names) > 1 else '')
+
+
+class TimetableTodaySchema(Schema):
+    """Rows of the admin today timetable"""
+    fields = (
+        ('id', 'id'),
+        ('is_virtual', _is_virtual),
+        ('subject', 'subject'),
+        ('scheduled_time', 'scheduled_time', hhmm),
+        ('duration', 'duration'),
+        ('status', 'status'),
+        ('tutor_name', lambda cls, context: context['tutors'].get(cls.tutor_id, NO_TUTOR)),
+        ('student_name', _first_student),
+    )
+
+    def prefetch(self, classes):
+        members = {id(cls): cls.get_students() or [] for cls in classes}
+        return {
+            'tutors': _class_tutors(classes),
+            'students': _student_names(student_id for ids in members.values() for student_id in ids),
+            'members': members,
+        }
+
+
+STATUS_COLORS = {
+    'scheduled': '#F1A150',
+    'ongoing': '#28A745',
+    'completed': '#17A2B8',
+    'cancelled': '#DC3545',
+    'rescheduled': '#FFC107'
+}
+
+
+def status_color(status):
+    return STATUS_COLORS.get(status, '#6C757D')
+
+
+class CalendarEventSchema(Schema):
+    """Events of the tutor calendar (FullCalendar's event format)"""
+    fields = (
+        ('id', lambda cls, context: cls.virtual_id if getattr(cls, 'is_virtual', False) else cls.id),
+        ('title', lambda cls, context: f"{cls.subject} - {context['students'].get(cls.primary_student_id) or 'Group Class'}"),
+        ('start', lambda cls, context: f'{cls.scheduled_date}T{cls.scheduled_time}'),
+        ('end', lambda cls, context: f'{cls.scheduled_date}T{cls.end_time}'),
+        ('backgroundColor', 'status', status_color),
+        ('borderColor', 'status', status_color),
+        ('extendedProps', lambda cls, context: {
+            'status': cls.status,
+            'student_count': len(cls.get_students()),
+            'class_type': cls.class_type
+        }),
+    )
+
+    def prefetch(self, classes):
+        return {'students': _student_names(cls.primary_student_id for cls in classes)}
+
+
+class CompatibleTutorSchema(Schema):
+    """Rows of the admin compatible-tutors search"""
+    fields = (
+        ('id', 'id'),
+        ('name', lambda tutor, context: context['users'].get(tutor.user_id, ('Unknown', ''))[0]),
+        ('email', lambda tutor, context: context['users'].get(tutor.user_id, ('Unknown', ''))[1]),
+        ('subjects', lambda tutor, context: tutor.get_subjects()),
+        ('grades', lambda tutor, context: tutor.get_grades()),
+        ('boards', lambda tutor, context: tutor.get_boards()),
+        ('rating', lambda tutor, context: tutor.rating or 0),
+        ('completion_rate', lambda tutor, context: tutor.get_completion_rate()),
+    )
+
+    def prefetch(self, tutors):
+        from app.models.user import User
+
+        def loaded(user):
+            name, email = _loaded(user, 'full_name'), _loaded(user, 'email')
+            return _MISSING if _MISSING in (name, email) else (name, email)
+
+        users = _session_values(
+            User, (tutor.user_id for tutor in tutors), loaded,
+            lambda ids: {user_id: (name, email) for user_id, name, email in
+                         db.session.query(User.id, User.full_name, User.email).filter(User.id.in_(ids))}
+        )
+        return {'users': users}
+
+
+CLASS_SCHEMA = ClassSchema()
+ATTENDANCE_SCHEMA = AttendanceSchema()
+TUTOR_SCHEMA = TutorSchema()
+STUDENT_SCHEMA = StudentSchema()
+STUDENT_SEARCH_SCHEMA = StudentSearchSchema()
+TIMETABLE_WEEK_SCHEMA = TimetableWeekSchema()
+TIMETABLE_TODAY_SCHEMA = TimetableTodaySchema()
+CALENDAR_EVENT_SCHEMA = CalendarEventSchema()
+COMPATIBLE_TUTOR_SCHEMA = CompatibleTutorSchema()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson.
+
+    Types orjson would format differently (datetimes, dates, dataclasses) are
+    passed to Flask's ``default`` and keys are sorted when ``sort_keys`` is on
+    (Flask's default), so responses look the same as before.
+    """
+
+    @property
+    def _options(self):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'default'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=self._options).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._options
+        if self.compact is None and self._app.debug or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=option),
+                                        mimetype=self.mimetype)
+
+
+def _sample_classes(count):
+    """Unsaved classes spread over existing tutors and students, for benchmarks"""
+    from app.models.class_model import Class
+    from app.models.student import Student
+    from app.models.tutor import Tutor
+    tutor_ids = [row[0] for row in db.session.query(Tutor.id).limit(50)] or [None]
+    student_ids = [row[0] for row in db.session.query(Student.id).limit(200)] or [None]
+    start = date.today()
+    return [
+        Class(id=index + 1, subject='Mathematics', class_type='one_on_one', grade='10', board='CBSE',
+              scheduled_date=start + timedelta(days=index % 30), scheduled_time=time(8 + index % 10, 0),
+              duration=60, tutor_id=tutor_ids[index % len(tutor_ids)],
+              primary_student_id=student_ids[index % len(student_ids)], status='scheduled',
+              platform='zoom', meeting_link='https://example.com/j/1', created_at=datetime.utcnow())
+        for index in range(count)
+    ]
+
+
+def init_app(app):
+    """Install the orjson provider when available and register the benchmark"""
+    app.config.setdefault('JSON_USE_ORJSON', True)
+    if orjson is not None and app.config['JSON_USE_ORJSON']:
+        app.json = OrjsonProvider(app)
+
+    @app.cli.command('bench-serialization')
+    @click.option('--rows', default=10000, help='Classes in the payload')
+    def bench_serialization_command(rows):
+        """Time per-row vs batched serialization and the JSON encoders"""
+        classes = _sample_classes(rows)
+
+        def measure(label, func):
+            started = timer.perf_counter()
+            result = func()
+            print(f'{label:<44} {(timer.perf_counter() - started) * 1000:8.1f} ms')
+            return result
+
+        measure('per-row CLASS_SCHEMA.dump (queries per row)', lambda: [CLASS_SCHEMA.dump(cls) for cls in classes])
+        # With the related rows in the session, per-row dumps read them in place
+        from app.models.student import Student
+        from app.models.tutor import Tutor
+        from sqlalchemy.orm import joinedload
+        loaded = Tutor.query.options(joinedload(Tutor.user)).filter(Tutor.id.in_({cls.tutor_id for cls in classes})).all() \
+            + Student.query.filter(Student.id.in_({cls.primary_student_id for cls in classes})).all()
+        print(f'{len(loaded)} tutors and students loaded into the session')
+        measure('per-row CLASS_SCHEMA.dump (related rows loaded)', lambda: [CLASS_SCHEMA.dump(cls) for cls in classes])
+        payload = measure('CLASS_SCHEMA.dump_many (batched)', lambda: CLASS_SCHEMA.dump_many(classes))
+
+        encoded = measure('json.dumps', lambda: json.dumps(payload))
+        if orjson is not None:
+            measure('orjson.dumps', lambda: orjson.dumps(payload))
+        else:
+            print('orjson is not installed; skipping')
+        print(f'{rows} rows, {len(encoded) / 1024:.0f} KB of JSON')
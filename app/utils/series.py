@@ -0,0 +1,617 @@
+"""Recurring class series.
+
+A series is a ``Class`` row with ``is_recurring`` set and an RRULE-style
+``recurring_pattern``. The row is also the series' first occurrence. Later
+occurrences are materialized as child rows (``parent_class_id`` = series,
+``occurrence_date`` = the slot they fill) only up to a rolling window of
+``SERIES_MATERIALIZE_DAYS`` ahead. Occurrences further out are *virtual*:
+they are generated on the fly for timetable and calendar views and become real
+rows as the window moves forward. Every web worker may roll the window
+forward (``SERIES_MATERIALIZE_INTERVAL``); the ``series-materializer`` row in
+``leases`` makes sure only one of them does at a time. Cron can call
+``flask materialize-series`` instead.
+
+Pattern keys::
+
+    frequency         'daily' | 'weekly' | 'monthly'
+    interval          every N periods (default 1)
+    days_of_week      weekly only; 0/7=Sunday, 1=Monday ... 6=Saturday
+    start_date        first occurrence (ISO date)
+    end_date          last possible date (ISO date), or
+    total_classes     number of occurrences, counted before exdates
+    exdates           ISO dates removed from the series
+    materialized_until  last date that has been materialized
+"""
+import calendar
+import os
+import random
+import socket
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models.class_model import Class
+from app.utils.jobs import job_handler
+from app.utils.lifecycle import acquire_lease, release_lease
+
+LEASE_NAME = 'series-materializer'
+
+# Fields copied from the series row to each materialized occurrence
+SERIES_FIELDS = (
+    'subject', 'class_type', 'grade', 'board', 'scheduled_time', 'duration', 'end_time',
+    'tutor_id', 'primary_student_id', 'students', 'max_students', 'platform',
+    'meeting_link', 'meeting_id', 'meeting_password', 'backup_link', 'created_by'
+)
+
+# Fields an edit of the whole series may change
+EDITABLE_FIELDS = (
+    'subject', 'grade', 'board', 'scheduled_time', 'duration', 'tutor_id', 'platform',
+    'meeting_link', 'meeting_id', 'meeting_password', 'backup_link'
+)
+
+# Fields whose change must be checked against the tutor's calendar
+SCHEDULE_FIELDS = ('tutor_id', 'scheduled_time', 'duration')
+
+MAX_OCCURRENCES = 1000
+
+_started_lock = threading.Lock()
+_started = False
+
+
+class SeriesConflict(ValueError):
+    """A series edit would put occurrences outside availability or on top of other classes"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__('The change clashes with the tutor\'s schedule on '
+                         + ', '.join(conflict['date'] for conflict in conflicts))
+
+
+def pattern_weekday(day):
+    """Pattern day number (0=Sunday ... 6=Saturday) of a date"""
+    return (day.weekday() + 1) % 7
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def series_start(series):
+    return _parse_date(series.get_recurring_pattern().get('start_date')) or series.scheduled_date
+
+
+def get_exdates(series):
+    return {d for d in (_parse_date(v) for v in series.get_recurring_pattern().get('exdates', [])) if d}
+
+
+def materialized_until(series):
+    pattern = series.get_recurring_pattern()
+    return _parse_date(pattern.get('materialized_until')) or series_start(series)
+
+
+def _add_months(day, months):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    if day.day > calendar.monthrange(year, month)[1]:
+        return None
+    return day.replace(year=year, month=month)
+
+
+def _rule_dates(pattern, start):
+    """All dates produced by the rule from ``start``, before exdates"""
+    frequency = (pattern.get('frequency') or 'weekly').lower()
+    interval = max(int(pattern.get('interval') or 1), 1)
+
+    if frequency == 'daily':
+        step = 0
+        while True:
+            yield start + timedelta(days=step * interval)
+            step += 1
+
+    elif frequency == 'monthly':
+        step = 0
+        while step < MAX_OCCURRENCES * 12:
+            day = _add_months(start, step * interval)
+            if day:
+                yield day
+            step += 1
+
+    else:
+        days = sorted({int(d) % 7 for d in pattern.get('days_of_week') or []}) or [pattern_weekday(start)]
+        week_start = start - timedelta(days=start.weekday())
+        while True:
+            for pattern_day in days:
+                # Pattern weeks run Monday..Sunday, so Sunday (0) is the last day
+                day = week_start + timedelta(days=(pattern_day - 1) % 7)
+                if day >= start:
+                    yield day
+            week_start += timedelta(weeks=interval)
+
+
+def occurrence_dates(series, start=None, end=None):
+    """Dates of a series' occurrences within [start, end], exdates removed"""
+    pattern = series.get_recurring_pattern()
+    first = series_start(series)
+    last = _parse_date(pattern.get('end_date'))
+    total = int(pattern.get('total_classes') or 0)
+    if end is None:
+        end = last
+    if end is None and not total:
+        raise ValueError('An open-ended series needs an end date for expansion')
+    exdates = get_exdates(series)
+
+    dates = []
+    for count, day in enumerate(_rule_dates(pattern, first), start=1):
+        if (last and day > last) or (end and day > end) or count > MAX_OCCURRENCES:
+            break
+        if total and count > total:
+            break
+        if (start is None or day >= start) and day not in exdates:
+            dates.append(day)
+    return dates
+
+
+def series_end(series):
+    """Last date the series can produce, or None if it is open-ended"""
+    pattern = series.get_recurring_pattern()
+    if pattern.get('end_date'):
+        return _parse_date(pattern['end_date'])
+    if pattern.get('total_classes'):
+        dates = occurrence_dates(series, end=series_start(series) + timedelta(days=3660))
+        return dates[-1] if dates else series_start(series)
+    return None
+
+
+def _update_pattern(series, **changes):
+    pattern = series.get_recurring_pattern()
+    pattern.update(changes)
+    series.set_recurring_pattern(pattern)
+
+
+def window_end(today=None):
+    days = current_app.config.get('SERIES_MATERIALIZE_DAYS', 28)
+    return (today or date.today()) + timedelta(days=days)
+
+
+def create_series(pattern, students=None, **class_data):
+    """Create a series row and materialize its first window
+
+    ``class_data`` holds the Class fields of the first occurrence; its
+    ``scheduled_date`` becomes the series start.
+    """
+    pattern = dict(pattern)
+    pattern.setdefault('start_date', class_data['scheduled_date'].isoformat())
+    pattern.setdefault('exdates', [])
+
+    series = Class(is_recurring=True, **class_data)
+    series.occurrence_date = class_data['scheduled_date']
+    if students:
+        series.set_students(students)
+    series.set_recurring_pattern(pattern)
+    db.session.add(series)
+    db.session.flush()
+
+    created, skipped = materialize_series(series)
+    return series, created + 1, skipped
+
+
+def _slot_is_free(series, day):
+    """A materialized slot must fit the tutor's availability and calendar"""
+    tutor = series.tutor
+    if tutor and tutor.get_availability():
+        if not tutor.is_available_at(day.strftime('%A').lower(), series.scheduled_time.strftime('%H:%M')):
+            return False
+    conflict, _ = Class.check_time_conflict(series.tutor_id, day, series.scheduled_time, series.duration)
+    return not conflict
+
+
+def materialize_series(series, until=None):
+    """Create child rows for occurrences up to ``until`` (default: rolling window)
+
+    Slots that clash with the tutor's availability or another class are added
+    to the exdates instead. Returns (created, skipped).
+    """
+    until = until or window_end()
+    done = materialized_until(series)
+    if series.status == 'cancelled' or done >= until:
+        return 0, 0
+
+    start = series_start(series)
+    from_date = start if not series.get_recurring_pattern().get('materialized_until') else done + timedelta(days=1)
+    dates = occurrence_dates(series, from_date, until)
+
+    existing = {
+        row.occurrence_date for row in db.session.query(Class.occurrence_date).filter(
+            Class.parent_class_id == series.id,
+            Class.occurrence_date >= from_date,
+            Class.occurrence_date <= until
+        )
+    }
+    existing.add(series.occurrence_date or start)
+
+    created = 0
+    skipped = []
+    for day in dates:
+        if day in existing:
+            continue
+        if not _slot_is_free(series, day):
+            skipped.append(day.isoformat())
+            continue
+        occurrence = Class(**{field: getattr(series, field) for field in SERIES_FIELDS})
+        occurrence.scheduled_date = day
+        occurrence.occurrence_date = day
+        occurrence.parent_class_id = series.id
+        occurrence.status = 'scheduled'
+        db.session.add(occurrence)
+        created += 1
+
+    pattern = series.get_recurring_pattern()
+    _update_pattern(
+        series,
+        exdates=sorted(set(pattern.get('exdates', [])) | set(skipped)),
+        materialized_until=until.isoformat()
+    )
+    db.session.flush()
+    return created, len(skipped)
+
+
+def materialize_all(until=None, renew=None):
+    """Advance every active series to the rolling window; commits per series
+
+    ``renew`` is called after each committed series and stops the run when it
+    returns False.
+    """
+    until = until or window_end()
+    totals = {'series': 0, 'created': 0, 'skipped': 0}
+
+    series_ids = [row.id for row in db.session.query(Class.id).filter(
+        Class.is_recurring == True,
+        Class.parent_class_id.is_(None),
+        Class.status != 'cancelled'
+    )]
+    for series_id in series_ids:
+        series = db.session.get(Class, series_id)
+        end = series_end(series)
+        if materialized_until(series) >= until or (end and materialized_until(series) >= end):
+            continue
+        created, skipped = materialize_series(series, until)
+        db.session.commit()
+        totals['series'] += 1
+        totals['created'] += created
+        totals['skipped'] += skipped
+        if renew and not renew():
+            break
+
+    return totals
+
+
+def run_materializer(holder, lease_seconds, release=True):
+    """Materialize under the lease; None if another worker holds it"""
+    if not acquire_lease(LEASE_NAME, holder, lease_seconds):
+        return None
+    try:
+        return materialize_all(renew=lambda: acquire_lease(LEASE_NAME, holder, lease_seconds))
+    finally:
+        db.session.remove()
+        if release:
+            release_lease(LEASE_NAME, holder)
+
+
+def _materializer_loop(app, holder):
+    interval = app.config['SERIES_MATERIALIZE_INTERVAL']
+    # Spread workers out so they do not all wake at once
+    time.sleep(random.uniform(0, interval))
+    while True:
+        with app.app_context():
+            try:
+                # Keep the lease for the whole interval: one run per interval across all workers
+                totals = run_materializer(holder, interval, release=False)
+                if totals and totals['created']:
+                    print(f"Series materializer created {totals['created']} classes "
+                          f"for {totals['series']} series")
+            except OperationalError as exc:
+                db.session.rollback()
+                print(f'Series materializer skipped a run: {exc}')
+        time.sleep(interval)
+
+
+def start_materializer(app):
+    """Start the periodic materializer thread in this process, once"""
+    global _started
+    if _started:
+        return
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+        holder = f'{socket.gethostname()}:{os.getpid()}'
+        threading.Thread(target=_materializer_loop, args=(app, holder), daemon=True,
+                         name='series-materializer').start()
+
+
+class VirtualOccurrence:
+    """An occurrence beyond the materialized window; reads through to its series"""
+
+    is_virtual = True
+    id = None
+
+    def __init__(self, series, day):
+        self.series = series
+        self.scheduled_date = day
+        self.occurrence_date = day
+        self.parent_class_id = series.id
+        self.status = 'scheduled'
+        self.is_recurring = False
+
+    @property
+    def virtual_id(self):
+        return f'{self.series.id}:{self.scheduled_date.isoformat()}'
+
+    def get_scheduled_datetime(self):
+        return datetime.combine(self.scheduled_date, self.series.scheduled_time)
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['series'], name)
+
+
+def virtual_occurrences(start, end, tutor_id=None, student_id=None):
+    """Unmaterialized occurrences of all series within [start, end]"""
+    query = Class.query.filter(
+        Class.is_recurring == True,
+        Class.parent_class_id.is_(None),
+        Class.status != 'cancelled',
+        Class.scheduled_date <= end
+    )
+    if tutor_id:
+        query = query.filter(Class.tutor_id == tutor_id)
+
+    occurrences = []
+    for series in query.all():
+        if student_id and student_id not in series.get_students():
+            continue
+        done = materialized_until(series)
+        if done >= end:
+            continue
+        for day in occurrence_dates(series, max(start, done + timedelta(days=1)), end):
+            occurrences.append(VirtualOccurrence(series, day))
+    return occurrences
+
+
+def with_virtual_occurrences(classes, start, end, tutor_id=None, student_id=None):
+    """Merge virtual occurrences into a list of concrete classes, ordered by date and time"""
+    merged = list(classes) + virtual_occurrences(start, end, tutor_id, student_id)
+    merged.sort(key=lambda c: (c.scheduled_date, c.scheduled_time))
+    return merged
+
+
+def cancel_occurrence(series, day, reason=None):
+    """Cancel one occurrence, materialized or not"""
+    if day == (series.occurrence_date or series_start(series)):
+        occurrence = series
+    else:
+        occurrence = Class.query.filter_by(parent_class_id=series.id, occurrence_date=day).first()
+    if occurrence is not None:
+        occurrence.status = 'cancelled'
+        if reason:
+            occurrence.admin_notes = f"Cancelled: {reason}"
+        return occurrence
+
+    exdates = set(series.get_recurring_pattern().get('exdates', []))
+    exdates.add(day.isoformat())
+    _update_pattern(series, exdates=sorted(exdates))
+    return None
+
+
+def schedule_conflicts(occurrences, tutor_id, scheduled_time, duration):
+    """Occurrences that would clash with the tutor's availability or other classes
+
+    Runs the checks a single class create/edit runs, for every occurrence.
+    Returns ``[{'date', 'reason', 'class_id'}]``; raises ValueError when the
+    tutor cannot teach at all.
+    """
+    from app.models.tutor import Tutor
+
+    if not tutor_id:
+        return []
+    tutor = db.session.get(Tutor, tutor_id)
+    if not tutor:
+        raise ValueError('Tutor not found.')
+    name = tutor.user.full_name if tutor.user else f'Tutor #{tutor.id}'
+    if not tutor.get_availability():
+        raise ValueError(f'{name} has not set their availability yet.')
+    if tutor.status != 'active':
+        raise ValueError(f'{name} is not in active status.')
+
+    time_str = scheduled_time.strftime('%H:%M')
+    conflicts = []
+    for occurrence in occurrences:
+        day = occurrence.scheduled_date
+        if not tutor.is_available_at(day.strftime('%A').lower(), time_str):
+            conflicts.append({'date': day.isoformat(), 'class_id': None,
+                              'reason': f'{name} is not available on {day.strftime("%A")} at {time_str}'})
+            continue
+        clash, other = Class.check_time_conflict(tutor_id, day, scheduled_time, duration,
+                                                 exclude_class_id=occurrence.id)
+        if clash:
+            conflicts.append({'date': day.isoformat(), 'class_id': other.id,
+                              'reason': f'{name} already has {other.subject} at {other.scheduled_time.strftime("%H:%M")}'})
+    return conflicts
+
+
+def update_series(series, from_date=None, **changes):
+    """Apply field changes to a series and its upcoming untouched occurrences
+
+    Only the series row and materialized occurrences that are still plainly
+    scheduled from ``from_date`` on are updated; virtual occurrences follow
+    the series automatically and are checked as they are materialized. A
+    change of tutor, time or duration raises SeriesConflict, and changes
+    nothing, if any updated occurrence would clash.
+    """
+    changes = {k: v for k, v in changes.items() if k in EDITABLE_FIELDS}
+    from_date = from_date or date.today()
+
+    occurrences = Class.query.filter(
+        Class.parent_class_id == series.id,
+        Class.occurrence_date >= from_date,
+        Class.status == 'scheduled',
+        Class.scheduled_date == Class.occurrence_date
+    ).all()
+
+    if any(field in changes for field in SCHEDULE_FIELDS):
+        upcoming = list(occurrences)
+        if series.status == 'scheduled' and series.scheduled_date >= from_date:
+            upcoming.insert(0, series)
+        conflicts = schedule_conflicts(
+            upcoming,
+            changes.get('tutor_id', series.tutor_id),
+            changes.get('scheduled_time', series.scheduled_time),
+            changes.get('duration', series.duration)
+        )
+        if conflicts:
+            raise SeriesConflict(conflicts)
+
+    for field, value in changes.items():
+        setattr(series, field, value)
+    series.calculate_end_time()
+
+    for occurrence in occurrences:
+        for field, value in changes.items():
+            setattr(occurrence, field, value)
+        occurrence.calculate_end_time()
+    return len(occurrences)
+
+
+def end_series(series, last_date):
+    """Stop a series after ``last_date`` and drop later scheduled occurrences"""
+    _update_pattern(series, end_date=last_date.isoformat(), total_classes=None)
+    later = Class.query.filter(
+        Class.parent_class_id == series.id,
+        Class.occurrence_date > last_date,
+        Class.status == 'scheduled'
+    ).all()
+    for occurrence in later:
+        db.session.delete(occurrence)
+    return len(later)
+
+
+def bulk_create_series(params, created_by=None):
+    """Create a weekly series from the bulk-create form values
+
+    ``params`` holds the raw form strings (``days_of_week`` uses
+    date.weekday() numbering, 0=Monday). Raises ValueError with a message for
+    the admin when nothing can be scheduled. The caller commits.
+    """
+    from app.models.tutor import Tutor
+
+    tutor = db.session.get(Tutor, int(params['tutor_id']))
+    if not tutor:
+        raise ValueError('Tutor not found.')
+    if not tutor.get_availability():
+        raise ValueError(f'Cannot create classes: {tutor.user.full_name} has not set their availability yet.')
+    if tutor.status != 'active':
+        raise ValueError(f'Cannot create classes: {tutor.user.full_name} is not in active status.')
+
+    duration = int(params['duration'])
+    start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+    end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
+    start_time = datetime.strptime(params['start_time'], '%H:%M').time()
+    days_of_week = [int(d) for d in params.get('days_of_week', [])]
+    time_str = start_time.strftime('%H:%M')
+
+    # Drop weekdays the tutor is never available at this time
+    available_days = [d for d in days_of_week
+                      if tutor.is_available_at(calendar.day_name[d].lower(), time_str)]
+    if not available_days:
+        raise ValueError(f'Cannot create classes: {tutor.user.full_name} is not available at {time_str} on the selected days.')
+
+    # The first free slot becomes the series' first occurrence
+    skipped_count = 0
+    first_date = start_date
+    while first_date <= end_date:
+        if first_date.weekday() in available_days:
+            conflict, _ = Class.check_time_conflict(tutor.id, first_date, start_time, duration)
+            if not conflict:
+                break
+            skipped_count += 1
+        first_date += timedelta(days=1)
+    else:
+        raise ValueError('Cannot create classes: no free slot in the selected date range.')
+
+    # Store one series; occurrences are materialized for a rolling window only
+    pattern = {
+        'frequency': 'weekly',
+        'interval': 1,
+        'days_of_week': [(d + 1) % 7 for d in available_days],  # pattern uses 0=Sunday
+        'end_date': end_date.isoformat()
+    }
+    series, created_count, skipped = create_series(
+        pattern,
+        students=[int(s) for s in params.get('students', [])],
+        subject=params['subject'],
+        class_type=params['class_type'],
+        scheduled_date=first_date,
+        scheduled_time=start_time,
+        duration=duration,
+        tutor_id=tutor.id,
+        grade=params['grade'],
+        status='scheduled',
+        created_by=created_by
+    )
+    skipped_count += skipped
+    total_count = len(occurrence_dates(series))
+
+    message = f'Recurring series created with {total_count} classes; {created_count} are scheduled now and the rest are added as their dates approach.'
+    if skipped_count > 0 or len(available_days) < len(days_of_week):
+        message += f' {skipped_count} dates were skipped due to availability conflicts or existing bookings.'
+
+    return {
+        'series_id': series.id,
+        'total': total_count,
+        'created': created_count,
+        'skipped': skipped_count,
+        'message': message
+    }
+
+
+@job_handler('bulk_create_classes')
+def bulk_create_job(ctx, params, created_by=None):
+    """Background version of bulk_create_series"""
+    ctx.progress(0, 1, 'Creating series', force=True)
+    result = bulk_create_series(params, created_by=created_by)
+    db.session.commit()
+    return result
+
+
+def init_app(app):
+    """Register the materialization command and, if configured, the periodic materializer"""
+    app.config.setdefault('SERIES_MATERIALIZE_DAYS', 28)
+    app.config.setdefault('SERIES_MATERIALIZE_INTERVAL', 0)
+
+    if app.config['SERIES_MATERIALIZE_INTERVAL'] and not app.testing:
+        # Started on the first request so CLI commands never materialize by accident
+        @app.before_request
+        def _start_series_materializer():
+            start_materializer(current_app._get_current_object())
+
+    @app.cli.command('materialize-series')
+    def materialize_series_command():
+        """Materialize recurring class occurrences up to the rolling window"""
+        holder = f'cli:{socket.gethostname()}:{os.getpid()}'
+        if not acquire_lease(LEASE_NAME, holder, 600):
+            print('Another worker is materializing series; try again later')
+            return
+        try:
+            totals = materialize_all(renew=lambda: acquire_lease(LEASE_NAME, holder, 600))
+        finally:
+            release_lease(LEASE_NAME, holder)
+        print(f"Advanced {totals['series']} series: {totals['created']} classes created, "
+              f"{totals['skipped']} slots skipped")
@@ -0,0 +1,394 @@
+"""Content-addressed storage for uploaded documents and videos.
+
+Uploads are hashed (SHA-256) while they are streamed to disk and kept once
+per digest in sharded folders::
+
+    <STORAGE_FOLDER>/3f/a9/3fa9...c2        (no extension)
+
+Records keep a name of the form ``<digest>.<ext>`` in the same columns as
+before (``documents`` JSON, ``demo_video``, ``interview_video``,
+``video_link``), so templates and the media endpoint work unchanged.
+``stored_files`` has one row per blob. ``file_references`` lists which record
+field points at which blob; a flush listener keeps it in step with those
+columns. Blobs nobody references are removed by ``flask storage-gc``.
+
+Files saved before this existed are converted by the ``dedupe`` migration
+(or ``flask dedupe-uploads``): each is hashed into the store, the record
+updated and the duplicate copies deleted.
+
+The store lives under ``instance/`` so the static route cannot serve it.
+Blobs written to the earlier ``static/uploads/blobs`` location are moved over
+by ``flask move-blobs``.
+"""
+import hashlib
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models.class_model import Class
+from app.models.stored_file import StoredFile, FileReference
+from app.models.student import Student
+from app.models.tutor import Tutor
+
+CHUNK_SIZE = 1024 * 1024
+
+NAME_PATTERN = re.compile(r'^([0-9a-f]{64})(?:\.[a-z0-9]{1,10})?$')
+
+# Upload subfolders whose files go to the store
+STORED_SUBFOLDERS = ('documents', 'videos')
+
+# Record columns holding stored names; 'documents' is a JSON dict of them
+REFERENCE_FIELDS = {
+    Tutor: ('tutor', ('documents', 'demo_video', 'interview_video')),
+    Student: ('student', ('documents',)),
+    Class: ('class', ('video_link',))
+}
+
+
+def parse_name(name):
+    """Digest of a stored name, or None for anything else (legacy names, URLs)"""
+    match = NAME_PATTERN.match(name) if isinstance(name, str) else None
+    return match.group(1) if match else None
+
+
+def _storage_folder():
+    return current_app.config['STORAGE_FOLDER']
+
+
+def blob_path(digest, folder=None):
+    return os.path.join(folder or _storage_folder(), digest[:2], digest[2:4], digest)
+
+
+def path_for_name(name):
+    """Path of the blob behind a stored name, if it exists"""
+    digest = parse_name(name)
+    if not digest:
+        return None
+    path = blob_path(digest)
+    return path if os.path.isfile(path) else None
+
+
+def _extension(filename):
+    if not filename or '.' not in filename:
+        return None
+    extension = filename.rsplit('.', 1)[1].lower()
+    return extension if re.fullmatch(r'[a-z0-9]{1,10}', extension) else None
+
+
+def write_blob(stream, folder=None):
+    """Stream a file into the store while hashing it; returns (digest, size)"""
+    folder = folder or _storage_folder()
+    tmp_folder = os.path.join(folder, 'tmp')
+    os.makedirs(tmp_folder, exist_ok=True)
+    tmp_path = os.path.join(tmp_folder, uuid.uuid4().hex)
+
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+
+        digest = sha.hexdigest()
+        path = blob_path(digest, folder)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest, size
+
+
+def store_file(upload):
+    """Store an uploaded file (werkzeug FileStorage); returns its StoredFile"""
+    digest, size = write_blob(upload.stream)
+
+    stored = StoredFile.query.filter_by(digest=digest).first()
+    # Reusing a blob restarts its GC grace period; the update also locks the
+    # row, so a concurrent collect_garbage either waits for us or wins outright
+    if stored is None or not StoredFile.query.filter_by(id=stored.id).update(
+            {'created_at': datetime.utcnow()}, synchronize_session=False):
+        try:
+            with db.session.begin_nested():
+                stored = StoredFile(digest=digest, size=size, extension=_extension(upload.filename),
+                                    original_filename=(upload.filename or '')[:255])
+                db.session.add(stored)
+        except IntegrityError:
+            # Another request stored the same content first
+            stored = StoredFile.query.filter_by(digest=digest).one()
+
+    if not os.path.exists(blob_path(digest)):
+        # collect_garbage removed the blob after write_blob found it in place
+        upload.stream.seek(0)
+        write_blob(upload.stream)
+    return stored
+
+
+def _field_names(obj, fields):
+    """(field, digest) pairs for the stored names an owner currently holds"""
+    pairs = []
+    for field in fields:
+        if field == 'documents':
+            pairs += [(key, parse_name(value)) for key, value in obj.get_documents().items()]
+        else:
+            pairs.append((field, parse_name(getattr(obj, field))))
+    return {(field, digest) for field, digest in pairs if digest}
+
+
+def _after_flush(session, flush_context):
+    """Rewrite the file references of owners whose file columns changed"""
+    changed, removed = [], []
+    for obj in session.new:
+        if type(obj) in REFERENCE_FIELDS and _field_names(obj, REFERENCE_FIELDS[type(obj)][1]):
+            changed.append(obj)
+    for obj in session.dirty:
+        if type(obj) in REFERENCE_FIELDS:
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in REFERENCE_FIELDS[type(obj)][1]):
+                changed.append(obj)
+    for obj in session.deleted:
+        if type(obj) in REFERENCE_FIELDS:
+            removed.append(obj)
+    if not changed and not removed:
+        return
+
+    wanted = []
+    for obj in changed:
+        owner_type, fields = REFERENCE_FIELDS[type(obj)]
+        wanted += [(owner_type, obj.id, field, digest) for field, digest in _field_names(obj, fields)]
+
+    references = FileReference.__table__
+    files = StoredFile.__table__
+    connection = session.connection(bind_arguments={'mapper': inspect(FileReference)})
+    for obj in changed + removed:
+        connection.execute(references.delete().where(
+            references.c.owner_type == REFERENCE_FIELDS[type(obj)][0],
+            references.c.owner_id == obj.id
+        ))
+    if not wanted:
+        return
+
+    file_ids = dict(connection.execute(
+        sa.select(files.c.digest, files.c.id).where(files.c.digest.in_({row[3] for row in wanted}))
+    ).all())
+    rows = [
+        {'file_id': file_ids[digest], 'owner_type': owner_type, 'owner_id': owner_id, 'field': field}
+        for owner_type, owner_id, field, digest in wanted if digest in file_ids
+    ]
+    if rows:
+        connection.execute(references.insert(), rows)
+
+
+def collect_garbage(min_age_hours=24):
+    """Delete blobs no record references; recent ones are kept for in-flight uploads"""
+    cutoff = datetime.utcnow() - timedelta(hours=min_age_hours)
+    orphaned = (StoredFile.created_at < cutoff, ~StoredFile.references.any())
+    candidates = db.session.query(StoredFile.id, StoredFile.digest, StoredFile.size).filter(*orphaned).all()
+
+    count = freed = 0
+    for file_id, digest, size in candidates:
+        # Checked again in the DELETE: an upload may have reused the blob since the scan
+        if not StoredFile.query.filter(StoredFile.id == file_id, *orphaned).delete(synchronize_session=False):
+            continue
+        # Removed before the commit, while the row lock holds off store_file
+        path = blob_path(digest)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.commit()
+        count += 1
+        freed += size or 0
+    return count, freed
+
+
+# ============ LEGACY CONVERSION ============
+
+def dedupe_legacy_uploads(connection, upload_folder, storage_folder):
+    """Move files saved under their upload name into the store
+
+    Works on plain tables so the migration can run it. Record values that
+    name an existing file in ``documents``/``videos`` are replaced by stored
+    names, references are recorded, and the converted files are deleted.
+    Already converted values are left alone, so it can run more than once.
+    """
+    tutors = sa.table('tutors', sa.column('id'), sa.column('documents'),
+                      sa.column('demo_video'), sa.column('interview_video'))
+    students = sa.table('students', sa.column('id'), sa.column('documents'))
+    classes = sa.table('classes', sa.column('id'), sa.column('video_link'))
+    files = sa.table('stored_files', sa.column('id'), sa.column('digest'), sa.column('size'),
+                     sa.column('extension'), sa.column('original_filename'), sa.column('created_at'))
+    references = sa.table('file_references', sa.column('file_id'), sa.column('owner_type'),
+                          sa.column('owner_id'), sa.column('field'))
+
+    stats = {'files': 0, 'blobs': 0, 'bytes_saved': 0}
+    hashed = {}  # legacy path -> (digest, size)
+    converted = set()
+
+    def store(subfolder, name):
+        """Stored name for a legacy value, or None if it is not a legacy file"""
+        if not isinstance(name, str) or not name or parse_name(name) or '/' in name or name.startswith('.'):
+            return None
+        path = os.path.join(upload_folder, subfolder, name)
+        if not os.path.isfile(path):
+            return None
+
+        if path not in hashed:
+            with open(path, 'rb') as f:
+                digest, size = write_blob(f, storage_folder)
+            hashed[path] = (digest, size)
+            existing = connection.execute(sa.select(files.c.id).where(files.c.digest == digest)).scalar()
+            if existing:
+                stats['bytes_saved'] += size
+            else:
+                connection.execute(files.insert().values(
+                    digest=digest, size=size, extension=_extension(name),
+                    original_filename=name[:255], created_at=datetime.utcnow()
+                ))
+                stats['blobs'] += 1
+            stats['files'] += 1
+        converted.add(path)
+
+        digest = hashed[path][0]
+        extension = connection.execute(sa.select(files.c.extension).where(files.c.digest == digest)).scalar()
+        return f'{digest}.{extension}' if extension else digest
+
+    def record_references(owner_type, owner_id, pairs):
+        connection.execute(references.delete().where(
+            references.c.owner_type == owner_type, references.c.owner_id == owner_id
+        ))
+        for field, name in pairs:
+            digest = parse_name(name)
+            file_id = connection.execute(sa.select(files.c.id).where(files.c.digest == digest)).scalar()
+            if file_id:
+                connection.execute(references.insert().values(
+                    file_id=file_id, owner_type=owner_type, owner_id=owner_id, field=field
+                ))
+
+    def convert_documents(raw):
+        try:
+            documents = json.loads(raw) if raw else {}
+        except ValueError:
+            return None, {}
+        if not isinstance(documents, dict):
+            return None, {}
+        changed = False
+        for key, value in documents.items():
+            new_name = store('documents', value)
+            if new_name:
+                documents[key] = new_name
+                changed = True
+        return (json.dumps(documents) if changed else None), documents
+
+    for row in connection.execute(sa.select(tutors)).all():
+        new_documents, documents = convert_documents(row.documents)
+        values = {'documents': new_documents} if new_documents else {}
+        pairs = [(key, value) for key, value in documents.items() if parse_name(value)]
+        for field in ('demo_video', 'interview_video'):
+            name = store('videos', getattr(row, field)) or getattr(row, field)
+            if name != getattr(row, field):
+                values[field] = name
+            if parse_name(name):
+                pairs.append((field, name))
+        if values:
+            connection.execute(tutors.update().where(tutors.c.id == row.id).values(**values))
+        if pairs:
+            record_references('tutor', row.id, pairs)
+
+    for row in connection.execute(sa.select(students).where(students.c.documents.isnot(None))).all():
+        new_documents, documents = convert_documents(row.documents)
+        if new_documents:
+            connection.execute(students.update().where(students.c.id == row.id).values(documents=new_documents))
+        pairs = [(key, value) for key, value in documents.items() if parse_name(value)]
+        if pairs:
+            record_references('student', row.id, pairs)
+
+    for row in connection.execute(sa.select(classes).where(classes.c.video_link.isnot(None))).all():
+        name = store('videos', row.video_link) or row.video_link
+        if name != row.video_link:
+            connection.execute(classes.update().where(classes.c.id == row.id).values(video_link=name))
+        if parse_name(name):
+            record_references('class', row.id, [('video_link', name)])
+
+    stats['converted'] = sorted(converted)
+    return stats
+
+
+def remove_converted(paths):
+    """Delete legacy copies once the records pointing at the store are committed"""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def legacy_storage_folder(config):
+    """Where the store used to live, inside the static folder"""
+    return os.path.join(config['UPLOAD_FOLDER'], 'blobs')
+
+
+def move_blobs(source, target):
+    """Move every blob under ``source`` to the same place under ``target``; returns the count"""
+    moved = 0
+    for folder, _, files in os.walk(source):
+        for name in files:
+            if not NAME_PATTERN.match(name):
+                continue
+            path = os.path.join(folder, name)
+            destination = blob_path(name, target)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if os.path.exists(destination):
+                # Same digest, same bytes
+                os.remove(path)
+            else:
+                os.replace(path, destination)
+            moved += 1
+    return moved
+
+
+def init_app(app):
+    """Register the reference listener and the storage commands"""
+    app.config.setdefault('STORAGE_FOLDER', os.path.join(app.instance_path, 'blobs'))
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+    legacy = legacy_storage_folder(app.config)
+    if os.path.abspath(legacy) != os.path.abspath(app.config['STORAGE_FOLDER']) and \
+            any(files for _, _, files in os.walk(legacy)):
+        print(f"Stored files remain in {legacy}; run 'flask move-blobs' to move them to STORAGE_FOLDER")
+
+    @app.cli.command('move-blobs')
+    def move_blobs_command():
+        """Move blobs from static/uploads/blobs into STORAGE_FOLDER"""
+        count = move_blobs(legacy, app.config['STORAGE_FOLDER'])
+        print(f"Moved {count} stored files to {app.config['STORAGE_FOLDER']}")
+
+    @app.cli.command('storage-gc')
+    @click.option('--min-age-hours', default=24, help='Keep unreferenced blobs younger than this')
+    def storage_gc_command(min_age_hours):
+        """Delete stored files that no record references"""
+        count, freed = collect_garbage(min_age_hours)
+        print(f"Removed {count} unreferenced files ({freed / 1024 / 1024:.1f} MB)")
+
+    @app.cli.command('dedupe-uploads')
+    def dedupe_uploads_command():
+        """Move legacy document and video uploads into the content-addressed store"""
+        with db.engine.begin() as connection:
+            stats = dedupe_legacy_uploads(connection, app.config['UPLOAD_FOLDER'], app.config['STORAGE_FOLDER'])
+        remove_converted(stats['converted'])
+        print(f"Converted {stats['files']} files into {stats['blobs']} new blobs "
+              f"({stats['bytes_saved'] / 1024 / 1024:.1f} MB of duplicates removed)")
@@ -0,0 +1,137 @@
+"""Compact (columnar) timetable payloads.
+
+A department week can hold thousands of classes, and the row format repeats
+every key and every tutor name per class. The compact format sends one array
+per field instead, with repeated strings replaced by indexes into small
+dictionaries::
+
+    {
+      "format": "compact",
+      "count": 3,
+      "dictionaries": {"tutors": ["A. Rao", ...], "subjects": [...],
+                       "statuses": [...], "class_types": [...]},
+      "columns": {
+        "id": [17, 18, null],          # null for virtual occurrences
+        "series_id": [null, 4, 4],
+        "day": [0, 0, 3],              # days after week_start
+        "start": [600, 660, 660],      # minutes after midnight
+        "duration": [60, 60, 45],
+        "tutor": [0, 1, 1],            # index into dictionaries.tutors, -1 if none
+        "subject": [...], "status": [...], "class_type": [...],
+        "student_count": [1, 1, 3]
+      }
+    }
+
+Clients ask for it with ``?format=compact`` or ``Accept: application/vnd.timetable.compact+json``.
+Rows come from a column-only Core query, so no ``Class`` objects are built
+for materialized classes.
+"""
+import json
+import sqlalchemy as sa
+from flask import request
+from app import db
+from app.models.class_model import Class
+from app.models.tutor import Tutor
+from app.models.user import User
+from app.utils.series import virtual_occurrences
+
+COMPACT_MIMETYPE = 'application/vnd.timetable.compact+json'
+
+NO_TUTOR = 'No Tutor Assigned'
+
+
+def wants_compact():
+    """True if the request asked for the compact format"""
+    if request.args.get('format') == 'compact':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', COMPACT_MIMETYPE])
+    return best == COMPACT_MIMETYPE
+
+
+class _Dictionary:
+    """Assigns each distinct value a small integer, in order of appearance"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        if value not in self._codes:
+            self._codes[value] = len(self.values)
+            self.values.append(value)
+        return self._codes[value]
+
+
+def _student_count(class_type, primary_student_id, raw_students):
+    # Same rule as Class.get_students
+    if class_type == 'one_on_one':
+        return 1 if primary_student_id else 0
+    if raw_students:
+        try:
+            return len(json.loads(raw_students))
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def timetable_rows(start, end):
+    """(id, series_id, date, time, duration, tutor, subject, status, class_type, students)
+    for classes and virtual occurrences in [start, end], ordered by date and time"""
+    stmt = sa.select(
+        Class.id, Class.parent_class_id, Class.is_recurring, Class.scheduled_date, Class.scheduled_time,
+        Class.duration, User.full_name, Class.subject, Class.status, Class.class_type,
+        Class.primary_student_id, Class.students
+    ).select_from(Class)\
+        .outerjoin(Tutor, Tutor.id == Class.tutor_id)\
+        .outerjoin(User, User.id == Tutor.user_id)\
+        .where(Class.scheduled_date >= start, Class.scheduled_date <= end)
+
+    rows = [
+        (class_id, parent_id or (class_id if recurring else None), day, at, duration,
+         tutor_name or NO_TUTOR, subject, status, class_type, _student_count(class_type, primary, raw))
+        for class_id, parent_id, recurring, day, at, duration, tutor_name, subject, status, class_type,
+            primary, raw in db.session.execute(stmt)
+    ]
+
+    for occurrence in virtual_occurrences(start, end):
+        tutor = occurrence.tutor
+        tutor_name = tutor.user.full_name if tutor and tutor.user else NO_TUTOR
+        rows.append((None, occurrence.parent_class_id, occurrence.scheduled_date, occurrence.scheduled_time,
+                     occurrence.duration, tutor_name, occurrence.subject, occurrence.status,
+                     occurrence.class_type, len(occurrence.get_students() or [])))
+
+    rows.sort(key=lambda row: (row[2], row[3]))
+    return rows
+
+
+def compact_payload(rows, start):
+    """Turn timetable rows into parallel column arrays with dictionary-encoded strings"""
+    tutors, subjects, statuses, class_types = _Dictionary(), _Dictionary(), _Dictionary(), _Dictionary()
+    columns = {name: [] for name in (
+        'id', 'series_id', 'day', 'start', 'duration', 'tutor', 'subject', 'status', 'class_type',
+        'student_count'
+    )}
+
+    for class_id, series_id, day, at, duration, tutor_name, subject, status, class_type, students in rows:
+        columns['id'].append(class_id)
+        columns['series_id'].append(series_id)
+        columns['day'].append((day - start).days)
+        columns['start'].append(at.hour * 60 + at.minute)
+        columns['duration'].append(duration)
+        columns['tutor'].append(tutors.code(tutor_name) if tutor_name != NO_TUTOR else -1)
+        columns['subject'].append(subjects.code(subject))
+        columns['status'].append(statuses.code(status))
+        columns['class_type'].append(class_types.code(class_type))
+        columns['student_count'].append(students)
+
+    return {
+        'format': 'compact',
+        'count': len(rows),
+        'dictionaries': {
+            'tutors': tutors.values,
+            'subjects': subjects.values,
+            'statuses': statuses.values,
+            'class_types': class_types.values,
+        },
+        'columns': columns,
+    }
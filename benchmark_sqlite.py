@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Benchmark for LMS Project
+Simulates gunicorn workers hitting one SQLite file: writer processes insert
+classes in small batches (like bulk class creation and attendance marking)
+while reader processes run dashboard-style aggregates. Runs once with the
+stock settings and once with the production profile from
+app/utils/database.py, then compares throughput and lock errors.
+
+Usage: python benchmark_sqlite.py [--seconds 10] [--readers 4] [--writers 2] [--batch 20]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from app.utils.database import SQLITE_DEFAULTS, apply_sqlite_pragmas
+
+SCHEMA = """
+CREATE TABLE classes (
+    id INTEGER PRIMARY KEY,
+    tutor_id INTEGER NOT NULL,
+    scheduled_date DATE NOT NULL,
+    scheduled_time TIME NOT NULL,
+    status VARCHAR(20),
+    subject VARCHAR(100),
+    class_notes TEXT
+)
+"""
+INDEX = "CREATE INDEX ix_classes_tutor_date_status ON classes (tutor_id, scheduled_date, status)"
+
+READ_SQL = text("""
+    SELECT status, COUNT(*) FROM classes
+    WHERE tutor_id = :tutor_id AND scheduled_date BETWEEN :start AND :end
+    GROUP BY status
+""")
+WRITE_SQL = text("""
+    INSERT INTO classes (tutor_id, scheduled_date, scheduled_time, status, subject, class_notes)
+    VALUES (:tutor_id, :scheduled_date, '10:00:00', 'scheduled', 'Math', :notes)
+""")
+
+
+def make_engine(path, tuned):
+    # Stock pysqlite waits 5 seconds on a locked database before giving up
+    engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': 5})
+    if tuned:
+        settings = dict(SQLITE_DEFAULTS)
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, settings)
+    return engine
+
+
+def prepare(path, tuned, rows=20000):
+    engine = make_engine(path, tuned)
+    with engine.begin() as connection:
+        if not tuned:
+            connection.execute(text('PRAGMA journal_mode = DELETE'))
+        connection.execute(text(SCHEMA))
+        connection.execute(text(INDEX))
+        today = date.today()
+        connection.execute(WRITE_SQL, [
+            {'tutor_id': i % 50, 'scheduled_date': today + timedelta(days=i % 365), 'notes': 'x' * 200}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+def worker(role, path, tuned, seconds, batch, results):
+    engine = make_engine(path, tuned)
+    ops = errors = 0
+    latencies = []
+    today = date.today()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'writer':
+                with engine.begin() as connection:
+                    tutor_id = random.randrange(50)
+                    connection.execute(WRITE_SQL, [
+                        {'tutor_id': tutor_id,
+                         'scheduled_date': today + timedelta(days=random.randrange(365)),
+                         'notes': 'x' * 200}
+                        for _ in range(batch)
+                    ])
+            else:
+                with engine.connect() as connection:
+                    start = today + timedelta(days=random.randrange(300))
+                    connection.execute(READ_SQL, {
+                        'tutor_id': random.randrange(50), 'start': start,
+                        'end': start + timedelta(days=30)
+                    }).fetchall()
+            ops += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+
+    engine.dispose()
+    results.put((role, ops, errors, latencies))
+
+
+def run(path, tuned, args):
+    results = multiprocessing.Queue()
+    roles = ['writer'] * args.writers + ['reader'] * args.readers
+    processes = [
+        multiprocessing.Process(target=worker, args=(role, path, tuned, args.seconds, args.batch, results))
+        for role in roles
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        rows = [r for r in collected if r[0] == role]
+        latencies = sorted(l for r in rows for l in r[3])
+        summary[role] = {
+            'ops_per_sec': sum(r[1] for r in rows) / args.seconds,
+            'errors': sum(r[2] for r in rows),
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrency benchmark')
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=20, help='rows per write transaction')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='lms-sqlite-bench-')
+    print(f"🔄 {args.writers} writers, {args.readers} readers, {args.seconds}s per run")
+
+    try:
+        results = {}
+        for label, tuned in (('stock', False), ('tuned', True)):
+            path = os.path.join(workdir, f'{label}.db')
+            prepare(path, tuned)
+            print(f"⏱️  Running {label} profile...")
+            results[label] = run(path, tuned, args)
+
+        print("=" * 64)
+        print(f"{'profile':<8} {'role':<7} {'ops/s':>10} {'p95 ms':>10} {'locked errors':>15}")
+        for label, summary in results.items():
+            for role, stats in summary.items():
+                print(f"{label:<8} {role:<7} {stats['ops_per_sec']:>10.1f} "
+                      f"{stats['p95_ms']:>10.1f} {stats['errors']:>15}")
+        print("=" * 64)
+
+        for role in ('writer', 'reader'):
+            before = results['stock'][role]['ops_per_sec']
+            after = results['tuned'][role]['ops_per_sec']
+            change = (after / before) if before else float('inf')
+            print(f"📈 {role} throughput: {before:.1f} -> {after:.1f} ops/s ({change:.1f}x)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,9 +10,38 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Read replicas: comma-separated URLs, each registered as a bind (see app/utils/routing.py)
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in enumerate(DATABASE_REPLICA_URLS)}
+    SQLALCHEMY_REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+    REPLICA_READ_AFTER_WRITE_SECONDS = 5  # Keep a user on the primary this long after they write
+    
+    # SQLite profile (ignored for other databases), see app/utils/database.py
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'true').lower() in ['true', 'on', '1']
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 15000))  # ms
+    SQLITE_CACHE_SIZE = -65536  # 64 MB
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CHECKPOINT_INTERVAL = 300  # seconds
+    
     # File Upload Settings - INCREASED LIMITS
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024 * 1024))  # 5GB max file size
+    
+    # Image thumbnails: square edge in pixels per size name, written next to the original
+    IMAGE_THUMBNAIL_SIZES = {'sm': 96, 'md': 320}
+    IMAGE_THUMBNAIL_FOLDERS = ('profiles',)  # Upload subfolders that get thumbnails
+    IMAGE_THUMBNAIL_QUALITY = 82
+    
+    # Documents and videos are stored once per SHA-256 digest under here, outside the static folder
+    STORAGE_FOLDER = os.path.join(basedir, 'instance', 'blobs')
+    
+    # Videos and documents: 'python' (send_file with Range), 'x-accel' (nginx) or 'x-sendfile' (Apache)
+    MEDIA_DELIVERY = os.environ.get('MEDIA_DELIVERY') or 'python'
+    MEDIA_ACCEL_PREFIX = '/protected-uploads/'  # nginx internal location aliased to UPLOAD_FOLDER
+    MEDIA_ACCEL_BLOB_PREFIX = '/protected-blobs/'  # nginx internal location aliased to STORAGE_FOLDER
+    MEDIA_MAX_AGE = 3600
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'mp4', 'avi', 'mov'}
     
     # Email Settings
@@ -25,9 +54,64 @@ class Config:
     
     # Pagination
     POSTS_PER_PAGE = 25
+    MY_STUDENTS_PER_PAGE = 30  # Student cards per page on the tutor's My Students view
+    
+    # Recurring series: occurrences are created as rows this many days ahead
+    SERIES_MATERIALIZE_DAYS = 28
+    SERIES_MATERIALIZE_INTERVAL = int(os.environ.get('SERIES_MATERIALIZE_INTERVAL', 3600))  # Seconds between runs that roll the window forward; 0 disables the in-process materializer
+    
+    # Exports: rows fetched from the database per batch while streaming
+    EXPORT_BATCH_SIZE = 1000
+    
+    # Background jobs (database-backed queue, see app/utils/jobs.py)
+    JOB_ARTIFACT_FOLDER = os.path.join(basedir, 'instance', 'jobs')
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 1))  # In-process workers; 0 when running `flask jobs-worker`
+    JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 2))  # Default for `flask jobs-worker`
+    JOB_POLL_INTERVAL = 2  # Seconds between queue polls when idle
+    JOB_PROGRESS_INTERVAL = 1  # Minimum seconds between progress writes
+    JOB_HEARTBEAT_SECONDS = 30
+    JOB_STALE_SECONDS = 300  # Running jobs without a heartbeat for this long are failed
+
+    # Encode JSON responses with orjson when it is installed (see app/utils/serialization.py)
+    JSON_USE_ORJSON = os.environ.get('JSON_USE_ORJSON', 'true').lower() == 'true'
+
+    # Class lifecycle sweeper (see app/utils/lifecycle.py)
+    CLASS_SWEEP_INTERVAL = int(os.environ.get('CLASS_SWEEP_INTERVAL', 300))  # Seconds between sweeps; 0 disables the in-process sweeper
+    CLASS_SWEEP_GRACE_MINUTES = 60  # Minutes after a class ends before it is closed
+    CLASS_SWEEP_BATCH_SIZE = 500  # Classes per UPDATE statement
+
+    # Hot/cold archival of finished classes (see app/utils/archive.py)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))  # Age at which finished classes leave the hot tables
+    ARCHIVE_BATCH_SIZE = 1000  # Classes moved per transaction
+    ARCHIVE_PER_PAGE = 50  # Rows per page on the class history view
+    
+    # Slow-query log (see app/utils/query_log.py)
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 0))  # Statements at least this slow are logged; 0 disables timing
+    SLOW_QUERY_EXPLAIN = True  # Capture the EXPLAIN plan of slow SELECT statements
+    SLOW_QUERY_LOG = os.path.join(basedir, 'instance', 'slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024  # Size at which the log rotates
+    SLOW_QUERY_LOG_BACKUPS = 3  # Rotated files kept
+    
+    # Bulk imports: uploaded files awaiting their import job
+    IMPORT_FOLDER = os.path.join(basedir, 'instance', 'imports')
+    IMPORT_BATCH_SIZE = 500  # Rows per insert transaction
+    
+    # Batch tutor assignment
+    ASSIGNMENT_PROPOSAL_FOLDER = os.path.join(basedir, 'instance', 'assignments')
+    TUTOR_ASSIGNMENT_CAPACITY = 30  # Student subjects per tutor
+    TUTOR_ASSIGNMENT_DURATION = 60  # Minutes per weekly session
+    TUTOR_ASSIGNMENT_WEEKS = 12  # Length of the series created for an accepted row
+    
+    # Calendar Feeds (.ics)
+    CALENDAR_FEED_FOLDER = os.path.join(basedir, 'instance', 'calendars')
+    CALENDAR_TIMEZONE = os.environ.get('CALENDAR_TIMEZONE') or 'Asia/Kolkata'
+    CALENDAR_FEED_PAST_DAYS = 90
+    CALENDAR_FEED_MAX_AGE = 900  # Clients typically poll every 15 minutes
+    CALENDAR_UID_DOMAIN = 'lms.i2global.co.in'
     
     # Session Settings
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    IDENTITY_CACHE_TTL = 60  # Seconds a worker may reuse a logged-in user's cached identity
     
     # Default Admin Settings
     DEFAULT_ADMIN_EMAIL = 'care@i2global.co.in'
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Query Plan Report for LMS Project
+Runs EXPLAIN on the application's hottest queries and shows which index each
+one uses, so missing or unused indexes are easy to spot.
+
+Usage: python explain_queries.py [--verbose]
+"""
+
+import re
+import sys
+from datetime import date, timedelta
+from sqlalchemy import text
+from app import create_app, db
+from app.models.user import User
+from app.models.tutor import Tutor
+from app.models.student import Student
+from app.models.class_model import Class
+from app.models.attendance import Attendance
+
+
+def sample_ids():
+    """Pick real ids so the planner sees realistic values"""
+    tutor = Tutor.query.first()
+    student = Student.query.first()
+    user = User.query.filter_by(role='coordinator').first() or User.query.first()
+    return {
+        'tutor_id': tutor.id if tutor else 1,
+        'student_id': student.id if student else 1,
+        'department_id': user.department_id if user and user.department_id else 1,
+        'class_id': (Class.query.with_entities(Class.id).first() or (1,))[0],
+    }
+
+
+def hot_queries(ids):
+    """(description, query, index expected to serve it)"""
+    today = date.today()
+    return [
+        ("Tutor classes today",
+         Class.query.filter(Class.tutor_id == ids['tutor_id'], Class.scheduled_date == today),
+         'ix_classes_tutor_date_status'),
+        ("Tutor upcoming week (scheduled)",
+         Class.query.filter(Class.tutor_id == ids['tutor_id'],
+                            Class.scheduled_date > today,
+                            Class.scheduled_date <= today + timedelta(days=7),
+                            Class.status == 'scheduled')
+         .order_by(Class.scheduled_date, Class.scheduled_time),
+         'ix_classes_tutor_date_status'),
+        ("Tutor calendar month",
+         Class.query.filter(Class.tutor_id == ids['tutor_id'],
+                            Class.scheduled_date >= today.replace(day=1),
+                            Class.scheduled_date <= today.replace(day=1) + timedelta(days=31)),
+         'ix_classes_tutor_date_status'),
+        ("Admin classes by date",
+         Class.query.filter(Class.scheduled_date == today).order_by(Class.scheduled_time),
+         'ix_classes_date_time'),
+        ("Admin classes list",
+         Class.query.order_by(Class.scheduled_date.desc(), Class.scheduled_time.desc()).limit(25),
+         'ix_classes_date_time'),
+        ("Student class history",
+         Class.query.filter(Class.primary_student_id == ids['student_id'])
+         .order_by(Class.scheduled_date.desc()),
+         'ix_classes_student_date'),
+        ("Recurring occurrences",
+         Class.query.filter(Class.parent_class_id == ids['class_id']),
+         'ix_classes_parent_class_id'),
+        ("Attendance for class",
+         Attendance.query.filter(Attendance.class_id == ids['class_id']),
+         'ix_attendance_class_id'),
+        ("Tutor attendance range",
+         Attendance.query.filter(Attendance.tutor_id == ids['tutor_id'],
+                                 Attendance.class_date >= today - timedelta(days=30))
+         .order_by(Attendance.class_date.desc()),
+         'ix_attendance_tutor_date'),
+        ("Student attendance range",
+         Attendance.query.filter(Attendance.student_id == ids['student_id'],
+                                 Attendance.class_date >= today - timedelta(days=30)),
+         'ix_attendance_student_date'),
+        ("Today's attendance",
+         Attendance.query.filter(Attendance.class_date == today),
+         'ix_attendance_class_date'),
+        ("Active students in department",
+         Student.query.filter(Student.is_active == True,
+                              Student.department_id == ids['department_id']),
+         'ix_students_active_department'),
+        ("Active tutors",
+         Tutor.query.filter(Tutor.status == 'active'),
+         'ix_tutors_status'),
+    ]
+
+
+def explain(query, dialect):
+    """Return the plan lines for a query"""
+    sql = str(query.statement.compile(dialect=db.engine.dialect,
+                                      compile_kwargs={'literal_binds': True}))
+    if dialect == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+        return [row[-1] for row in rows]
+    if dialect == 'postgresql':
+        rows = db.session.execute(text('EXPLAIN ' + sql)).fetchall()
+        return [row[0] for row in rows]
+    rows = db.session.execute(text('EXPLAIN ' + sql)).mappings().fetchall()
+    return [f"table={row.get('table')} key={row.get('key')} type={row.get('type')}" for row in rows]
+
+
+def indexes_used(plan_lines):
+    """Pull index names out of a plan"""
+    patterns = [
+        r'USING (?:COVERING )?INDEX (\w+)',   # SQLite
+        r'Index (?:Only )?Scan(?: Backward)? using (\w+)',  # PostgreSQL
+        r'Bitmap Index Scan on (\w+)',        # PostgreSQL
+        r'key=(\w+)',                          # MySQL
+    ]
+    found = []
+    for line in plan_lines:
+        for pattern in patterns:
+            for name in re.findall(pattern, line):
+                if name != 'None' and name not in found:
+                    found.append(name)
+    return found
+
+
+def run_report(verbose=False):
+    app = create_app()
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        print(f"🔍 Query plans ({dialect})")
+        print("=" * 70)
+
+        if dialect in ('sqlite', 'postgresql'):
+            db.session.execute(text('ANALYZE'))
+
+        missing = 0
+        for description, query, expected in hot_queries(sample_ids()):
+            plan = explain(query, dialect)
+            used = indexes_used(plan)
+            ok = expected in used
+            if not ok:
+                missing += 1
+
+            print(f"{'✅' if ok else '⚠️ '} {description}")
+            print(f"    expected: {expected}")
+            print(f"    used:     {', '.join(used) if used else 'none (full scan)'}")
+            if verbose or not ok:
+                for line in plan:
+                    print(f"      {line}")
+
+        print("=" * 70)
+        if missing:
+            print(f"⚠️  {missing} queries are not using their expected index.")
+            print("On small tables the planner may prefer a scan; re-run against production-sized data.")
+        else:
+            print("🎉 Every hot query uses its expected index.")
+
+
+if __name__ == '__main__':
+    run_report(verbose='--verbose' in sys.argv)
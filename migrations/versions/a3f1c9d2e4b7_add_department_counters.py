@@ -0,0 +1,42 @@
+"""add department headcount counters
+
+Revision ID: a3f1c9d2e4b7
+Revises: 59ae67c2c75d
+Create Date: 2026-10-19 11:02:17.604391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e4b7'
+down_revision = '59ae67c2c75d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('departments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('tutor_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('student_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the current data
+    op.execute("""
+        UPDATE departments SET
+            user_count = (SELECT COUNT(*) FROM users
+                          WHERE users.department_id = departments.id AND users.is_active = true),
+            tutor_count = (SELECT COUNT(*) FROM users
+                           WHERE users.department_id = departments.id AND users.is_active = true
+                           AND users.role = 'tutor'),
+            student_count = (SELECT COUNT(*) FROM students
+                             WHERE students.department_id = departments.id AND students.is_active = true)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('departments', schema=None) as batch_op:
+        batch_op.drop_column('student_count')
+        batch_op.drop_column('tutor_count')
+        batch_op.drop_column('user_count')
@@ -0,0 +1,80 @@
+"""content-addressed upload store with deduplication of existing files
+
+Revision ID: a8c2e6f4b1d3
+Revises: f1a7d3c9b5e2
+Create Date: 2026-10-19 20:05:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c2e6f4b1d3'
+down_revision = 'f1a7d3c9b5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('extension', sa.String(length=10), nullable=True),
+        sa.Column('original_filename', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('digest')
+    )
+    op.create_table('file_references',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('owner_type', sa.String(length=20), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['file_id'], ['stored_files.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('file_references', schema=None) as batch_op:
+        batch_op.create_index('ix_file_references_owner', ['owner_type', 'owner_id'], unique=False)
+        batch_op.create_index('ix_file_references_file_id', ['file_id'], unique=False)
+
+    # Move existing documents and videos into the store, one blob per digest
+    from flask import current_app
+    from app.utils.storage import dedupe_legacy_uploads, remove_converted
+
+    stats = dedupe_legacy_uploads(op.get_bind(), current_app.config['UPLOAD_FOLDER'],
+                                  current_app.config['STORAGE_FOLDER'])
+    remove_converted(stats['converted'])
+    print(f"Deduplicated {stats['files']} uploads into {stats['blobs']} blobs "
+          f"({stats['bytes_saved'] / 1024 / 1024:.1f} MB saved)")
+
+
+def downgrade():
+    # Give every stored file back a plain copy under the name the records hold
+    from flask import current_app
+    import os
+    import shutil
+
+    bind = op.get_bind()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    storage_folder = current_app.config['STORAGE_FOLDER']
+    rows = bind.execute(sa.text(
+        "SELECT DISTINCT f.digest, f.extension, r.owner_type, r.field FROM stored_files f "
+        "JOIN file_references r ON r.file_id = f.id"
+    )).all()
+    for digest, extension, owner_type, field in rows:
+        subfolder = 'videos' if field in ('video_link', 'demo_video', 'interview_video') else 'documents'
+        source = os.path.join(storage_folder, digest[:2], digest[2:4], digest)
+        target = os.path.join(upload_folder, subfolder, f'{digest}.{extension}' if extension else digest)
+        if os.path.exists(source) and not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+
+    with op.batch_alter_table('file_references', schema=None) as batch_op:
+        batch_op.drop_index('ix_file_references_file_id')
+        batch_op.drop_index('ix_file_references_owner')
+
+    op.drop_table('file_references')
+    op.drop_table('stored_files')
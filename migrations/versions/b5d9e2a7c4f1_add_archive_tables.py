@@ -0,0 +1,121 @@
+"""archive tables for historical classes and attendance
+
+Revision ID: b5d9e2a7c4f1
+Revises: c3f8a1d6e9b4
+Create Date: 2026-10-19 23:05:41.218367
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d9e2a7c4f1'
+down_revision = 'c3f8a1d6e9b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('class_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('tutor_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('student_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('tutor_present', sa.Boolean(), autoincrement=False, nullable=True),
+    sa.Column('student_present', sa.Boolean(), autoincrement=False, nullable=True),
+    sa.Column('class_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('scheduled_start', sa.Time(), autoincrement=False, nullable=True),
+    sa.Column('scheduled_end', sa.Time(), autoincrement=False, nullable=True),
+    sa.Column('tutor_join_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('tutor_leave_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('student_join_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('student_leave_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('tutor_late_minutes', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('student_late_minutes', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('tutor_early_leave_minutes', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('student_early_leave_minutes', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('class_duration_actual', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('student_engagement', sa.String(length=20), autoincrement=False, nullable=True),
+    sa.Column('participation_quality', sa.String(length=20), autoincrement=False, nullable=True),
+    sa.Column('tutor_absence_reason', sa.String(length=100), autoincrement=False, nullable=True),
+    sa.Column('student_absence_reason', sa.String(length=100), autoincrement=False, nullable=True),
+    sa.Column('attendance_notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('behavioral_notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('technical_issues', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('marked_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('marked_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('verified_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('verified_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('tutor_penalty_applied', sa.Boolean(), autoincrement=False, nullable=True),
+    sa.Column('penalty_amount', sa.Float(), autoincrement=False, nullable=True),
+    sa.Column('penalty_reason', sa.String(length=200), autoincrement=False, nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('attendance_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_attendance_archive_class_id', ['class_id'], unique=False)
+        batch_op.create_index('ix_attendance_archive_student_date', ['student_id', 'class_date'], unique=False)
+        batch_op.create_index('ix_attendance_archive_tutor_date', ['tutor_id', 'class_date'], unique=False)
+
+    op.create_table('classes_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('subject', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('class_type', sa.String(length=20), autoincrement=False, nullable=False),
+    sa.Column('grade', sa.String(length=10), autoincrement=False, nullable=True),
+    sa.Column('board', sa.String(length=50), autoincrement=False, nullable=True),
+    sa.Column('scheduled_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('scheduled_time', sa.Time(), autoincrement=False, nullable=False),
+    sa.Column('duration', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('end_time', sa.Time(), autoincrement=False, nullable=True),
+    sa.Column('tutor_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('primary_student_id', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('students', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('max_students', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('platform', sa.String(length=50), autoincrement=False, nullable=True),
+    sa.Column('meeting_link', sa.String(length=500), autoincrement=False, nullable=True),
+    sa.Column('meeting_id', sa.String(length=100), autoincrement=False, nullable=True),
+    sa.Column('meeting_password', sa.String(length=50), autoincrement=False, nullable=True),
+    sa.Column('backup_link', sa.String(length=500), autoincrement=False, nullable=True),
+    sa.Column('status', sa.String(length=20), autoincrement=False, nullable=True),
+    sa.Column('completion_status', sa.String(length=20), autoincrement=False, nullable=True),
+    sa.Column('actual_start_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('actual_end_time', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('class_notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('topics_covered', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('homework_assigned', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('video_link', sa.String(length=500), autoincrement=False, nullable=True),
+    sa.Column('materials', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('tutor_feedback', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('student_feedback', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('admin_notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('quality_score', sa.Float(), autoincrement=False, nullable=True),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('created_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('is_recurring', sa.Boolean(), autoincrement=False, nullable=True),
+    sa.Column('recurring_pattern', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('parent_class_id', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('occurrence_date', sa.Date(), autoincrement=False, nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('classes_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_classes_archive_date', ['scheduled_date'], unique=False)
+        batch_op.create_index('ix_classes_archive_student_date', ['primary_student_id', 'scheduled_date'], unique=False)
+        batch_op.create_index('ix_classes_archive_tutor_date', ['tutor_id', 'scheduled_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('classes_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_classes_archive_tutor_date')
+        batch_op.drop_index('ix_classes_archive_student_date')
+        batch_op.drop_index('ix_classes_archive_date')
+
+    op.drop_table('classes_archive')
+    with op.batch_alter_table('attendance_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_archive_tutor_date')
+        batch_op.drop_index('ix_attendance_archive_student_date')
+        batch_op.drop_index('ix_attendance_archive_class_id')
+
+    op.drop_table('attendance_archive')
@@ -0,0 +1,35 @@
+"""leases table and status index for the class lifecycle sweeper
+
+Revision ID: c3f8a1d6e9b4
+Revises: a8c2e6f4b1d3
+Create Date: 2026-10-19 21:12:08.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a1d6e9b4'
+down_revision = 'a8c2e6f4b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leases',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('holder', sa.String(length=100), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.create_index('ix_classes_status_date', ['status', 'scheduled_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.drop_index('ix_classes_status_date')
+
+    op.drop_table('leases')
@@ -0,0 +1,58 @@
+"""add composite indexes for scheduling and attendance filters
+
+Revision ID: c7d84e2f19a6
+Revises: a3f1c9d2e4b7
+Create Date: 2026-10-19 13:40:52.281907
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY outside the
+migration transaction, so reads and writes continue while they build. Other
+backends use a plain CREATE INDEX.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d84e2f19a6'
+down_revision = 'a3f1c9d2e4b7'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_classes_tutor_date_status', 'classes', ['tutor_id', 'scheduled_date', 'status']),
+    ('ix_classes_date_time', 'classes', ['scheduled_date', 'scheduled_time']),
+    ('ix_classes_student_date', 'classes', ['primary_student_id', 'scheduled_date']),
+    ('ix_classes_parent_class_id', 'classes', ['parent_class_id']),
+    ('ix_attendance_class_id', 'attendance', ['class_id']),
+    ('ix_attendance_tutor_date', 'attendance', ['tutor_id', 'class_date']),
+    ('ix_attendance_student_date', 'attendance', ['student_id', 'class_date']),
+    ('ix_attendance_class_date', 'attendance', ['class_date']),
+    ('ix_students_active_department', 'students', ['is_active', 'department_id']),
+    ('ix_tutors_status', 'tutors', ['status']),
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, columns in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
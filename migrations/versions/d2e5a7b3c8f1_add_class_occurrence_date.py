@@ -0,0 +1,34 @@
+"""add classes.occurrence_date for recurring series
+
+Revision ID: d2e5a7b3c8f1
+Revises: c7d84e2f19a6
+Create Date: 2026-10-19 15:21:08.937112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e5a7b3c8f1'
+down_revision = 'c7d84e2f19a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('occurrence_date', sa.Date(), nullable=True))
+
+    # Existing occurrences fill the slot they were created for
+    op.execute("UPDATE classes SET occurrence_date = scheduled_date "
+               "WHERE parent_class_id IS NOT NULL OR is_recurring = true")
+
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_classes_parent_occurrence', ['parent_class_id', 'occurrence_date'])
+
+
+def downgrade():
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_classes_parent_occurrence', type_='unique')
+        batch_op.drop_column('occurrence_date')
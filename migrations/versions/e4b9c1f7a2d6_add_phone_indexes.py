@@ -0,0 +1,49 @@
+"""add phone indexes for import duplicate detection
+
+Revision ID: e4b9c1f7a2d6
+Revises: d2e5a7b3c8f1
+Create Date: 2026-10-19 17:05:33.418250
+
+Bulk imports look up existing students and tutors by phone in batches.
+Built CONCURRENTLY on PostgreSQL, as in c7d84e2f19a6.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9c1f7a2d6'
+down_revision = 'd2e5a7b3c8f1'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_students_phone', 'students', ['phone']),
+    ('ix_users_phone', 'users', ['phone']),
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, columns in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,84 @@
+from datetime import date, time, timedelta
+import pytest
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.department import Department
+from app.models.tutor import Tutor
+from app.models.student import Student
+from app.models.class_model import Class
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-secret-key-long-enough-for-hs256'
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        SQLALCHEMY_BINDS = {}
+        SQLALCHEMY_REPLICA_BINDS = []
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        STORAGE_FOLDER = str(tmp_path / 'blobs')
+        CALENDAR_FEED_FOLDER = str(tmp_path / 'calendars')
+        JOB_ARTIFACT_FOLDER = str(tmp_path / 'jobs')
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        Department.create_default_departments()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def department(app):
+    return Department.query.order_by(Department.id).first()
+
+
+def make_tutor(department, username='tutor'):
+    user = User(username=username, email=f'{username}@example.com', full_name=username.title(),
+                role='tutor', department_id=department.id, is_active=True)
+    user.set_password('pw')
+    db.session.add(user)
+    db.session.flush()
+    tutor = Tutor(user_id=user.id, qualification='BSc', salary_type='hourly', hourly_rate=100, status='active')
+    db.session.add(tutor)
+    db.session.commit()
+    return tutor
+
+
+def make_student(department, name='Student'):
+    student = Student(full_name=name, email=f"{name.lower().replace(' ', '.')}@example.com",
+                      grade='10', board='CBSE', department_id=department.id)
+    db.session.add(student)
+    db.session.commit()
+    return student
+
+
+def make_class(tutor, student, day=None, start=time(10, 0), duration=60, **fields):
+    cls = Class(subject='Math', class_type='one_on_one', scheduled_date=day or date.today(),
+                scheduled_time=start, duration=duration, tutor_id=tutor.id,
+                primary_student_id=student.id, **dict({'status': 'scheduled'}, **fields))
+    db.session.add(cls)
+    db.session.commit()
+    return cls
+
+
+@pytest.fixture
+def tutor(department):
+    return make_tutor(department)
+
+
+@pytest.fixture
+def student(department):
+    return make_student(department)
+
+
+def days_ago(days):
+    return date.today() - timedelta(days=days)
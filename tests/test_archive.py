@@ -0,0 +1,44 @@
+from datetime import time
+from app import db
+from app.models.archive import ArchivedAttendance, ArchivedClass
+from app.models.attendance import Attendance
+from app.models.class_model import Class
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.utils.archive import archive_classes, class_source
+from app.utils.counters import reconcile_class_counts
+from tests.conftest import days_ago, make_class
+
+
+def counters(tutor, student):
+    tutor, student = db.session.get(Tutor, tutor.id), db.session.get(Student, student.id)
+    return (tutor.total_classes, tutor.completed_classes, tutor.last_class,
+            student.total_classes, student.attended_classes, student.last_class)
+
+
+def test_archived_classes_still_count(tutor, student):
+    for day in range(400, 410):
+        cls = make_class(tutor, student, day=days_ago(day), status='completed', completion_status='completed')
+        db.session.add(Attendance(class_id=cls.id, tutor_id=tutor.id, student_id=student.id,
+                                  class_date=cls.scheduled_date, scheduled_start=time(10, 0),
+                                  tutor_present=True, student_present=True))
+    make_class(tutor, student, day=days_ago(420), status='cancelled')
+    parent = make_class(tutor, student, day=days_ago(430), status='completed', is_recurring=True)
+    recent = make_class(tutor, student, day=days_ago(3), status='completed', completion_status='completed')
+    db.session.commit()
+    assert reconcile_class_counts() == []
+    before = counters(tutor, student)
+
+    assert archive_classes(before=days_ago(365), batch_size=4) == (11, 10)
+    assert ArchivedClass.query.count() == 11 and ArchivedAttendance.query.count() == 10
+    assert {cls.id for cls in Class.query} == {parent.id, recent.id}
+    assert Attendance.query.count() == 0
+
+    # Moving rows leaves the counters alone, and reconciling over both tables agrees with them
+    assert counters(tutor, student) == before
+    assert reconcile_class_counts() == []
+    assert counters(tutor, student) == before
+
+    every_class = class_source('all')
+    assert db.session.query(db.func.count(every_class.id)).scalar() == 13
+    assert archive_classes(before=days_ago(365)) == (0, 0)
@@ -0,0 +1,35 @@
+from app import db
+from app.utils.calendar_feed import generate_feed_token, revoke_feed_token, verify_feed_token
+
+
+def fetch(app, client, token):
+    # A fresh app context per request, as in a deployed worker; otherwise the
+    # request shares the fixture's context and its memoized cache versions
+    with app.app_context():
+        return client.get(f'/calendar/{token}.ics').status_code
+
+
+def test_revoke_feed_token_invalidates_issued_links(app, client, tutor, student):
+    old = generate_feed_token('tutor', tutor.id)
+    student_token = generate_feed_token('student', student.id)
+    assert verify_feed_token(old) == ('tutor', tutor.id)
+    assert fetch(app, client, old) == 200
+
+    revoke_feed_token('tutor', tutor.id)
+    db.session.commit()
+    new = generate_feed_token('tutor', tutor.id)
+
+    assert new != old
+    assert verify_feed_token(old) is None
+    assert verify_feed_token(new) == ('tutor', tutor.id)
+    # Only the revoked owner's links change
+    assert verify_feed_token(student_token) == ('student', student.id)
+    assert fetch(app, client, old) == 404
+    assert fetch(app, client, new) == 200
+
+
+def test_verify_feed_token_rejects_foreign_tokens(app, tutor):
+    token = generate_feed_token('tutor', tutor.id)
+    assert verify_feed_token(token[:-2] + 'xx') is None
+    app.config['SECRET_KEY'] = 'another-secret-key-long-enough-for-hs256'
+    assert verify_feed_token(token) is None
@@ -0,0 +1,76 @@
+from datetime import datetime, time
+from app import db
+from app.models.attendance import Attendance
+from app.models.department import Department
+from app.models.student import Student
+from app.models.tutor import Tutor
+from app.utils.counters import reconcile_class_counts, reconcile_department_counts
+from tests.conftest import days_ago, make_class, make_student, make_tutor
+
+
+def headcounts(department_id):
+    dept = db.session.get(Department, department_id)
+    return dept.user_count, dept.tutor_count, dept.student_count
+
+
+def test_department_headcounts_follow_users_and_students(department):
+    other = Department.query.filter(Department.id != department.id).first()
+    tutor = make_tutor(department)
+    student = make_student(department)
+    assert headcounts(department.id) == (1, 1, 1)
+
+    tutor.user.is_active = False
+    student.department_id = other.id
+    db.session.commit()
+    assert headcounts(department.id) == (0, 0, 0)
+    assert headcounts(other.id) == (0, 0, 1)
+
+    tutor.user.is_active = True
+    tutor.user.role = 'coordinator'
+    db.session.commit()
+    assert headcounts(department.id) == (1, 0, 0)
+
+    db.session.delete(student)
+    db.session.commit()
+    assert headcounts(other.id) == (0, 0, 0)
+    assert reconcile_department_counts() == []
+
+
+def test_class_counters_follow_classes_and_attendance(tutor, student, department):
+    member = make_student(department, 'Group Member')
+    cls = make_class(tutor, student, day=days_ago(2), students=f'[{student.id}, {member.id}]')
+    make_class(tutor, student, day=days_ago(1))
+
+    assert (tutor.total_classes, tutor.completed_classes) == (2, 0)
+    assert (student.total_classes, member.total_classes) == (2, 1)
+
+    cls.status = 'completed'
+    cls.completion_status = 'completed'
+    db.session.add(Attendance(class_id=cls.id, tutor_id=tutor.id, student_id=student.id,
+                              class_date=cls.scheduled_date, scheduled_start=time(10, 0),
+                              tutor_present=True, student_present=True))
+    db.session.commit()
+    assert tutor.completed_classes == 1
+    assert tutor.last_class == datetime.combine(days_ago(2), time(10, 0))
+    assert (student.attended_classes, student.last_class) == (1, datetime.combine(days_ago(2), time(10, 0)))
+
+    cls.status = 'cancelled'
+    db.session.commit()
+    assert (tutor.total_classes, tutor.completed_classes) == (1, 0)
+    assert (student.total_classes, member.total_classes) == (1, 0)
+    # last_class only moves forward until the next reconcile
+    assert reconcile_class_counts() == [('tutors', tutor.id, 'last_class',
+                                         datetime.combine(days_ago(2), time(10, 0)), None)]
+
+
+def test_reconcile_class_counts_repairs_drift(tutor, student):
+    make_class(tutor, student)
+    db.session.execute(db.update(Tutor).values(total_classes=7))
+    db.session.execute(db.update(Student).values(total_classes=0))
+    db.session.commit()
+
+    fixes = reconcile_class_counts()
+    assert ('tutors', tutor.id, 'total_classes', 7, 1) in fixes
+    assert ('students', student.id, 'total_classes', 0, 1) in fixes
+    assert (db.session.get(Tutor, tutor.id).total_classes, db.session.get(Student, student.id).total_classes) == (1, 1)
+    assert reconcile_class_counts() == []
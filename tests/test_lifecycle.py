@@ -0,0 +1,50 @@
+from datetime import datetime, time
+from app import db
+from app.models.class_model import Class
+from app.utils.cache import get_version
+from app.utils.calendar_feed import feed_cache_key
+from app.utils.lifecycle import LEASE_NAME, acquire_lease, run_sweep, sweep_classes
+from tests.conftest import days_ago, make_class
+
+NOW = datetime.combine(days_ago(0), time(12, 0))
+
+
+def status(cls):
+    row = db.session.get(Class, cls.id)
+    return row.status, row.completion_status
+
+
+def test_sweep_closes_overdue_classes(tutor, student):
+    missed = make_class(tutor, student, day=days_ago(1))
+    left_open = make_class(tutor, student, day=days_ago(1), start=time(14, 0), status='ongoing')
+    overnight = make_class(tutor, student, day=days_ago(1), start=time(23, 30))
+    within_grace = make_class(tutor, student, day=days_ago(0), start=time(10, 30))
+    upcoming = make_class(tutor, student, day=days_ago(-1))
+    done = make_class(tutor, student, day=days_ago(1), start=time(8, 0), status='completed', completion_status='completed')
+    version = get_version(feed_cache_key('tutor', tutor.id))
+
+    assert sweep_classes(now=NOW, grace_minutes=60) == {'no_show': 2, 'incomplete': 1}
+    db.session.expire_all()
+    assert status(missed) == status(overnight) == ('completed', 'no_show')
+    assert status(left_open) == ('completed', 'incomplete')
+    assert status(within_grace) == status(upcoming) == ('scheduled', None)
+    assert status(done) == ('completed', 'completed')
+    assert get_version(feed_cache_key('tutor', tutor.id)) > version
+    assert sweep_classes(now=NOW, grace_minutes=60) == {'no_show': 0, 'incomplete': 0}
+
+
+def test_sweep_batches_and_stops_when_renew_fails(tutor, student):
+    for day in range(2, 7):
+        make_class(tutor, student, day=days_ago(day))
+
+    assert sweep_classes(now=NOW, batch_size=2, renew=lambda: False) == {'no_show': 2, 'incomplete': 0}
+    assert sweep_classes(now=NOW, batch_size=2) == {'no_show': 3, 'incomplete': 0}
+    assert Class.query.filter_by(status='scheduled').count() == 0
+
+
+def test_run_sweep_skips_while_another_worker_holds_the_lease(tutor, student):
+    make_class(tutor, student, day=days_ago(2))
+    assert acquire_lease(LEASE_NAME, 'other-worker', 60)
+
+    assert run_sweep('this-worker', 60) is None
+    assert Class.query.filter_by(status='scheduled').count() == 1